@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'igp_dashboard.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# /stream/ (SSE) se sirve en el event loop sin el handler de Django; ver monitoring.asgi
+from monitoring.asgi import stream_router  # noqa: E402  (requiere apps cargadas)
+
+application = stream_router(django_application)
@@ -62,6 +62,7 @@ if WHITENOISE_ENABLED:
     MIDDLEWARE.append('whitenoise.middleware.WhiteNoiseMiddleware')
 
 MIDDLEWARE += [
+    'monitoring.middleware.MetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -177,5 +178,60 @@ LOGIN_REDIRECT_URL = 'monitoring:dashboard'
 LOGOUT_REDIRECT_URL = 'login'
 
 REDIS_URL = os.getenv('REDIS_URL')
+# Pool compartido por worker y circuit breaker (ver monitoring.services.redis_pool).
+REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS', '20'))
+REDIS_POOL_TIMEOUT = float(os.getenv('REDIS_POOL_TIMEOUT', '0.5'))
+REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', '1.0'))
+REDIS_CONNECT_TIMEOUT = float(os.getenv('REDIS_CONNECT_TIMEOUT', '0.5'))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', '30'))
+REDIS_BREAKER_THRESHOLD = int(os.getenv('REDIS_BREAKER_THRESHOLD', '3'))
+REDIS_BREAKER_RESET = float(os.getenv('REDIS_BREAKER_RESET', '10'))
 REQUIRE_REDIS = os.getenv('REQUIRE_REDIS', '0') == '1'
+# Formato de escritura de los historiales por sensor: packed, json (listas anteriores) o both.
+REDIS_HISTORY_FORMAT = os.getenv('REDIS_HISTORY_FORMAT', 'packed')
 SIM_STREAM_ENABLED = os.getenv('SIM_STREAM', '1') == '1'
+# SSE (/stream/) bajo ASGI: conexiones abiertas por proceso y heartbeat para proxies.
+SSE_MAX_CONNECTIONS = int(os.getenv('SSE_MAX_CONNECTIONS', '2000'))
+SSE_HEARTBEAT_SECONDS = float(os.getenv('SSE_HEARTBEAT_SECONDS', '15'))
+# Hub pub/sub: frames encolados por cliente y descartes tolerados antes de desconectarlo.
+SSE_CLIENT_QUEUE = int(os.getenv('SSE_CLIENT_QUEUE', '32'))
+SSE_SLOW_CLIENT_DROPS = int(os.getenv('SSE_SLOW_CLIENT_DROPS', '128'))
+# Paquetes recientes que cada proceso guarda para reenviar tras un Last-Event-ID.
+SSE_REPLAY_SIZE = int(os.getenv('SSE_REPLAY_SIZE', '500'))
+# El dashboard histórico lee rollups (hora/día/mes) en lugar de recorrer SensorSample.
+DASHBOARD_USE_ROLLUPS = os.getenv('DASHBOARD_USE_ROLLUPS', '1') == '1'
+# Cache del contexto y los fragmentos históricos del dashboard: LocMem por proceso o Redis
+# (compartido entre procesos) con DASHBOARD_CACHE_URL=redis://...; los periodos abiertos expiran.
+DASHBOARD_CACHE_URL = os.getenv('DASHBOARD_CACHE_URL', '')
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_CACHE_TIMEOUT', '300'))
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'dashboard': (
+        {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': DASHBOARD_CACHE_URL,
+            'KEY_PREFIX': 'igp',
+            'TIMEOUT': DASHBOARD_CACHE_TIMEOUT,
+        }
+        if DASHBOARD_CACHE_URL.startswith(('redis://', 'rediss://', 'unix://'))
+        else {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'dashboard',
+            'TIMEOUT': DASHBOARD_CACHE_TIMEOUT,
+            'OPTIONS': {'MAX_ENTRIES': 2000},
+        }
+    ),
+}
+# Ingesta de paquetes del borde (POST /ingest/packets/).
+INGEST_TOKEN = os.getenv('INGEST_TOKEN', '')
+INGEST_MAX_PACKETS = int(os.getenv('INGEST_MAX_PACKETS', '5000'))
+INGEST_BATCH_MAX = int(os.getenv('INGEST_BATCH_MAX', '1000'))
+INGEST_BATCH_DELAY_MS = float(os.getenv('INGEST_BATCH_DELAY_MS', '20'))
+# Redis Stream y consumer group que lee `manage.py consume_packets`.
+INGEST_STREAM = os.getenv('INGEST_STREAM', 'sensor:ingest')
+INGEST_STREAM_GROUP = os.getenv('INGEST_STREAM_GROUP', 'ingest')
+# Segundos que el snapshot de /realtime-redis/ se comparte entre peticiones del mismo proceso.
+REALTIME_SNAPSHOT_TTL = float(os.getenv('REALTIME_SNAPSHOT_TTL', '2'))
+# Métricas Prometheus en /metrics/ (token Bearer del scraper o sesión staff) y cabecera Server-Timing.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+SERVER_TIMING = os.getenv('SERVER_TIMING', '1' if DEBUG else '0') == '1'
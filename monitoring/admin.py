@@ -1,6 +1,134 @@
+import json
+from datetime import datetime, time, timedelta
+
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count, IntegerField, OuterRef, QuerySet, Subquery
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .models import SensorPacket, SensorRollup, SensorSample
+
+# por encima de este total se muestra la estimación del planner en lugar de un COUNT(*)
+ESTIMATE_THRESHOLD = 50_000
+
+
+def estimated_count(queryset):
+    """
+    Total aproximado según las estadísticas de PostgreSQL: `pg_class.reltuples` (sumado sobre
+    las particiones) sin filtros, o las filas que estima EXPLAIN con filtros. None en otras bases.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    if queryset.query.is_empty():
+        # `none()` (p. ej. una búsqueda no numérica) no tiene SQL que explicar
+        return 0
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            table = queryset.model._meta.db_table
+            cursor.execute(
+                """
+                SELECT coalesce(sum(greatest(reltuples, 0)), 0)::bigint FROM pg_class
+                WHERE oid = to_regclass(%s)
+                   OR oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(%s))
+                """,
+                [table, table],
+            )
+            return int(cursor.fetchone()[0])
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Usa `estimated_count` para tablas grandes y el COUNT(*) exacto por debajo de `ESTIMATE_THRESHOLD`."""
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+            return estimate
+        return super().count
+
+
+class RollupDatesQuerySet(QuerySet):
+    """
+    `date_hierarchy` arma su navegación con `datetimes()`, un DISTINCT sobre todas las filas
+    del rango. Aquí los años, meses y días salen de los rollups mensuales/diarios entre el
+    primer y el último timestamp del queryset (dos extremos del índice), o del calendario
+    entre ambos si no hay rollups. Los rollups cuentan todos los paquetes, así que con otros
+    filtros puede aparecer un periodo sin resultados.
+    """
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None):
+        if field_name != 'timestamp' or kind not in ('year', 'month', 'day') or tzinfo is not None:
+            return super().datetimes(field_name, kind, order, tzinfo)
+        moments = self.order_by().values_list(field_name, flat=True)
+        first = moments.order_by(field_name).first()
+        if first is None:
+            return []
+        last = moments.order_by(f'-{field_name}').first()
+        buckets = (
+            SensorRollup.objects
+            .filter(
+                granularity=SensorRollup.DAY if kind == 'day' else SensorRollup.MONTH,
+                bucket__lte=last,
+                last_timestamp__gte=first,
+            )
+            .order_by('bucket')
+            .values_list('bucket', flat=True)
+        )
+        periods = {_truncate(bucket, kind) for bucket in buckets} or _calendar(first, last, kind)
+        return sorted(periods, reverse=order == 'DESC')
 
-from .models import SensorPacket, SensorSample
+
+def _truncate(moment, kind):
+    moment = timezone.localtime(moment).replace(hour=0, minute=0, second=0, microsecond=0)
+    if kind != 'day':
+        moment = moment.replace(day=1)
+    if kind == 'year':
+        moment = moment.replace(month=1)
+    return moment
+
+
+def _calendar(first, last, kind):
+    periods = set()
+    current, last = _truncate(first, kind), timezone.localtime(last)
+    while current <= last:
+        periods.add(current)
+        if kind == 'day':
+            current = timezone.make_aware(datetime.combine(current.date() + timedelta(days=1), time.min))
+        elif kind == 'month':
+            current = current.replace(year=current.year + current.month // 12, month=current.month % 12 + 1)
+        else:
+            current = current.replace(year=current.year + 1)
+    return periods
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist con número de consultas constante: sin COUNT(*) completo ni DISTINCT de fechas."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    date_hierarchy = 'timestamp'
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return RollupDatesQuerySet(queryset.model, query=queryset.query.chain(), using=queryset._db)
+
+    def search_seq(self, queryset, search_term, lookup):
+        # búsqueda exacta por seq (indexado): un icontains sobre el entero recorrería la tabla
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        if not search_term.isdigit():
+            return queryset.none(), False
+        return queryset.filter(**{lookup: int(search_term)}), False
 
 
 class SensorSampleInline(admin.TabularInline):
@@ -10,19 +138,43 @@ class SensorSampleInline(admin.TabularInline):
 
 
 @admin.register(SensorPacket)
-class SensorPacketAdmin(admin.ModelAdmin):
+class SensorPacketAdmin(LargeTableAdmin):
     list_display = ('seq', 'timestamp', 'alerta', 'samples_count')
-    list_filter = ('alerta', 'timestamp')
+    list_filter = ('alerta',)
     search_fields = ('seq',)
+    search_help_text = 'Número de secuencia exacto.'
     ordering = ('-timestamp',)
     inlines = [SensorSampleInline]
 
+    def get_queryset(self, request):
+        # subconsulta correlacionada: se evalúa solo para las filas de la página
+        samples = (
+            SensorSample.objects
+            .filter(packet=OuterRef('pk'))
+            .order_by()
+            .values('packet')
+            .annotate(total=Count('id'))
+            .values('total')
+        )
+        return super().get_queryset(request).annotate(
+            samples_total=Subquery(samples, output_field=IntegerField()),
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        return self.search_seq(queryset, search_term, 'seq')
+
+    @admin.display(description='Samples')
     def samples_count(self, obj):
-        return obj.samples.count()
+        return obj.samples_total or 0
 
 
 @admin.register(SensorSample)
-class SensorSampleAdmin(admin.ModelAdmin):
+class SensorSampleAdmin(LargeTableAdmin):
     list_display = ('packet', 'sample_id', 'soil_pct', 'tilt', 'vib_pulse', 'vib_hit')
     list_filter = ('tilt', 'vib_hit')
+    list_select_related = ('packet',)
     search_fields = ('packet__seq',)
+    search_help_text = 'Número de secuencia exacto del paquete.'
+
+    def get_search_results(self, request, queryset, search_term):
+        return self.search_seq(queryset, search_term, 'packet__seq')
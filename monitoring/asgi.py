@@ -0,0 +1,124 @@
+"""
+Endpoints ASGI que no pasan por el handler de Django.
+
+El handler ASGI de Django ejecuta el middleware síncrono en un hilo propio por petición
+que vive hasta que termina la respuesta: un SSE abierto retendría ese hilo durante toda la
+conexión. `/stream/` se atiende aquí directamente en el event loop (sesión y usuario se
+resuelven con la API async de auth) y el resto de rutas sigue al handler de Django.
+"""
+from __future__ import annotations
+
+import asyncio
+import io
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aget_user
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import DisallowedHost
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.http import HttpResponse, HttpResponseBadRequest
+
+from monitoring.services import broadcast, sse
+
+
+class StreamRouter:
+    """Envía las rutas registradas a su app ASGI y todo lo demás a `fallback` (Django)."""
+
+    def __init__(self, fallback, routes):
+        self.fallback = fallback
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            app = self.routes.get(scope['path'])
+            if app is not None:
+                return await app(scope, receive, send)
+        return await self.fallback(scope, receive, send)
+
+
+class SensorStreamApp:
+    stream_interval_seconds = 5
+
+    async def __call__(self, scope, receive, send):
+        request = ASGIRequest(scope, io.BytesIO())
+        try:
+            request.get_host()
+        except DisallowedHost:
+            return await self._respond(send, HttpResponseBadRequest())
+
+        user = await self._authenticate(request)
+        if not user.is_authenticated:
+            return await self._respond(send, redirect_to_login(request.get_full_path()))
+        live = broadcast.hub.available()
+        if not live and not settings.SIM_STREAM_ENABLED:
+            return await self._respond(send, HttpResponse(
+                "data: {\"message\": \"Simulación deshabilitada\"}\n\n",
+                content_type='text/event-stream',
+            ))
+        if not sse.limiter.try_acquire():
+            response = HttpResponse("Demasiadas conexiones de streaming", status=503, content_type='text/plain')
+            response['Retry-After'] = str(self.stream_interval_seconds)
+            return await self._respond(send, response)
+
+        try:
+            if live:
+                events = broadcast.hub.subscribe(request.headers.get('Last-Event-ID')).events()
+            else:
+                events = sse.simulated_events(self.stream_interval_seconds)
+            await self._stream(receive, send, events)
+        finally:
+            sse.limiter.release()
+
+    async def _authenticate(self, request):
+        engine = import_module(settings.SESSION_ENGINE)
+        request.session = engine.SessionStore(request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+        user = await aget_user(request)
+        # sin request_finished no se cierra sola: misma política que una petición de Django
+        await sync_to_async(close_old_connections)()
+        return user
+
+    async def _stream(self, receive, send, events):
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        pump = asyncio.ensure_future(self._pump(events, send))
+        disconnect = asyncio.ensure_future(self._wait_disconnect(receive))
+        try:
+            await asyncio.wait({pump, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (pump, disconnect):
+                task.cancel()
+            await asyncio.gather(pump, disconnect, return_exceptions=True)
+            await events.aclose()
+
+    async def _pump(self, events, send):
+        async for chunk in events:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+
+    async def _wait_disconnect(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def _respond(self, send, response):
+        headers = [(key.encode('latin-1'), value.encode('latin-1')) for key, value in response.items()]
+        headers.extend(
+            (b'set-cookie', cookie.output(header='').strip().encode('latin-1'))
+            for cookie in response.cookies.values()
+        )
+        await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': response.content})
+
+
+def stream_router(django_application):
+    return StreamRouter(django_application, {'/stream/': SensorStreamApp()})
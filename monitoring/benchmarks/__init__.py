@@ -0,0 +1,3 @@
+"""
+Utilidades para medir los caminos críticos del dashboard sin depender de servicios externos.
+"""
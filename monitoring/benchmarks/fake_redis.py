@@ -0,0 +1,274 @@
+"""
+Redis en memoria (subconjunto mínimo) para benchmarks reproducibles.
+
+Simula la latencia de red por round trip y cuenta comandos/round trips, de modo que
+los resultados reflejen el costo real de hablar con Redis sin levantar un servidor.
+"""
+from __future__ import annotations
+
+import fnmatch
+import time
+
+try:
+    from redis.exceptions import WatchError
+except ImportError:
+    class WatchError(Exception):
+        pass
+
+
+class FakeRedis:
+
+    # comandos que modifican su primera clave (todas, en DELETE): invalidan un WATCH
+    WRITES = {
+        "set", "append", "delete", "xadd", "sadd", "rpush", "ltrim",
+        "hset", "hincrby", "hincrbyfloat", "zadd",
+    }
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.round_trips = 0
+        self.commands = 0
+        self._data = {}
+        self._versions = {}
+
+    def reset_counters(self):
+        self.round_trips = 0
+        self.commands = 0
+
+    def _round_trip(self, commands=1):
+        self.round_trips += 1
+        self.commands += commands
+        if self.latency:
+            time.sleep(self.latency)
+
+    def __getattr__(self, name):
+        if not self.supports(name):
+            raise AttributeError(name)
+
+        def command(*args, **kwargs):
+            self._round_trip()
+            return self._call(name, args, kwargs)
+
+        return command
+
+    @classmethod
+    def supports(cls, name):
+        return name == "execute_command" or hasattr(cls, f"_cmd_{name}")
+
+    def _call(self, name, args, kwargs):
+        if name == "execute_command":
+            # opciones del cliente real como NEVER_DECODE no aplican: aquí nada se decodifica
+            name, args, kwargs = args[0].lower(), args[1:], {}
+        result = getattr(type(self), f"_cmd_{name}")(self, *args, **kwargs)
+        if name in self.WRITES:
+            for key in args if name == "delete" else args[:1]:
+                self._versions[key] = self._versions.get(key, 0) + 1
+        return result
+
+    def version(self, key):
+        return self._versions.get(key, 0)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def scan_iter(self, match=None, count=None):
+        cursor = 0
+        while True:
+            cursor, keys = self.scan(cursor, match=match, count=count)
+            yield from keys
+            if cursor == 0:
+                break
+
+    # -------------------------------
+    # COMANDOS
+    # -------------------------------
+    def _cmd_ping(self):
+        return True
+
+    def _cmd_get(self, key):
+        return self._data.get(key)
+
+    def _cmd_set(self, key, value):
+        self._data[key] = value if isinstance(value, bytes) else str(value)
+        return True
+
+    def _cmd_append(self, key, value):
+        current = self._data.get(key, b"")
+        self._data[key] = current + (value if isinstance(value, bytes) else str(value).encode())
+        return len(self._data[key])
+
+    def _cmd_strlen(self, key):
+        value = self._data.get(key, b"")
+        return len(value if isinstance(value, bytes) else value.encode())
+
+    def _cmd_getrange(self, key, start, end):
+        value = self._data.get(key, b"")
+        value = value if isinstance(value, bytes) else value.encode()
+        return bytes(self._slice(value, start, end))
+
+    def _cmd_publish(self, channel, message):
+        return 0
+
+    def _cmd_xadd(self, name, fields, maxlen=None, approximate=True):
+        stream = self._data.setdefault(name, [])
+        stream.append(dict(fields))
+        if maxlen is not None:
+            del stream[:-maxlen]
+        return f"{len(stream)}-0"
+
+    def _cmd_delete(self, *keys):
+        return sum(1 for key in keys if self._data.pop(key, None) is not None)
+
+    def _cmd_keys(self, pattern="*"):
+        return [k for k in self._data if fnmatch.fnmatchcase(k, pattern)]
+
+    def _cmd_scan(self, cursor=0, match=None, count=None):
+        keys = sorted(self._data)
+        count = count or 10
+        page = keys[cursor:cursor + count]
+        next_cursor = cursor + count if cursor + count < len(keys) else 0
+        if match:
+            page = [k for k in page if fnmatch.fnmatchcase(k, match)]
+        return next_cursor, page
+
+    def _cmd_sadd(self, key, *members):
+        bucket = self._data.setdefault(key, set())
+        before = len(bucket)
+        bucket.update(str(m) for m in members)
+        return len(bucket) - before
+
+    def _cmd_smembers(self, key):
+        return set(self._data.get(key, set()))
+
+    def _cmd_rpush(self, key, *values):
+        bucket = self._data.setdefault(key, [])
+        bucket.extend(str(v) for v in values)
+        return len(bucket)
+
+    def _cmd_ltrim(self, key, start, end):
+        bucket = self._data.get(key)
+        if bucket is not None:
+            self._data[key] = self._slice(bucket, start, end)
+        return True
+
+    def _cmd_lrange(self, key, start, end):
+        return self._slice(self._data.get(key, []), start, end)
+
+    def _cmd_expire(self, key, seconds):
+        return key in self._data
+
+    def _cmd_hset(self, key, field=None, value=None, mapping=None):
+        bucket = self._data.setdefault(key, {})
+        items = dict(mapping or {})
+        if field is not None:
+            items[field] = value
+        added = sum(1 for f in items if f not in bucket)
+        bucket.update({str(f): str(v) for f, v in items.items()})
+        return added
+
+    def _cmd_hgetall(self, key):
+        return dict(self._data.get(key, {}))
+
+    def _cmd_hincrby(self, key, field, amount=1):
+        bucket = self._data.setdefault(key, {})
+        bucket[field] = str(int(bucket.get(field, 0)) + int(amount))
+        return int(bucket[field])
+
+    def _cmd_hincrbyfloat(self, key, field, amount=1.0):
+        bucket = self._data.setdefault(key, {})
+        bucket[field] = repr(float(bucket.get(field, 0)) + float(amount))
+        return float(bucket[field])
+
+    def _cmd_zadd(self, key, mapping, gt=False, lt=False):
+        bucket = self._data.setdefault(key, {})
+        added = 0
+        for member, score in mapping.items():
+            member, score = str(member), float(score)
+            current = bucket.get(member)
+            if current is None:
+                added += 1
+            elif (gt and score <= current) or (lt and score >= current):
+                continue
+            bucket[member] = score
+        return added
+
+    def _cmd_zrange(self, key, start, end, withscores=False):
+        items = sorted(self._data.get(key, {}).items(), key=lambda kv: (kv[1], kv[0]))
+        items = self._slice(items, start, end)
+        return items if withscores else [member for member, _ in items]
+
+    def _cmd_zrevrange(self, key, start, end, withscores=False):
+        items = sorted(self._data.get(key, {}).items(), key=lambda kv: (kv[1], kv[0]), reverse=True)
+        items = self._slice(items, start, end)
+        return items if withscores else [member for member, _ in items]
+
+    @staticmethod
+    def _slice(items, start, end):
+        size = len(items)
+        start = max(size + start, 0) if start < 0 else start
+        end = size + end if end < 0 else end
+        return list(items[start:end + 1])
+
+
+class FakePipeline:
+    """
+    Pipeline con la semántica de transacción de redis-py: tras `watch()` los comandos se
+    ejecutan al momento hasta `multi()`, y `execute()` lanza `WatchError` si otra escritura
+    tocó una clave vigilada.
+    """
+
+    def __init__(self, redis: FakeRedis):
+        self.redis = redis
+        self._queue = []
+        self._watched = {}
+        self._immediate = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.reset()
+
+    def __getattr__(self, name):
+        if not FakeRedis.supports(name):
+            raise AttributeError(name)
+
+        def queue(*args, **kwargs):
+            if self._immediate:
+                self.redis._round_trip()
+                return self.redis._call(name, args, kwargs)
+            self._queue.append((name, args, kwargs))
+            return self
+
+        return queue
+
+    def watch(self, *keys):
+        self.redis._round_trip()
+        self._watched.update((key, self.redis.version(key)) for key in keys)
+        self._immediate = True
+        return True
+
+    def multi(self):
+        self._immediate = False
+
+    def reset(self):
+        self._queue = []
+        self._watched = {}
+        self._immediate = False
+
+    def execute(self, raise_on_error=True):
+        try:
+            self.redis._round_trip(commands=len(self._queue))
+            if any(self.redis.version(key) != version for key, version in self._watched.items()):
+                raise WatchError("Watched variable changed.")
+            results = []
+            for name, args, kwargs in self._queue:
+                try:
+                    results.append(self.redis._call(name, args, kwargs))
+                except Exception as exc:
+                    if raise_on_error:
+                        raise
+                    results.append(exc)
+            return results
+        finally:
+            self.reset()
@@ -0,0 +1,66 @@
+"""
+Benchmark de las consultas del histórico: join con `SensorPacket` contra el timestamp
+desnormalizado de `SensorSample`, sobre los datos de la base configurada.
+"""
+from __future__ import annotations
+
+import time
+from datetime import date
+
+from django.utils import timezone
+
+from monitoring.models import SensorSample
+from monitoring.services import historical
+
+SCENARIOS = (
+    ("completo", {"year": None, "month": None, "day": None}),
+    ("año", {"year": "latest", "month": None, "day": None}),
+    ("mes", {"year": None, "month": 3, "day": None}),
+    ("día", {"year": None, "month": None, "day": 15}),
+)
+
+LISTING_SIZE = 200
+
+
+def summary_reader(time_field, filters, last_year):
+    ranges = historical.period_ranges(filters, first_year=2023, last_year=last_year)
+    if ranges is None:
+        qs = SensorSample.objects.filter(**{f"{time_field}__gte": historical.local_midnight(date(2023, 1, 1))})
+    else:
+        qs = SensorSample.objects.filter(historical.range_q(time_field, ranges))
+    return lambda: historical.from_samples(qs, time_field=time_field)
+
+
+def listing_reader(time_field):
+    return lambda: list(SensorSample.objects.order_by(f"-{time_field}")[:LISTING_SIZE])
+
+
+def measure(reader, repeat):
+    reader()  # calienta la caché de páginas de la base
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        reader()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "ms_avg": round(sum(timings) / len(timings), 2),
+        "ms_min": round(min(timings), 2),
+    }
+
+
+def run(repeat=5):
+    last_year = timezone.localdate().year
+    results = []
+    for name, filters in SCENARIOS:
+        filters = {key: (last_year if value == "latest" else value) for key, value in filters.items()}
+        results.append({
+            "scenario": name,
+            "join": measure(summary_reader("packet__timestamp", filters, last_year), repeat),
+            "denormalized": measure(summary_reader("timestamp", filters, last_year), repeat),
+        })
+    results.append({
+        "scenario": f"listado {LISTING_SIZE}",
+        "join": measure(listing_reader("packet__timestamp"), repeat),
+        "denormalized": measure(listing_reader("timestamp"), repeat),
+    })
+    return results
@@ -0,0 +1,189 @@
+"""
+Micro-benchmark de la decodificación del snapshot: parser por elemento (implementación
+anterior, conservada aquí como referencia) contra la decodificación por lotes de
+`monitoring.services.series` y contra el formato compacto. Trabaja sobre listas ya leídas,
+sin Redis ni latencia.
+"""
+from __future__ import annotations
+
+import json
+import random
+import time
+
+from monitoring.services import series
+
+
+# -------------------------------
+# REFERENCIA: UN PARSER POR ELEMENTO
+# -------------------------------
+def loop_humidity(items):
+    values = []
+    for entry in items:
+        try:
+            obj = json.loads(entry)
+            pct = obj.get("porcentaje") or obj.get("pct") or None
+            if pct is not None:
+                values.append(float(pct))
+        except Exception:
+            try:
+                parts = entry.split(":")
+                if len(parts) == 2:
+                    values.append(float(parts[1]))
+            except Exception:
+                pass
+    return values
+
+
+def loop_pulses(items):
+    values = []
+    for entry in items:
+        try:
+            obj = json.loads(entry)
+            if isinstance(obj, dict) and "pulse" in obj:
+                values.append(float(obj["pulse"]))
+                continue
+        except Exception:
+            pass
+        try:
+            parts = entry.split(":")
+            if len(parts) == 2:
+                values.append(float(parts[1]))
+        except Exception:
+            pass
+    return values
+
+
+def loop_tilt_events(items):
+    events = 0
+    for entry in items:
+        try:
+            obj = json.loads(entry)
+            val = obj.get("estado") if isinstance(obj, dict) else None
+            if val is None:
+                parts = entry.split(":")
+                if len(parts) == 2 and parts[1].isdigit():
+                    events += int(parts[1])
+            else:
+                events += int(val)
+        except Exception:
+            try:
+                parts = entry.split(":")
+                if len(parts) == 2 and parts[1].isdigit():
+                    events += int(parts[1])
+            except Exception:
+                pass
+    return events
+
+
+def loop_summary(lists):
+    humidity, vibration, tilt = [], [], 0
+    for h_items, v_items, inc_items in lists:
+        humidity.extend(loop_humidity(h_items))
+        vibration.extend(loop_pulses(v_items))
+        tilt += loop_tilt_events(inc_items)
+    return {
+        "pulse_avg": round(sum(vibration) / len(vibration), 2) if vibration else 0,
+        "pulse_peak": max(vibration) if vibration else 0,
+        "humidity_avg": round(sum(humidity) / len(humidity), 2) if humidity else 0,
+        "humidity_peak": max(humidity) if humidity else 0,
+        "humidity_floor": min(humidity) if humidity else 0,
+        "inclination_events": tilt,
+        "total_readings": max(len(humidity), len(vibration)),
+    }
+
+
+def batch_summary(lists):
+    humidity, vibration, tilt = [], [], 0
+    for h_items, v_items, inc_items in lists:
+        humidity.append(series.humidity(h_items))
+        vibration.append(series.pulses(v_items))
+        tilt += series.tilt_events(inc_items)
+    hum = series.summarize(humidity)
+    pulse = series.summarize(vibration)
+    return {
+        "pulse_avg": round(pulse.mean, 2),
+        "pulse_peak": pulse.peak,
+        "humidity_avg": round(hum.mean, 2),
+        "humidity_peak": hum.peak,
+        "humidity_floor": hum.floor,
+        "inclination_events": tilt,
+        "total_readings": max(hum.count, pulse.count),
+    }
+
+
+def packed_summary(blobs):
+    humidity, vibration, tilt = [], [], 0
+    for h_blob, v_blob, inc_blob in blobs:
+        humidity.append(series.packed_values(h_blob))
+        vibration.append(series.packed_values(v_blob))
+        tilt += int(sum(series.packed_values(inc_blob)))
+    hum = series.summarize(humidity)
+    pulse = series.summarize(vibration)
+    return {
+        "pulse_avg": round(pulse.mean, 2),
+        "pulse_peak": pulse.peak,
+        "humidity_avg": round(hum.mean, 2),
+        "humidity_peak": hum.peak,
+        "humidity_floor": hum.floor,
+        "inclination_events": tilt,
+        "total_readings": max(hum.count, pulse.count),
+    }
+
+
+def to_packed(lists):
+    """Las mismas listas convertidas al formato compacto, como las deja `convert_redis_history`."""
+    return [
+        tuple(series.pack_records(series.history_records(items, kind)) for items, kind in zip(triple, series.FIELDS))
+        for triple in lists
+    ]
+
+
+def build_lists(sensors, entries, legacy=False, seed=42):
+    """Historiales como los devuelve LRANGE: (humedad, vibración, inclinación) por sensor."""
+    rng = random.Random(seed)
+    lists = []
+    for _ in range(sensors):
+        stamps = [f"2025-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}" for i in range(entries)]
+        if legacy:
+            epoch = [str(1735689600 + i) for i in range(entries)]
+            lists.append((
+                [f"{ts}:{rng.uniform(20, 90):.2f}" for ts in epoch],
+                [f"{ts}:{rng.randint(40, 1400)}" for ts in epoch],
+                [f"{ts}:{int(rng.random() > 0.78)}" for ts in epoch],
+            ))
+            continue
+        lists.append((
+            [json.dumps({"ts": ts, "porcentaje": round(rng.uniform(20, 90), 2)}) for ts in stamps],
+            [json.dumps({"ts": ts, "pulse": float(rng.randint(40, 1400))}) for ts in stamps],
+            [json.dumps({"ts": ts, "estado": int(rng.random() > 0.78)}) for ts in stamps],
+        ))
+    return lists
+
+
+def _best_ms(func, lists, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(lists)
+        timings.append((time.perf_counter() - started) * 1000)
+    return result, min(timings)
+
+
+def run(sensor_counts, entries=200, repeat=5, legacy=False):
+    results = []
+    for sensors in sensor_counts:
+        lists = build_lists(sensors, entries, legacy=legacy)
+        expected, loop_ms = _best_ms(loop_summary, lists, repeat)
+        actual, batch_ms = _best_ms(batch_summary, lists, repeat)
+        packed, packed_ms = _best_ms(packed_summary, to_packed(lists), repeat)
+        results.append({
+            "sensors": sensors,
+            "values": sensors * entries * 3,
+            "loop_ms": round(loop_ms, 2),
+            "batch_ms": round(batch_ms, 2),
+            "packed_ms": round(packed_ms, 2),
+            "speedup": round(loop_ms / batch_ms, 1) if batch_ms else None,
+            "packed_speedup": round(loop_ms / packed_ms, 1) if packed_ms else None,
+            "matches": expected == actual == packed,
+        })
+    return results
@@ -0,0 +1,112 @@
+"""
+Benchmark del snapshot diario de Redis contra un Redis falso con latencia simulada.
+"""
+from __future__ import annotations
+
+import random
+import time
+from datetime import timedelta
+
+from django.utils import timezone
+
+from monitoring.services.redis_gateway import DailyStatsGateway
+
+from .fake_redis import FakeRedis
+from .series import loop_humidity, loop_pulses, loop_tilt_events
+
+
+def build_packets(sensors, entries, seed=42, end=None):
+    """`entries` paquetes normalizados de `sensors` samples, cada 5 s hasta `end` (default: ahora)."""
+    rng = random.Random(seed)
+    end = end or timezone.localtime()
+    packets = []
+    for seq in range(1, entries + 1):
+        ts = end - timedelta(seconds=(entries - seq) * 5)
+        packets.append({
+            "seq": seq,
+            "ts": ts.strftime("%Y-%m-%d %H:%M:%S"),
+            "alerta": 0,
+            "samples": [
+                {
+                    "id": sid,
+                    "soil": {"raw": 0, "pct": round(rng.uniform(20, 90), 2)},
+                    "tilt": int(rng.random() > 0.78),
+                    "vib": {"pulse": rng.randint(40, 1400), "hit": int(rng.random() > 0.7)},
+                }
+                for sid in range(1, sensors + 1)
+            ],
+        })
+    return packets
+
+
+def populate(redis, sensors, entries, seed=42, history_format="json", end=None):
+    """Carga `entries` paquetes de `sensors` samples usando el camino de escritura real."""
+    gateway = DailyStatsGateway(client=redis, history_format=history_format)
+    packets = build_packets(sensors, entries, seed, end)
+    for start in range(0, len(packets), 50):
+        gateway.record_packets(packets[start:start + 50])
+    redis.reset_counters()
+
+
+def legacy_read(gateway):
+    """Reproduce el patrón de acceso anterior: KEYS + un comando por lista y sensor."""
+    client = gateway.client
+    ids = sorted({int(k.split(":")[2]) for k in client.keys("sensor:humedad:*:historico")} or {1})
+    humidity, vibration, tilt = [], [], 0
+    for sid in ids:
+        humidity.extend(loop_humidity(client.lrange(gateway.HUM_HIST.format(id=sid), -200, -1)))
+        vibration.extend(loop_pulses(client.lrange(gateway.VIB_HIST.format(id=sid), -200, -1)))
+        tilt += loop_tilt_events(client.lrange(gateway.INC_HIST.format(id=sid), -200, -1))
+        client.zrange(gateway.VIB_STATS.format(id=sid), 0, -1, withscores=True)
+    gateway._count_alert_events(client.zrange(gateway.ALERT_STATS, 0, -1))
+    client.get(gateway.LAST_PACKET)
+    return len(humidity), len(vibration), tilt
+
+
+def history_bytes(redis, template):
+    """Bytes de datos (sin overhead de Redis) de las tres series de historial de todos los sensores."""
+    total = 0
+    for prefix in ("sensor:humedad", "sensor:vibracion", "sensor:inclinacion"):
+        for key in redis.keys(template.replace("sensor:humedad", prefix).format(id="*")):
+            value = redis._data[key]
+            total += len(value) if isinstance(value, bytes) else sum(len(item.encode()) for item in value)
+    return total
+
+
+def measure(reader, redis, repeat):
+    timings = []
+    redis.reset_counters()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        reader()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "round_trips": redis.round_trips // repeat,
+        "commands": redis.commands // repeat,
+        "ms_avg": round(sum(timings) / len(timings), 2),
+        "ms_min": round(min(timings), 2),
+    }
+
+
+def run(sensor_counts, entries=200, latency_ms=0.5, repeat=5):
+    results = []
+    for sensors in sensor_counts:
+        redis = FakeRedis(latency=latency_ms / 1000)
+        populate(redis, sensors, entries, history_format="json")
+        gateway = DailyStatsGateway(client=redis)
+        packed_redis = FakeRedis(latency=latency_ms / 1000)
+        populate(packed_redis, sensors, entries, history_format="packed")
+        packed_gateway = DailyStatsGateway(client=packed_redis)
+        results.append({
+            "sensors": sensors,
+            "legacy": measure(lambda: legacy_read(gateway), redis, repeat),
+            "pipelined": measure(gateway._read_from_history, redis, repeat),
+            "packed": measure(packed_gateway._read_from_history, packed_redis, repeat),
+            "aggregates": measure(gateway._read_from_backend_redis, redis, repeat),
+            "breakdown": measure(lambda: packed_gateway.read_sensor_breakdown(bucket=60), packed_redis, repeat),
+            "bytes_per_sensor": {
+                "json": history_bytes(redis, gateway.HUM_HIST) // sensors,
+                "packed": history_bytes(packed_redis, gateway.HUM_PACKED) // sensors,
+            },
+        })
+    return results
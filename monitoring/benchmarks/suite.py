@@ -0,0 +1,299 @@
+"""
+Suite de benchmarks de los caminos críticos, con resultados en JSON comparables entre commits.
+
+Cada escala (`SCALES`) genera un histórico sintético con `services.seeding` en una base de
+prueba aparte (la misma que crearía el test runner; en SQLite, en memoria) y mide la
+generación, la reconstrucción de rollups, el widget de KPIs del histórico con cada filtro
+(con el cache vacío y lleno), el esqueleto del dashboard y la ingesta por lotes
+(`ingest.store_packets`), con las consultas de cada una. El snapshot, el desglose por sensor
+y la escritura en Redis se miden contra `FakeRedis` (en proceso, con latencia simulada) para
+cada cantidad de sensores, con sus round trips y comandos.
+
+Cada resultado tiene `ms` (mediana por operación) y, según el caso, `per_s` y conteos.
+`compare()` marca como regresión un tiempo o un throughput que empeora más que el umbral y
+cualquier conteo que crece: los conteos no dependen de la máquina.
+"""
+from __future__ import annotations
+
+import platform
+import statistics
+import subprocess
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+
+from monitoring.services import dashboard_cache, ingest, metrics, partitions, rollups, seeding
+from monitoring.services.redis_gateway import DailyStatsGateway
+from monitoring.services.snapshot_cache import snapshot_cache
+
+from . import snapshot
+from .fake_redis import FakeRedis
+
+FORMAT_VERSION = 1
+
+# días de histórico por escala
+SCALES = {'month': 30, 'year': 365, '3years': 1095}
+PER_DAY = 12
+INGEST_BATCH = 100
+REDIS_ENTRIES = 200
+REDIS_WRITE_BATCH = 50
+
+BENCHMARK_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmarks'},
+    'dashboard': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmarks-dashboard'},
+}
+
+# diferencias menores no cuentan como regresión: a esa escala domina el ruido del reloj
+MIN_DELTA_MS = 1.0
+COUNTS = ('queries', 'round_trips', 'commands')
+
+
+def _timings(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def _summary(timings):
+    return {'ms': round(statistics.median(timings), 3), 'ms_min': round(min(timings), 3)}
+
+
+def measure_db(func, repeat):
+    """Mediana y mínimo en ms y consultas por llamada (medidas con el wrapper de `services.metrics`)."""
+    func()  # calienta la caché de páginas y de consultas
+    stats, token = metrics.start_request()
+    try:
+        timings = _timings(func, repeat)
+    finally:
+        metrics._current.reset(token)
+    return _summary(timings) | {'queries': stats.db_queries // repeat}
+
+
+def measure_redis(func, redis, repeat):
+    func()
+    redis.reset_counters()
+    timings = _timings(func, repeat)
+    return _summary(timings) | {'round_trips': redis.round_trips // repeat, 'commands': redis.commands // repeat}
+
+
+# -------------------------------
+# BASE DE DATOS
+# -------------------------------
+@contextmanager
+def isolated_database():
+    """Base de prueba nueva (migrada) en lugar de la configurada; se destruye al salir."""
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def _request(filters):
+    request = RequestFactory().get('/', {key: value for key, value in filters.items() if value})
+    request.user = AnonymousUser()
+    return request
+
+
+def dashboard_reader(filters, widget='kpis'):
+    """Respuesta de un widget del histórico (sin pasar por el login)."""
+    from monitoring.views import HistoricalWidgetView
+
+    request = _request(filters)
+    view = HistoricalWidgetView()
+    view.setup(request, name=widget)
+    return lambda: view.get(request, widget)
+
+
+def shell_reader():
+    from monitoring.views import DashboardView
+
+    view = DashboardView()
+    view.setup(_request({}))
+    return view.get_context_data
+
+
+def ingest_batches(start, sensors, count, first_seq):
+    """`count` lotes de `INGEST_BATCH` paquetes nuevos, uno por minuto desde `start`."""
+    batches = []
+    seq = first_seq
+    for _ in range(count):
+        batch = []
+        for _ in range(INGEST_BATCH):
+            ts = start + timedelta(minutes=seq - first_seq)
+            batch.append(ingest.parse_packet({
+                'seq': seq,
+                'ts': ts.isoformat(),
+                'alerta': seq % 7 == 0,
+                'samples': [
+                    {'id': sid, 'soil': {'raw': 600, 'pct': 58.5}, 'tilt': 0, 'vib': {'pulse': 300 + sid, 'hit': 0}}
+                    for sid in range(1, sensors + 1)
+                ],
+            }))
+            seq += 1
+        batches.append(batch)
+    return batches
+
+
+def run_scale(name, days, sensors, repeat, end=None):
+    end = end or timezone.localdate()
+    results = {}
+    partitions.truncate_history()
+    snapshot_cache.clear()
+
+    plan = seeding.plan(end - timedelta(days=days - 1), end, PER_DAY, sensors)
+    started = time.perf_counter()
+    seeding.seed(plan)
+    elapsed = time.perf_counter() - started
+    results[f'db.{name}.seed'] = {
+        'ms': round(elapsed * 1000, 3),
+        'per_s': round(plan.samples / elapsed, 1),
+        'samples': plan.samples,
+    }
+    started = time.perf_counter()
+    rollups.rebuild()
+    results[f'db.{name}.rollups'] = {'ms': round((time.perf_counter() - started) * 1000, 3)}
+
+    scenarios = {
+        'all': {},
+        'year': {'year': end.year},
+        'month': {'year': end.year, 'month': end.month},
+        'day': {'year': end.year, 'month': end.month, 'day': end.day},
+    }
+    cache = caches[dashboard_cache.ALIAS]
+    for scenario, filters in scenarios.items():
+        reader = dashboard_reader(filters)
+        results[f'db.{name}.dashboard.{scenario}'] = measure_db(lambda: (cache.clear(), reader()), repeat)
+        results[f'db.{name}.dashboard.{scenario}.cached'] = measure_db(reader, repeat)
+    results[f'db.{name}.dashboard.shell'] = measure_db(shell_reader(), repeat)
+
+    # lotes después del último paquete generado, sobre el índice ya poblado
+    batches = iter(ingest_batches(
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), datetime.min.time())),
+        sensors,
+        repeat + 1,
+        plan.first_seq + plan.packets,
+    ))
+    result = measure_db(lambda: ingest.store_packets(next(batches)), repeat)
+    result['per_s'] = round(INGEST_BATCH / (result['ms'] / 1000), 1) if result['ms'] else None
+    results[f'db.{name}.ingest'] = result
+    return results
+
+
+# -------------------------------
+# REDIS
+# -------------------------------
+def run_redis(sensors, repeat, latency_ms):
+    redis = FakeRedis(latency=latency_ms / 1000)
+    snapshot.populate(redis, sensors, REDIS_ENTRIES, history_format='packed')
+    gateway = DailyStatsGateway(client=redis, history_format='packed')
+    results = {
+        f'redis.{sensors}.snapshot': measure_redis(gateway._read_from_backend_redis, redis, repeat),
+        f'redis.{sensors}.history': measure_redis(gateway._read_from_history, redis, repeat),
+        f'redis.{sensors}.breakdown': measure_redis(lambda: gateway.read_sensor_breakdown(bucket=60), redis, repeat),
+    }
+
+    writer = FakeRedis(latency=latency_ms / 1000)
+    gateway = DailyStatsGateway(client=writer, history_format='packed')
+    packets = snapshot.build_packets(sensors, REDIS_WRITE_BATCH * (repeat + 1))
+    batches = iter([packets[i:i + REDIS_WRITE_BATCH] for i in range(0, len(packets), REDIS_WRITE_BATCH)])
+    result = measure_redis(lambda: gateway.record_packets(next(batches)), writer, repeat)
+    result['per_s'] = round(REDIS_WRITE_BATCH / (result['ms'] / 1000), 1) if result['ms'] else None
+    results[f'redis.{sensors}.write'] = result
+    return results
+
+
+# -------------------------------
+# SUITE
+# -------------------------------
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(scales=('month', 'year'), db_sensors=3, redis_sensors=(3, 50, 500), repeat=5, latency_ms=0.5, progress=None):
+    """Ejecuta la suite sobre la base activa (usar dentro de `isolated_database()`)."""
+    results = {}
+    # el dashboard no debe leer un Redis real (el snapshot del día se mide aparte) ni usar o
+    # vaciar el cache configurado
+    with override_settings(REDIS_URL=None, CACHES=BENCHMARK_CACHES):
+        for name in scales:
+            if progress:
+                progress(f'escala {name} ({SCALES[name]} días, {db_sensors} sensores)')
+            results.update(run_scale(name, SCALES[name], db_sensors, repeat))
+    for sensors in redis_sensors:
+        if progress:
+            progress(f'Redis con {sensors} sensores')
+        results.update(run_redis(sensors, repeat, latency_ms))
+    return {
+        'version': FORMAT_VERSION,
+        'meta': {
+            'commit': _commit(),
+            'created': timezone.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'scales': list(scales),
+            'db_sensors': db_sensors,
+            'redis_sensors': list(redis_sensors),
+            'repeat': repeat,
+            'latency_ms': latency_ms,
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=0.2):
+    """
+    Filas `{name, metric, baseline, current, change, regression}` para cada métrica presente
+    en ambos resultados. `change` es la razón actual/base (para `per_s`, base/actual); los
+    tiempos se comparan por `ms_min`.
+    """
+    rows = []
+    for name, result in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            continue
+        for metric in ('ms', 'per_s', *COUNTS):
+            if metric == 'ms':
+                # el mínimo es menos sensible a la carga de la máquina que la mediana
+                old, new = base.get('ms_min', base.get('ms')), result.get('ms_min', result.get('ms'))
+            else:
+                old, new = base.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            if metric == 'ms':
+                change = new / old if old else None
+                regression = new > old * (1 + threshold) and new - old > MIN_DELTA_MS
+            elif metric == 'per_s':
+                change = old / new if new else None
+                regression = new < old / (1 + threshold)
+            else:
+                change = new / old if old else None
+                regression = new > old
+            rows.append({
+                'name': name,
+                'metric': metric,
+                'baseline': old,
+                'current': new,
+                'change': round(change, 3) if change is not None else None,
+                'regression': regression,
+            })
+    return rows
@@ -0,0 +1,160 @@
+import json
+from datetime import date, datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from monitoring.services import series
+from monitoring.services.redis_gateway import DailyStatsGateway
+
+
+class Command(BaseCommand):
+    help = "Construye los agregados diarios de Redis (sensor:agg:*) a partir de los historiales existentes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help='Día a reconstruir en formato YYYY-MM-DD (default: hoy, hora de Lima).',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Calcula y muestra los totales sin escribir en Redis.',
+        )
+
+    def handle(self, *args, **options):
+        gateway = DailyStatsGateway()
+        if not gateway.client:
+            raise CommandError('REDIS_URL no está configurado o Redis no está disponible.')
+
+        try:
+            day = date.fromisoformat(options['date']) if options['date'] else timezone.localdate()
+        except ValueError as exc:
+            raise CommandError('--date debe tener el formato YYYY-MM-DD.') from exc
+        self.day = day.isoformat()
+
+        per_sensor = {}
+        for sid in gateway._discover_sensor_ids():
+            stats = per_sensor.setdefault(sid, {})
+            history = self._history(gateway, sid)
+            for raw_ts, pct in history['humidity']:
+                if self._on_day(raw_ts):
+                    self._add(stats, 'hum', pct)
+            for raw_ts, pulse in history['vibration']:
+                if self._on_day(raw_ts):
+                    self._add(stats, 'pulse', pulse)
+            for raw_ts, state in history['inclination']:
+                if self._on_day(raw_ts):
+                    stats['tilt'] = stats.get('tilt', 0) + int(state)
+            # el snapshot histórico también sumaba los scores del ZSET de vibración
+            for member, pulse in gateway.client.zrange(gateway.VIB_STATS.format(id=sid), 0, -1, withscores=True):
+                if self._on_day(self._member_ts(member)):
+                    self._add(stats, 'pulse', float(pulse))
+
+        # alertas: cada sample con tilt/hit suma al sensor correspondiente
+        for raw, score in gateway.client.zrange(gateway.ALERT_STATS, 0, -1, withscores=True):
+            try:
+                data = json.loads(raw)
+            except ValueError:
+                continue
+            payload = data.get('payload', {})
+            epoch = score if score > 1e9 else None
+            if not self._on_day(data.get('timestamp') or payload.get('ts') or epoch):
+                continue
+            for sample in payload.get('samples', []):
+                stats = per_sensor.setdefault(sample.get('id', 1), {})
+                if sample.get('tilt') == 1:
+                    stats['tilt'] = stats.get('tilt', 0) + 1
+                if sample.get('vib', {}).get('hit', 0) == 1:
+                    stats['hit'] = stats.get('hit', 0) + 1
+
+        per_sensor = {sid: stats for sid, stats in per_sensor.items() if stats}
+        readings = sum(stats.get('hum_count', 0) for stats in per_sensor.values())
+        if options['dry_run']:
+            self.stdout.write(f'{self.day}: {len(per_sensor)} sensores, {readings} lecturas de humedad (sin escribir).')
+            return
+
+        gateway.write_daily_aggregates(self.day, per_sensor)
+        self.stdout.write(self.style.SUCCESS(
+            f'Agregados de {self.day} reconstruidos: {len(per_sensor)} sensores, {readings} lecturas de humedad.'
+        ))
+
+    def _history(self, gateway, sid):
+        """Entradas `(ts, valor)` por serie: del historial compacto si existe, si no de la lista."""
+        pipe = gateway.client.pipeline(transaction=False)
+        for _, template, packed in gateway.HISTORIES:
+            gateway.read_packed(pipe, packed.format(id=sid))
+            pipe.lrange(template.format(id=sid), 0, -1)
+        results = pipe.execute()
+        history = {}
+        for index, (kind, _, _) in enumerate(gateway.HISTORIES):
+            blob, items = results[index * 2], results[index * 2 + 1]
+            if blob:
+                # epoch 0 = timestamp ilegible al convertir: se atribuye al día, como en las listas
+                history[kind] = [(epoch or None, value) for epoch, value in series.packed_records(blob)]
+            else:
+                history[kind] = list(self._entries(items, kind))
+        return history
+
+    def _entries(self, items, kind):
+        field = {'humidity': ('porcentaje', 'pct'), 'vibration': ('pulse',), 'inclination': ('estado',)}[kind]
+        for entry in items:
+            try:
+                obj = json.loads(entry)
+            except ValueError:
+                obj = None
+            if isinstance(obj, dict):
+                value = next((obj[name] for name in field if obj.get(name) is not None), None)
+                raw_ts = obj.get('ts') or obj.get('timestamp')
+            else:
+                # legacy "timestamp:valor"
+                parts = entry.split(':')
+                if len(parts) != 2:
+                    continue
+                raw_ts, value = parts
+            try:
+                yield raw_ts, float(value)
+            except (TypeError, ValueError):
+                continue
+
+    @staticmethod
+    def _member_ts(member):
+        """Timestamp de un miembro del ZSET de vibración: JSON con `ts`, "timestamp:valor" o solo el timestamp."""
+        try:
+            obj = json.loads(member)
+        except (TypeError, ValueError):
+            obj = None
+        if isinstance(obj, dict):
+            return obj.get('ts') or obj.get('timestamp')
+        if isinstance(obj, (int, float)):
+            return obj
+        head, sep, _ = str(member).partition(':')
+        return head if sep and head.replace('.', '', 1).isdigit() else member
+
+    def _on_day(self, raw_ts):
+        """Entradas sin timestamp legible se atribuyen al día reconstruido."""
+        if raw_ts in (None, ''):
+            return True
+        try:
+            epoch = float(raw_ts)
+            if epoch > 1e12:  # milisegundos
+                epoch /= 1000
+            moment = datetime.fromtimestamp(epoch, tz=timezone.get_default_timezone())
+            return moment.date().isoformat() == self.day
+        except (TypeError, ValueError, OverflowError, OSError):
+            pass
+        text = str(raw_ts)
+        try:
+            moment = datetime.fromisoformat(text)
+        except ValueError:
+            return text[:10] == self.day or not text[:4].isdigit()
+        if timezone.is_aware(moment):
+            moment = timezone.localtime(moment)
+        return moment.date().isoformat() == self.day
+
+    @staticmethod
+    def _add(stats, prefix, value):
+        stats[f'{prefix}_count'] = stats.get(f'{prefix}_count', 0) + 1
+        stats[f'{prefix}_sum'] = stats.get(f'{prefix}_sum', 0.0) + value
+        stats[f'{prefix}_min'] = min(stats.get(f'{prefix}_min', value), value)
+        stats[f'{prefix}_max'] = max(stats.get(f'{prefix}_max', value), value)
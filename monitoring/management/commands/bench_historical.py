@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring.benchmarks import historical
+from monitoring.models import SensorSample
+
+
+class Command(BaseCommand):
+    help = "Compara las consultas del histórico con join a SensorPacket contra el timestamp desnormalizado."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Repeticiones por escenario (default: 5).',
+        )
+
+    def handle(self, *args, **options):
+        total = SensorSample.objects.count()
+        if not total:
+            raise CommandError('No hay samples: ejecuta seed_sensor_data primero.')
+        self.stdout.write(f'{total} samples en la base de datos.')
+
+        results = historical.run(repeat=max(1, options['repeat']))
+
+        self.stdout.write(f"{'escenario':>14} | {'join ms':>10} | {'desnorm. ms':>11} | {'mejora':>7}")
+        for row in results:
+            join, denormalized = row['join']['ms_avg'], row['denormalized']['ms_avg']
+            speedup = join / denormalized if denormalized else 0
+            self.stdout.write(f"{row['scenario']:>14} | {join:>10.2f} | {denormalized:>11.2f} | {speedup:>6.1f}x")
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring.benchmarks import snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara round trips y latencia del snapshot de Redis (legacy, pipeline sobre historiales "
+        "JSON o compactos, agregados diarios y desglose por sensor con buckets de 60 s) y los bytes "
+        "de historial por sensor."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sensors',
+            default='3,50,200,500',
+            help='Cantidades de sensores a evaluar, separadas por comas (default: 3,50,200,500).',
+        )
+        parser.add_argument(
+            '--entries',
+            type=int,
+            default=200,
+            help='Entradas por lista de historial (default: 200).',
+        )
+        parser.add_argument(
+            '--latency-ms',
+            type=float,
+            default=0.5,
+            help='Latencia simulada por round trip en milisegundos (default: 0.5).',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Repeticiones por escenario (default: 5).',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sensor_counts = [int(value) for value in options['sensors'].split(',') if value.strip()]
+        except ValueError as exc:
+            raise CommandError('--sensors debe ser una lista de enteros separada por comas.') from exc
+
+        results = snapshot.run(
+            sensor_counts,
+            entries=options['entries'],
+            latency_ms=options['latency_ms'],
+            repeat=max(1, options['repeat']),
+        )
+
+        modes = ('legacy', 'pipelined', 'packed', 'aggregates', 'breakdown')
+        self.stdout.write(f"{'sensores':>8} | " + " | ".join(f"{mode + ' RT':>14} | {mode + ' ms':>14}" for mode in modes))
+        for row in results:
+            self.stdout.write(f"{row['sensors']:>8} | " + " | ".join(
+                f"{row[mode]['round_trips']:>14} | {row[mode]['ms_avg']:>14.2f}" for mode in modes
+            ))
+        self.stdout.write('')
+        self.stdout.write(f"{'sensores':>8} | {'JSON B/sensor':>14} | {'compacto B/sensor':>18}")
+        for row in results:
+            sizes = row['bytes_per_sensor']
+            self.stdout.write(f"{row['sensors']:>8} | {sizes['json']:>14} | {sizes['packed']:>18}")
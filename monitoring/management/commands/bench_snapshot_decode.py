@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring.benchmarks import series as bench
+from monitoring.services import series
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la decodificación del snapshot de Redis: parser por elemento, decodificación por "
+        "lotes en array('d')/NumPy y formato compacto, y verifica que den el mismo resultado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sensors',
+            default='3,50,200,500',
+            help='Cantidades de sensores a evaluar, separadas por comas (default: 3,50,200,500).',
+        )
+        parser.add_argument('--entries', type=int, default=200, help='Entradas por lista de historial (default: 200).')
+        parser.add_argument('--repeat', type=int, default=5, help='Repeticiones por escenario; se reporta la mejor (default: 5).')
+        parser.add_argument('--legacy', action='store_true', help='Usa el formato legacy "<ts>:<valor>" en lugar de JSON.')
+
+    def handle(self, *args, **options):
+        try:
+            sensor_counts = [int(value) for value in options['sensors'].split(',') if value.strip()]
+        except ValueError as exc:
+            raise CommandError('--sensors debe ser una lista de enteros separada por comas.') from exc
+
+        results = bench.run(
+            sensor_counts,
+            entries=options['entries'],
+            repeat=max(1, options['repeat']),
+            legacy=options['legacy'],
+        )
+        backend = 'NumPy' if series.np is not None else "array('d')"
+        self.stdout.write(f"Formato: {'legacy' if options['legacy'] else 'JSON'} · estadísticas con {backend}")
+        self.stdout.write(
+            f"{'sensores':>8} | {'valores':>8} | {'bucle ms':>9} | {'lotes ms':>9} | {'x':>5} | "
+            f"{'compacto ms':>11} | {'x':>6} | iguales"
+        )
+        for row in results:
+            self.stdout.write(
+                f"{row['sensors']:>8} | {row['values']:>8} | {row['loop_ms']:>9.2f} | {row['batch_ms']:>9.2f} | "
+                f"{row['speedup']:>5} | {row['packed_ms']:>11.2f} | {row['packed_speedup']:>6} | "
+                f"{'sí' if row['matches'] else 'NO'}"
+            )
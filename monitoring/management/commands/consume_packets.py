@@ -0,0 +1,88 @@
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring.services import stream_ingest
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker de ingesta: consume paquetes del Redis Stream INGEST_STREAM con un consumer group, "
+        "los escribe en SensorPacket/SensorSample y confirma (XACK) tras el commit. "
+        "Se pueden lanzar varios procesos en paralelo con distinto --consumer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumer', help='Nombre del consumidor en el grupo (default: <host>-<pid>).')
+        parser.add_argument('--batch', type=int, default=500, help='Mensajes por lote (default: 500).')
+        parser.add_argument('--block-ms', type=int, default=2000, help='Espera máxima de XREADGROUP en ms (default: 2000).')
+        parser.add_argument(
+            '--claim-idle-ms',
+            type=int,
+            default=60000,
+            help='Reclama mensajes pendientes de otros consumidores inactivos por más de N ms (default: 60000).',
+        )
+        parser.add_argument(
+            '--max-deliveries',
+            type=int,
+            default=5,
+            help='Entregas tras las que un mensaje pasa al Stream <stream>:dead (default: 5).',
+        )
+        parser.add_argument('--metrics-every', type=float, default=10, help='Segundos entre reportes de métricas (default: 10).')
+        parser.add_argument('--once', action='store_true', help='Procesa lo disponible y termina (útil en cron o pruebas).')
+
+    def handle(self, *args, **options):
+        if min(options['batch'], options['max_deliveries']) < 1 or options['block_ms'] < 0:
+            raise CommandError('--batch y --max-deliveries deben ser positivos y --block-ms no negativo.')
+        client = stream_ingest.connect(options['block_ms'])
+        if client is None:
+            raise CommandError('REDIS_URL no está configurado o falta el paquete redis.')
+
+        consumer = stream_ingest.StreamConsumer(
+            client,
+            options['consumer'] or f"{socket.gethostname()}-{os.getpid()}",
+            batch_size=options['batch'],
+            block_ms=options['block_ms'],
+            claim_idle_ms=options['claim_idle_ms'],
+            max_deliveries=options['max_deliveries'],
+        )
+        consumer.ensure_group()
+        self.stdout.write(f"Consumidor {consumer.consumer} en {consumer.stream} (grupo {consumer.group}).")
+
+        stopping = []
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stopping.append(True))
+
+        next_report = time.monotonic() + options['metrics_every']
+        backoff = 1
+        while not stopping:
+            try:
+                processed = consumer.run_once()
+                backoff = 1
+            except Exception as exc:
+                self.stderr.write(f"Lote fallido: {exc} (reintento en {backoff}s)")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+                continue
+            if options['once'] and not processed:
+                break
+            if time.monotonic() >= next_report:
+                self._report(consumer)
+                next_report = time.monotonic() + options['metrics_every']
+        self._report(consumer)
+
+    def _report(self, consumer):
+        try:
+            consumer.refresh_lag()
+            consumer.publish_metrics()
+        except Exception as exc:
+            self.stderr.write(f"No se pudieron publicar las métricas: {exc}")
+        m = consumer.metrics
+        self.stdout.write(
+            f"{m.packets} paquetes ({m.throughput:,.0f}/s) · creados {m.created} · duplicados {m.duplicates} · "
+            f"inválidos {m.invalid} · reclamados {m.claimed} · descartados {m.dead_lettered} · "
+            f"último lote {m.last_batch_size} en {m.last_batch_ms:.0f} ms · lag {m.lag} · pendientes {m.pending}"
+        )
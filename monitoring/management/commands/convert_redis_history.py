@@ -0,0 +1,85 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring.services import series
+from monitoring.services.redis_gateway import NEVER_DECODE, WatchError, DailyStatsGateway
+
+
+class Command(BaseCommand):
+    help = (
+        "Convierte los historiales JSON/legacy (sensor:*:{id}:historico) al formato compacto "
+        "(sensor:*:{id}:packed:v1). Lo ya escrito en formato compacto se conserva detrás de lo convertido."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Cuenta entradas y bytes sin escribir en Redis.')
+        parser.add_argument(
+            '--keep-lists',
+            action='store_true',
+            help='No borra las listas originales (útil mientras conviven lectores antiguos).',
+        )
+
+    def handle(self, *args, **options):
+        gateway = DailyStatsGateway()
+        if not gateway.client:
+            raise CommandError('REDIS_URL no está configurado o Redis no está disponible.')
+
+        sensors = converted = before = after = 0
+        for sid in gateway._discover_sensor_ids():
+            sensors += 1
+            for kind, template, packed in gateway.HISTORIES:
+                list_key, packed_key = template.format(id=sid), packed.format(id=sid)
+                result = self._convert(gateway, kind, list_key, packed_key, options)
+                if result is None:
+                    continue
+                count, size_before, size_after = result
+                converted += count
+                before += size_before
+                after += size_after
+
+        verb = 'Se convertirían' if options['dry_run'] else 'Convertidas'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {converted} entradas de {sensors} sensores: '
+            f'{before / 1024:.1f} KB -> {after / 1024:.1f} KB.'
+        ))
+
+    def _convert(self, gateway, kind, list_key, packed_key, options):
+        """Convierte una lista; devuelve (entradas, bytes antes, bytes después) o None si no había lista."""
+        keep = gateway.HISTORY_MAXLEN * series.RECORD.size
+        with gateway.client.pipeline(transaction=True) as pipe:
+            for _ in range(3):
+                try:
+                    # WATCH: un APPEND/RPUSH concurrente del ingest obliga a repetir la conversión
+                    pipe.watch(list_key, packed_key)
+                    items = pipe.lrange(list_key, 0, -1)
+                    if not items:
+                        return None
+                    existing = pipe.execute_command('GET', packed_key, **{NEVER_DECODE: True}) or b''
+                    records = series.history_records(items, kind)
+                    if existing:
+                        # con REDIS_HISTORY_FORMAT=both lo más reciente ya está en ambos formatos
+                        first = series.packed_records(existing)[0][0]
+                        records = [record for record in records if record[0] < first]
+                    blob = (series.pack_records(records) + bytes(existing))[-keep:]
+                    size_before = self._memory(pipe, list_key, sum(len(item) for item in items)) + len(existing)
+                    if options['dry_run']:
+                        pipe.reset()
+                        return len(items), size_before, len(blob)
+                    pipe.multi()
+                    pipe.set(packed_key, blob)
+                    if not options['keep_lists']:
+                        pipe.delete(list_key)
+                    pipe.execute()
+                    return len(items), size_before, len(blob)
+                except Exception as exc:
+                    if WatchError is None or not isinstance(exc, WatchError):
+                        raise
+        self.stderr.write(f'{list_key}: escrituras concurrentes, se omite (volver a ejecutar).')
+        return None
+
+    @staticmethod
+    def _memory(pipe, key, fallback):
+        # MEMORY USAGE incluye el overhead de la lista; no todos los servidores lo exponen
+        try:
+            return int(pipe.memory_usage(key) or fallback)
+        except Exception:
+            return fallback
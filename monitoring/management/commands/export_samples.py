@@ -0,0 +1,51 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring.services import export, historical
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta SensorSample con los campos de su paquete en CSV, NDJSON o Parquet, leyendo por "
+        "bloques con memoria constante sin importar el tamaño del rango."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='Inicio del rango: YYYY-MM-DD o fecha-hora ISO (default: todo).')
+        parser.add_argument('--end', help='Fin del rango, incluido si es una fecha (default: todo).')
+        parser.add_argument('--format', choices=export.FORMATS, default=export.CSV, help='Formato (default: csv).')
+        parser.add_argument('--output', default='-', help='Archivo de salida o "-" para stdout (default: -).')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=export.CHUNK_SIZE,
+            help=f'Filas por lectura del cursor (default: {export.CHUNK_SIZE}).',
+        )
+
+    def handle(self, *args, **options):
+        if options['format'] not in export.available_formats():
+            raise CommandError('La exportación Parquet requiere el paquete pyarrow.')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size debe ser positivo.')
+        try:
+            start = historical.parse_moment(options['start'], '--start') if options['start'] else None
+            end = historical.parse_moment(options['end'], '--end', inclusive_day=True) if options['end'] else None
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+
+        rows = export.samples(start, end, chunk_size=options['chunk_size'])
+        written = 0
+        to_stdout = options['output'] == '-'
+        target = sys.stdout.buffer if to_stdout else open(options['output'], 'wb')
+        try:
+            for chunk in export.stream(options['format'], rows):
+                target.write(chunk)
+                written += len(chunk)
+        finally:
+            if to_stdout:
+                target.flush()
+            else:
+                target.close()
+        if not to_stdout:
+            self.stdout.write(self.style.SUCCESS(f"{written / 1024 / 1024:.1f} MB escritos en {options['output']}."))
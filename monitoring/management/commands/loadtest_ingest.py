@@ -0,0 +1,112 @@
+import json
+import random
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = "Prueba de carga del endpoint de ingesta: reporta paquetes/s y latencia de confirmación (p50/p99)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default='http://127.0.0.1:8000/ingest/packets/',
+            help='URL del endpoint de ingesta (default: http://127.0.0.1:8000/ingest/packets/).',
+        )
+        parser.add_argument('--token', help='Token Bearer (default: INGEST_TOKEN).')
+        parser.add_argument('--packets', type=int, default=10000, help='Paquetes a enviar (default: 10000).')
+        parser.add_argument('--batch', type=int, default=100, help='Paquetes por petición NDJSON (default: 100).')
+        parser.add_argument('--concurrency', type=int, default=8, help='Peticiones simultáneas (default: 8).')
+        parser.add_argument('--samples', type=int, default=3, help='Samples por paquete (default: 3).')
+
+    def handle(self, *args, **options):
+        token = options['token'] or settings.INGEST_TOKEN
+        if not token:
+            raise CommandError('Define --token o INGEST_TOKEN.')
+        if min(options['packets'], options['batch'], options['concurrency'], options['samples']) < 1:
+            raise CommandError('--packets, --batch, --concurrency y --samples deben ser positivos.')
+
+        bodies = self._build_bodies(options['packets'], options['batch'], options['samples'])
+        self.stdout.write(f"Enviando {options['packets']} paquetes en {len(bodies)} peticiones...")
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(lambda body: self._post(options['url'], token, body), bodies))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(r['latency'] for r in results)
+        ok = [r for r in results if r['status'] == 200]
+        created = sum(r['body'].get('created', 0) for r in ok)
+        duplicates = sum(r['body'].get('duplicates', 0) for r in ok)
+        failed = len(results) - len(ok)
+
+        self.stdout.write(f'Tiempo total: {elapsed:.2f} s')
+        self.stdout.write(f'Throughput: {created / elapsed:,.0f} paquetes/s ({len(results) / elapsed:,.1f} peticiones/s)')
+        self.stdout.write(
+            f'Latencia de confirmación: p50 {self._percentile(latencies, 50):.1f} ms · '
+            f'p99 {self._percentile(latencies, 99):.1f} ms · max {latencies[-1]:.1f} ms'
+        )
+        self.stdout.write(f'Creados: {created} · duplicados: {duplicates} · peticiones fallidas: {failed}')
+        if failed:
+            self.stdout.write(self.style.WARNING(f"Ejemplo de fallo: {next(r for r in results if r['status'] != 200)}"))
+
+    def _build_bodies(self, total, batch, samples):
+        rng = random.Random()
+        seq_start = int(time.time()) * 1000 % 2_000_000_000
+        base = timezone.localtime() - timedelta(seconds=total)
+        bodies, lines = [], []
+        for offset in range(total):
+            lines.append(json.dumps({
+                'seq': seq_start + offset,
+                'ts': (base + timedelta(seconds=offset)).strftime('%Y-%m-%d %H:%M:%S'),
+                'alerta': 0,
+                'samples': [
+                    {
+                        'id': sid,
+                        'soil': {'raw': rng.randint(250, 900), 'pct': round(rng.uniform(20, 90), 2)},
+                        'tilt': int(rng.random() > 0.78),
+                        'vib': {'pulse': rng.randint(40, 1400), 'hit': int(rng.random() > 0.7)},
+                    }
+                    for sid in range(1, samples + 1)
+                ],
+            }))
+            if len(lines) == batch:
+                bodies.append('\n'.join(lines).encode())
+                lines = []
+        if lines:
+            bodies.append('\n'.join(lines).encode())
+        return bodies
+
+    def _post(self, url, token, body):
+        request = urllib.request.Request(url, data=body, method='POST', headers={
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/x-ndjson',
+        })
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                status, payload = response.status, response.read()
+        except urllib.error.HTTPError as exc:
+            status, payload = exc.code, exc.read()
+        except OSError as exc:
+            status, payload = 0, json.dumps({'error': str(exc)}).encode()
+        latency = (time.perf_counter() - started) * 1000
+        try:
+            parsed = json.loads(payload)
+        except ValueError:
+            parsed = {}
+        return {'status': status, 'latency': latency, 'body': parsed}
+
+    @staticmethod
+    def _percentile(values, percent):
+        if not values:
+            return 0.0
+        index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+        return values[index]
@@ -0,0 +1,166 @@
+import asyncio
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga del SSE (/stream/): abre miles de clientes concurrentes desde un solo "
+        "proceso y reporta conexiones aceptadas, eventos recibidos y memoria del servidor."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default='http://127.0.0.1:8000/stream/',
+            help='URL del stream (default: http://127.0.0.1:8000/stream/).',
+        )
+        parser.add_argument('--clients', type=int, default=2000, help='Clientes concurrentes (default: 2000).')
+        parser.add_argument('--duration', type=float, default=30, help='Segundos que cada cliente permanece conectado (default: 30).')
+        parser.add_argument('--ramp', type=float, default=5, help='Segundos para abrir todas las conexiones (default: 5).')
+        parser.add_argument('--username', help='Usuario con el que se autentican los clientes (default: primer superusuario).')
+        parser.add_argument('--server-pid', type=int, help='PID del servidor ASGI para reportar su memoria residente (Linux).')
+
+    def handle(self, *args, **options):
+        parts = urlsplit(options['url'])
+        if parts.scheme != 'http' or not parts.hostname:
+            raise CommandError('--url debe ser http://host:puerto/ruta (sin TLS).')
+        if options['clients'] < 1 or options['duration'] <= 0:
+            raise CommandError('--clients y --duration deben ser positivos.')
+
+        session_key = self._session_for(options['username'])
+        rss_before = self._rss(options['server_pid'])
+        stats = asyncio.run(self._run(parts, session_key, options))
+        rss_after = stats.pop('rss_peak') or self._rss(options['server_pid'])
+
+        first = sorted(stats.pop('first_event_ms'))
+        self.stdout.write(f"Clientes: {options['clients']} · conectados: {stats['connected']} · "
+                          f"rechazados (503): {stats['rejected']} · fallidos: {stats['failed']}")
+        self.stdout.write(f"Conexiones simultáneas máximas: {stats['peak']}")
+        self.stdout.write(f"Eventos recibidos: {stats['events']} · heartbeats: {stats['heartbeats']} · "
+                          f"cortes del servidor: {stats['closed_by_server']}")
+        if first:
+            self.stdout.write(f"Primer evento: p50 {first[len(first) // 2]:.0f} ms · "
+                              f"p99 {first[min(len(first) - 1, int(len(first) * 0.99))]:.0f} ms")
+        if rss_before is not None:
+            per_client = (rss_after - rss_before) / max(1, stats['peak'])
+            self.stdout.write(f"Memoria del servidor: {rss_before / 1024:.1f} MB -> {rss_after / 1024:.1f} MB "
+                              f"(~{per_client:.1f} KB por conexión)")
+
+    def _session_for(self, username):
+        User = get_user_model()
+        users = User.objects.filter(username=username) if username else User.objects.filter(is_superuser=True)
+        user = users.order_by('pk').first()
+        if user is None:
+            raise CommandError('No hay usuario para autenticar: usa --username o crea un superusuario.')
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return session.session_key
+
+    async def _run(self, parts, session_key, options):
+        stats = {
+            'connected': 0, 'rejected': 0, 'failed': 0, 'events': 0, 'heartbeats': 0,
+            'closed_by_server': 0, 'open': 0, 'peak': 0, 'first_event_ms': [], 'rss_peak': None,
+        }
+        request = (
+            f"GET {parts.path or '/'} HTTP/1.1\r\n"
+            f"Host: {parts.netloc}\r\n"
+            f"Cookie: {settings.SESSION_COOKIE_NAME}={session_key}\r\n"
+            "Accept: text/event-stream\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode()
+        delay = options['ramp'] / options['clients']
+        tasks = []
+        for _ in range(options['clients']):
+            tasks.append(asyncio.create_task(
+                self._client(parts.hostname, parts.port or 80, request, options['duration'], stats)
+            ))
+            if delay:
+                await asyncio.sleep(delay)
+        sampler = asyncio.create_task(self._sample_rss(options['server_pid'], stats))
+        await asyncio.gather(*tasks)
+        sampler.cancel()
+        return stats
+
+    async def _sample_rss(self, pid, stats):
+        if pid is None:
+            return
+        while True:
+            rss = self._rss(pid)
+            if rss is not None and stats['open'] == stats['peak']:
+                stats['rss_peak'] = max(stats['rss_peak'] or 0, rss)
+            await asyncio.sleep(0.5)
+
+    async def _client(self, host, port, request, duration, stats):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+        except OSError:
+            stats['failed'] += 1
+            return
+        try:
+            writer.write(request)
+            status_line = await reader.readline()
+            try:
+                status = int(status_line.split()[1])
+            except (IndexError, ValueError):
+                stats['failed'] += 1
+                return
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            if status == 503:
+                stats['rejected'] += 1
+                return
+            if status != 200:
+                stats['failed'] += 1
+                return
+
+            stats['connected'] += 1
+            stats['open'] += 1
+            stats['peak'] = max(stats['peak'], stats['open'])
+            first_event = None
+            deadline = started + duration
+            try:
+                while (remaining := deadline - loop.time()) > 0:
+                    try:
+                        line = await asyncio.wait_for(reader.readline(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                    if not line:
+                        stats['closed_by_server'] += 1
+                        break
+                    if line.startswith(b'data:'):
+                        stats['events'] += 1
+                        if first_event is None:
+                            first_event = (loop.time() - started) * 1000
+                            stats['first_event_ms'].append(first_event)
+                    elif line.startswith(b':'):
+                        stats['heartbeats'] += 1
+            finally:
+                stats['open'] -= 1
+        except OSError:
+            stats['failed'] += 1
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _rss(pid):
+        """Memoria residente en KB leída de /proc (None si no hay PID o no es Linux)."""
+        if pid is None:
+            return None
+        try:
+            with open(f'/proc/{pid}/status') as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1])
+        except OSError:
+            return None
+        return None
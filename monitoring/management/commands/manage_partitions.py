@@ -0,0 +1,89 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring.services import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Administra las particiones mensuales de SensorSample en PostgreSQL: convierte la tabla "
+        "(o la devuelve a una tabla simple), crea los meses futuros y separa o elimina los antiguos."
+    )
+
+    def add_arguments(self, parser):
+        mode = parser.add_mutually_exclusive_group()
+        mode.add_argument(
+            '--convert',
+            action='store_true',
+            help='Convierte la tabla de samples en una tabla particionada por mes (bloquea la tabla mientras copia).',
+        )
+        mode.add_argument(
+            '--revert',
+            action='store_true',
+            help='Devuelve los samples a una tabla sin particionar.',
+        )
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=3,
+            help='Meses futuros a crear por adelantado (default: 3).',
+        )
+        parser.add_argument(
+            '--retain-months',
+            type=int,
+            help='Separa (DETACH) las particiones anteriores a los últimos N meses.',
+        )
+        parser.add_argument(
+            '--drop',
+            action='store_true',
+            help='Con --retain-months, elimina las particiones separadas y sus paquetes.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Muestra el SQL sin ejecutarlo.',
+        )
+
+    def handle(self, *args, **options):
+        if not partitions.supported():
+            self.stdout.write(self.style.WARNING(
+                'La base de datos no es PostgreSQL: los samples se mantienen en una única tabla.'
+            ))
+            return
+        if options['months_ahead'] < 0 or (options['retain_months'] is not None and options['retain_months'] < 1):
+            raise CommandError('--months-ahead no puede ser negativo y --retain-months debe ser positivo.')
+        if options['drop'] and options['retain_months'] is None:
+            raise CommandError('--drop requiere --retain-months.')
+        if options['revert'] and options['retain_months'] is not None:
+            raise CommandError('--revert no admite --retain-months.')
+
+        dry_run = options['dry_run']
+        echo = self.stdout.write if dry_run or options['verbosity'] > 1 else None
+        try:
+            if options['revert']:
+                partitions.revert(dry_run=dry_run, echo=echo)
+                if not dry_run:
+                    self.stdout.write(self.style.SUCCESS('Tabla de samples sin particionar.'))
+                return
+            if options['convert']:
+                converted = partitions.convert(months_ahead=options['months_ahead'], dry_run=dry_run, echo=echo)
+                if dry_run:
+                    # sin la conversión no hay particiones sobre las que seguir
+                    return
+                self.stdout.write(self.style.SUCCESS(f'Tabla convertida con {len(converted)} particiones mensuales.'))
+            elif not partitions.is_partitioned():
+                self.stdout.write('La tabla de samples no está particionada (usa --convert).')
+                return
+            else:
+                created = partitions.ensure_partitions(months_ahead=options['months_ahead'], dry_run=dry_run, echo=echo)
+                prefix = 'Se crearían' if dry_run else 'Particiones creadas'
+                self.stdout.write(f"{prefix}: {', '.join(p.name for p in created) or 'ninguna'}.")
+
+            if options['retain_months'] is not None:
+                removed = partitions.prune(options['retain_months'], drop=options['drop'], dry_run=dry_run, echo=echo)
+                if dry_run:
+                    action = 'Se eliminarían' if options['drop'] else 'Se separarían'
+                else:
+                    action = 'Particiones eliminadas' if options['drop'] else 'Particiones separadas'
+                self.stdout.write(f"{action}: {', '.join(p.name for p in removed) or 'ninguna'}.")
+        except partitions.PartitioningUnavailable as exc:
+            raise CommandError(str(exc)) from exc
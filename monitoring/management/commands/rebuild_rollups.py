@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring.models import SensorRollup
+from monitoring.services import rollups
+
+
+class Command(BaseCommand):
+    help = "Reconstruye los rollups por hora, día y mes a partir de SensorSample."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--granularity',
+            action='append',
+            choices=[value for value, _ in SensorRollup.GRANULARITY_CHOICES],
+            help='Granularidad a reconstruir (repetible; default: todas).',
+        )
+
+    def handle(self, *args, **options):
+        created = rollups.rebuild(options['granularity'])
+        if not created:
+            raise CommandError('No se reconstruyó ningún rollup.')
+        summary = ', '.join(f'{granularity}: {count}' for granularity, count in created.items())
+        self.stdout.write(self.style.SUCCESS(f'Rollups reconstruidos ({summary}).'))
@@ -0,0 +1,109 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring.benchmarks import suite
+
+
+class Command(BaseCommand):
+    help = (
+        "Ejecuta la suite de benchmarks (generación, rollups, dashboard e ingesta por escala de "
+        "histórico en una base de prueba aparte; snapshot, desglose y escritura en Redis por "
+        "cantidad de sensores), guarda el resultado en JSON y puede compararlo con uno anterior."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales',
+            default='month,year',
+            help=f"Escalas de histórico, separadas por comas: {', '.join(suite.SCALES)} (default: month,year).",
+        )
+        parser.add_argument(
+            '--sensors',
+            default='3,50,500',
+            help='Cantidades de sensores para los escenarios de Redis (default: 3,50,500).',
+        )
+        parser.add_argument(
+            '--db-sensors',
+            type=int,
+            default=3,
+            help='Sensores por paquete en el histórico generado (default: 3).',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Repeticiones por escenario (default: 5).',
+        )
+        parser.add_argument(
+            '--latency-ms',
+            type=float,
+            default=0.5,
+            help='Latencia simulada por round trip de Redis en milisegundos (default: 0.5).',
+        )
+        parser.add_argument('--output', help='Archivo JSON donde guardar los resultados.')
+        parser.add_argument('--compare', help='Resultado anterior (JSON) contra el que comparar.')
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.2,
+            help='Empeoramiento relativo de tiempo o throughput que cuenta como regresión (default: 0.2).',
+        )
+
+    def handle(self, *args, **options):
+        scales = [value.strip() for value in options['scales'].split(',') if value.strip()]
+        unknown = [name for name in scales if name not in suite.SCALES]
+        if unknown:
+            raise CommandError(f"Escalas desconocidas: {', '.join(unknown)}.")
+        try:
+            sensor_counts = [int(value) for value in options['sensors'].split(',') if value.strip()]
+        except ValueError as exc:
+            raise CommandError('--sensors debe ser una lista de enteros separada por comas.') from exc
+        if options['db_sensors'] < 1 or options['threshold'] < 0:
+            raise CommandError('--db-sensors debe ser positivo y --threshold no negativo.')
+
+        baseline = None
+        if options['compare']:
+            try:
+                baseline = json.loads(Path(options['compare']).read_text())
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"No se pudo leer {options['compare']}: {exc}") from exc
+
+        with suite.isolated_database():
+            result = suite.run(
+                scales=scales,
+                db_sensors=options['db_sensors'],
+                redis_sensors=sensor_counts,
+                repeat=max(1, options['repeat']),
+                latency_ms=options['latency_ms'],
+                progress=lambda message: self.stderr.write(message),
+            )
+
+        self.stdout.write(f"{'escenario':<32} | {'ms':>10} | {'ms min':>10} | {'por s':>12} | {'consultas':>9} | {'RT':>5}")
+        for name, row in result['results'].items():
+            per_s = row.get('per_s')
+            self.stdout.write(
+                f"{name:<32} | {row['ms']:>10.2f} | {row.get('ms_min', row['ms']):>10.2f} | "
+                f"{per_s if per_s is not None else '':>12} | {row.get('queries', ''):>9} | {row.get('round_trips', ''):>5}"
+            )
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(result, indent=2) + '\n')
+            self.stdout.write(f"Resultados guardados en {options['output']}.")
+
+        if baseline is None:
+            return
+        rows = suite.compare(baseline, result, options['threshold'])
+        regressions = [row for row in rows if row['regression']]
+        self.stdout.write('')
+        self.stdout.write(
+            f"Comparado con {baseline.get('meta', {}).get('commit') or options['compare']}: "
+            f"{len(rows)} métricas, {len(regressions)} regresiones (umbral {options['threshold']:.0%})."
+        )
+        for row in regressions:
+            self.stdout.write(self.style.ERROR(
+                f"  {row['name']} {row['metric']}: {row['baseline']} -> {row['current']} (x{row['change']})"
+            ))
+        if regressions:
+            raise CommandError(f'{len(regressions)} regresiones respecto de {options["compare"]}.')
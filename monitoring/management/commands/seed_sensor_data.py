@@ -1,14 +1,20 @@
-import random
-from datetime import datetime, time, timedelta
+import time
+from datetime import date
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 
-from monitoring.models import SensorPacket, SensorSample
+from monitoring.models import SensorPacket
+from monitoring.services import partitions, rollups, seeding
 
 
 class Command(BaseCommand):
-    help = "Genera datos simulados de sensores desde 2023 hasta la fecha actual."
+    help = (
+        "Genera datos simulados de sensores (por defecto desde 2023 hasta hoy). Escribe por "
+        "bloques de días con ids asignados de antemano (COPY en PostgreSQL) y puede repartir "
+        "el rango entre varios procesos."
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -18,10 +24,25 @@ class Command(BaseCommand):
             help='Número aproximado de paquetes por día (default: 12).',
         )
         parser.add_argument(
+            '--sensors',
             '--samples',
+            dest='sensors',
             type=int,
             default=3,
-            help='Cantidad de samples por paquete (default: 3).',
+            help='Sensores (samples) por paquete (default: 3). --samples se mantiene como alias.',
+        )
+        parser.add_argument('--start', help='Primer día a generar, YYYY-MM-DD (default: 2023-01-01).')
+        parser.add_argument('--end', help='Último día a generar, YYYY-MM-DD (default: hoy).')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Procesos que generan y escriben bloques de días en paralelo (solo PostgreSQL; default: 1).',
+        )
+        parser.add_argument(
+            '--no-rollups',
+            action='store_true',
+            help='No reconstruye los rollups al terminar (luego: manage.py rebuild_rollups).',
         )
         parser.add_argument(
             '--force',
@@ -31,13 +52,18 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         per_day = options['per_day']
-        per_packet_samples = options['samples']
+        sensors = options['sensors']
         force = options['force']
 
-        if per_day < 1 or per_packet_samples < 1:
-            self.stderr.write(self.style.ERROR('Los parámetros --per-day y --samples deben ser positivos.'))
+        if per_day < 1 or sensors < 1 or options['workers'] < 1:
+            self.stderr.write(self.style.ERROR('Los parámetros --per-day, --sensors y --workers deben ser positivos.'))
             return
 
+        start = self._day(options['start'], '--start') or date(2023, 1, 1)
+        end = self._day(options['end'], '--end') or timezone.localdate()
+        if end < start:
+            raise CommandError('--end no puede ser anterior a --start.')
+
         if SensorPacket.objects.exists() and not force:
             self.stdout.write(self.style.WARNING(
                 'Ya existen paquetes en la base de datos. Usa --force para regenerar los datos.'
@@ -45,62 +71,44 @@ class Command(BaseCommand):
             return
 
         if force:
-            deleted_packets, _ = SensorPacket.objects.all().delete()
+            # TRUNCATE en PostgreSQL; evita el borrado en cascada fila por fila del ORM
+            deleted_packets = partitions.truncate_history()
             self.stdout.write(self.style.WARNING(f'Se eliminaron {deleted_packets} paquetes previos.'))
 
-        tz = timezone.get_default_timezone()
-        start_date = timezone.make_aware(datetime(2023, 1, 1), tz)
-        end_date = timezone.now()
-
-        total_days = (end_date.date() - start_date.date()).days + 1
-        slot_minutes = 1440 // per_day
-        rng = random.Random(42)
+        workers = options['workers']
+        if workers > 1 and not seeding.parallel_supported():
+            self.stdout.write(self.style.WARNING('--workers solo aplica en PostgreSQL; se escribe con un proceso.'))
+            workers = 1
 
-        seq = 1
-        created_packets = 0
-        sample_buffer = []
-
-        for day_offset in range(total_days):
-            base_day = start_date + timedelta(days=day_offset)
-            base_naive = datetime.combine(base_day.date(), time.min)
-            base = timezone.make_aware(base_naive, tz)
-
-            for slot in range(per_day):
-                timestamp = base + timedelta(
-                    minutes=(slot * slot_minutes) + rng.randint(0, max(1, slot_minutes - 1))
-                )
-                packet = SensorPacket.objects.create(
-                    seq=seq,
-                    timestamp=timestamp,
-                    alerta=rng.random() > 0.85,
-                )
-                seq += 1
-                created_packets += 1
-
-                for sample_id in range(1, per_packet_samples + 1):
-                    soil_raw = rng.randint(250, 900)
-                    soil_pct = max(
-                        0,
-                        min(100, round((soil_raw / 1024) * 100 + rng.uniform(-3, 3), 2)),
-                    )
-                    sample_buffer.append(SensorSample(
-                        packet=packet,
-                        sample_id=sample_id,
-                        soil_raw=soil_raw,
-                        soil_pct=soil_pct,
-                        tilt=rng.random() > 0.78,
-                        vib_pulse=rng.randint(40, 1400),
-                        vib_hit=rng.random() > 0.7,
-                    ))
-
-                if len(sample_buffer) >= 750:
-                    SensorSample.objects.bulk_create(sample_buffer, batch_size=250)
-                    sample_buffer.clear()
-                    self.stdout.write(f'{created_packets} paquetes procesados...')
+        plan = seeding.plan(start, end, per_day, sensors)
+        self.stdout.write(
+            f'Generando {plan.packets} paquetes y {plan.samples} samples '
+            f'({start} a {end}, {workers} proceso(s))...'
+        )
+        started = time.perf_counter()
+        packets, samples = seeding.seed(
+            plan,
+            workers=workers,
+            progress=lambda done: self.stdout.write(f'{done} paquetes procesados...'),
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{samples} samples en {elapsed:.1f} s ({samples / max(elapsed, 1e-9):,.0f}/s).')
 
-        if sample_buffer:
-            SensorSample.objects.bulk_create(sample_buffer, batch_size=250)
+        if not options['no_rollups']:
+            created_rollups = rollups.rebuild()
+            self.stdout.write(f"Rollups reconstruidos ({sum(created_rollups.values())} buckets).")
 
         self.stdout.write(self.style.SUCCESS(
-            f'Datos simulados generados correctamente ({created_packets} paquetes).'
+            f'Datos simulados generados correctamente ({packets} paquetes).'
         ))
+
+    def _day(self, raw, name):
+        if not raw:
+            return None
+        try:
+            day = parse_date(raw)
+        except ValueError:
+            day = None
+        if day is None:
+            raise CommandError(f'{name} debe tener el formato YYYY-MM-DD.')
+        return day
@@ -0,0 +1,38 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .services import metrics
+
+
+class MetricsMiddleware:
+    """
+    Latencia, consultas SQL y comandos Redis de cada petición (ver `services.metrics`).
+    Con `SERVER_TIMING` los agrega a la respuesta en la cabecera `Server-Timing`.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats, token = metrics.start_request()
+        response = self.get_response(request)
+        return self._finish(request, response, stats, token)
+
+    async def __acall__(self, request):
+        stats, token = metrics.start_request()
+        response = await self.get_response(request)
+        return self._finish(request, response, stats, token)
+
+    def _finish(self, request, response, stats, token):
+        elapsed = metrics.finish_request(request, response, stats, token)
+        if getattr(settings, 'SERVER_TIMING', False):
+            response['Server-Timing'] = metrics.server_timing(stats, elapsed)
+        return response
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-18 01:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0003_alter_sensorpacket_seq'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='sensorpacket',
+            constraint=models.UniqueConstraint(fields=('seq', 'timestamp'), name='monitoring_packet_seq_ts_uniq'),
+        ),
+    ]
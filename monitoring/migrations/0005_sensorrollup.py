@@ -0,0 +1,36 @@
+# Generated by Django 5.2.3 on 2026-10-18 01:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0004_sensorpacket_seq_timestamp_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hora'), ('day', 'Día'), ('month', 'Mes')], max_length=5)),
+                ('bucket', models.DateTimeField(help_text='Inicio del periodo agregado')),
+                ('total_readings', models.PositiveBigIntegerField(default=0)),
+                ('soil_sum', models.FloatField(default=0)),
+                ('soil_min', models.FloatField(null=True)),
+                ('soil_max', models.FloatField(null=True)),
+                ('pulse_sum', models.PositiveBigIntegerField(default=0)),
+                ('pulse_min', models.PositiveIntegerField(null=True)),
+                ('pulse_max', models.PositiveIntegerField(null=True)),
+                ('tilt_events', models.PositiveBigIntegerField(default=0)),
+                ('hit_events', models.PositiveBigIntegerField(default=0)),
+                ('first_timestamp', models.DateTimeField(null=True)),
+                ('last_timestamp', models.DateTimeField(null=True)),
+            ],
+            options={
+                'ordering': ['granularity', 'bucket'],
+                'constraints': [models.UniqueConstraint(fields=('granularity', 'bucket'), name='monitoring_rollup_bucket_uniq')],
+            },
+        ),
+    ]
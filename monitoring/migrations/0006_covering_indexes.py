@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-18 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0005_sensorrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sensorpacket',
+            index=models.Index(fields=['timestamp', 'id'], name='monitoring_packet_ts_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sensorsample',
+            index=models.Index(fields=['packet', 'soil_pct', 'vib_pulse', 'tilt', 'vib_hit'], name='monitoring_sample_agg_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.3 on 2026-10-18 01:47
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 50000
+
+
+def backfill_timestamps(apps, schema_editor):
+    SensorPacket = apps.get_model('monitoring', 'SensorPacket')
+    SensorSample = apps.get_model('monitoring', 'SensorSample')
+    packet_timestamp = Subquery(
+        SensorPacket.objects.filter(pk=OuterRef('packet_id')).values('timestamp')[:1]
+    )
+    last_id = SensorSample.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+    # por rangos de id para no reescribir la tabla completa en un solo UPDATE
+    for start in range(0, last_id + 1, BATCH_SIZE):
+        SensorSample.objects.filter(
+            pk__gte=start, pk__lt=start + BATCH_SIZE, timestamp__isnull=True,
+        ).update(timestamp=packet_timestamp)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0006_covering_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sensorsample',
+            name='timestamp',
+            field=models.DateTimeField(help_text='Copia de packet.timestamp para consultar sin join', null=True),
+        ),
+        migrations.RunPython(backfill_timestamps, migrations.RunPython.noop),
+    ]
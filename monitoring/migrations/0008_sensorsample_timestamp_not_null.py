@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-18 01:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0007_sensorsample_timestamp'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='sensorsample',
+            options={'ordering': ['-timestamp']},
+        ),
+        migrations.RemoveIndex(
+            model_name='sensorsample',
+            name='monitoring_sample_agg_idx',
+        ),
+        migrations.AlterField(
+            model_name='sensorsample',
+            name='timestamp',
+            field=models.DateTimeField(help_text='Copia de packet.timestamp para consultar sin join'),
+        ),
+        migrations.AddIndex(
+            model_name='sensorsample',
+            index=models.Index(fields=['timestamp', 'soil_pct', 'vib_pulse', 'tilt', 'vib_hit'], name='monitoring_sample_ts_agg_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0008_sensorsample_timestamp_not_null'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='sensorsample',
+            constraint=models.UniqueConstraint(fields=('packet', 'sample_id', 'timestamp'), name='monitoring_sample_packet_uniq'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='sensorsample',
+            unique_together=set(),
+        ),
+    ]
@@ -14,10 +14,25 @@ class SensorPacket(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # rangos por timestamp que devuelven el id para el join con los samples
+            models.Index(fields=['timestamp', 'id'], name='monitoring_packet_ts_id_idx'),
+        ]
+        constraints = [
+            # la ingesta es idempotente: el mismo (seq, timestamp) nunca se guarda dos veces
+            models.UniqueConstraint(fields=['seq', 'timestamp'], name='monitoring_packet_seq_ts_uniq'),
+        ]
 
     def __str__(self) -> str:
         return f"Paquete #{self.seq} · {self.timestamp:%Y-%m-%d %H:%M}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'timestamp' in update_fields:
+            # mantiene la copia desnormalizada en los samples
+            self.samples.exclude(timestamp=self.timestamp).update(timestamp=self.timestamp)
+
 
 class SensorSample(models.Model):
     """
@@ -29,6 +44,7 @@ class SensorSample(models.Model):
         related_name='samples',
         on_delete=models.CASCADE,
     )
+    timestamp = models.DateTimeField(help_text="Copia de packet.timestamp para consultar sin join")
     sample_id = models.PositiveIntegerField()
     soil_raw = models.PositiveIntegerField(help_text="Humedad cruda (0-1024)")
     soil_pct = models.FloatField(help_text="Humedad porcentual")
@@ -39,11 +55,68 @@ class SensorSample(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['-packet__timestamp']
-        unique_together = ('packet', 'sample_id')
+        ordering = ['-timestamp']
         indexes = [
             models.Index(fields=['packet', 'sample_id']),
+            # rangos por timestamp que cubren las columnas que agrega el dashboard
+            models.Index(
+                fields=['timestamp', 'soil_pct', 'vib_pulse', 'tilt', 'vib_hit'],
+                name='monitoring_sample_ts_agg_idx',
+            ),
+        ]
+        constraints = [
+            # equivale a (packet, sample_id): timestamp es el del paquete. Incluye la columna
+            # porque una tabla particionada (`manage_partitions --convert`) lo exige
+            models.UniqueConstraint(
+                fields=['packet', 'sample_id', 'timestamp'],
+                name='monitoring_sample_packet_uniq',
+            ),
         ]
 
     def __str__(self) -> str:
         return f"Sample {self.sample_id} del paquete #{self.packet.seq}"
+
+    def save(self, *args, **kwargs):
+        # bulk_create no pasa por aquí: quien lo use debe copiar packet.timestamp
+        if self.timestamp is None and self.packet_id:
+            self.timestamp = self.packet.timestamp
+        super().save(*args, **kwargs)
+
+
+class SensorRollup(models.Model):
+    """
+    Agregados pre-calculados del histórico por hora, día y mes (hora de Lima).
+    Se actualizan en cada ingesta y pueden reconstruirse con `rebuild_rollups`.
+    """
+
+    HOUR = 'hour'
+    DAY = 'day'
+    MONTH = 'month'
+    GRANULARITY_CHOICES = [
+        (HOUR, 'Hora'),
+        (DAY, 'Día'),
+        (MONTH, 'Mes'),
+    ]
+
+    granularity = models.CharField(max_length=5, choices=GRANULARITY_CHOICES)
+    bucket = models.DateTimeField(help_text="Inicio del periodo agregado")
+    total_readings = models.PositiveBigIntegerField(default=0)
+    soil_sum = models.FloatField(default=0)
+    soil_min = models.FloatField(null=True)
+    soil_max = models.FloatField(null=True)
+    pulse_sum = models.PositiveBigIntegerField(default=0)
+    pulse_min = models.PositiveIntegerField(null=True)
+    pulse_max = models.PositiveIntegerField(null=True)
+    tilt_events = models.PositiveBigIntegerField(default=0)
+    hit_events = models.PositiveBigIntegerField(default=0)
+    first_timestamp = models.DateTimeField(null=True)
+    last_timestamp = models.DateTimeField(null=True)
+
+    class Meta:
+        ordering = ['granularity', 'bucket']
+        constraints = [
+            models.UniqueConstraint(fields=['granularity', 'bucket'], name='monitoring_rollup_bucket_uniq'),
+        ]
+
+    def __str__(self) -> str:
+        return f"Rollup {self.granularity} · {self.bucket:%Y-%m-%d %H:%M}"
@@ -0,0 +1,280 @@
+"""
+Hub de difusión por proceso: una sola suscripción Redis (pub/sub) reparte cada paquete
+nuevo a todos los clientes SSE conectados.
+
+`DailyStatsGateway.record_packets` publica cada paquete ya serializado en
+`sensor:packets`; el hub arma el frame SSE una única vez y lo encola en la cola acotada de
+cada cliente. Si un cliente no vacía su cola, se descarta su frame más antiguo (se queda
+con los más recientes) y, tras demasiados descartes sin llegar a vaciarla, se le desconecta
+para que el navegador reconecte y se resincronice con el snapshot.
+
+Cada frame lleva `id: <seq>` y el hub guarda los últimos en memoria (cargados al arrancar
+desde el Stream `sensor:packets:log`). Un navegador que reconecta envía `Last-Event-ID` y
+recibe solo los paquetes posteriores; si ese id ya no está en el buffer recibe un evento
+`reset` y vuelve a pedir el snapshot.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from . import sse
+from .redis_gateway import DailyStatsGateway
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+CLOSED = object()
+RESET_FRAME = sse.format_event("{}", event="reset").encode()
+
+
+class Subscription:
+
+    def __init__(self, hub, maxsize, last_event_id=None):
+        self.hub = hub
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.last_event_id = last_event_id
+        self.dropped = 0
+        self.closed = False
+
+    def offer(self, key, frame):
+        """Encola sin bloquear; con la cola llena descarta el frame más antiguo."""
+        if self.closed:
+            return
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            self.hub.dropped += 1
+            if self.dropped >= self.hub.max_dropped:
+                self.hub.slow_disconnects += 1
+                self.close()
+                return
+        self.queue.put_nowait((key, frame))
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(CLOSED)
+
+    async def events(self, heartbeat=None):
+        """Frames SSE (bytes) para el cliente; heartbeat en los silencios. Termina si se cierra."""
+        heartbeat = heartbeat or getattr(settings, 'SSE_HEARTBEAT_SECONDS', 15)
+        try:
+            replayed = set()
+            if self.last_event_id is not None:
+                await self.hub.wait_ready(timeout=heartbeat)
+                backlog = self.hub.replay_after(self.last_event_id)
+                if backlog is None:
+                    yield RESET_FRAME
+                else:
+                    for key, frame in backlog:
+                        replayed.add(key)
+                        yield frame
+            while True:
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield sse.HEARTBEAT.encode()
+                    continue
+                if item is CLOSED:
+                    return
+                key, frame = item
+                if self.queue.empty():
+                    # al día: solo cuentan los descartes de un retraso sostenido
+                    self.dropped = 0
+                if key not in replayed:
+                    yield frame
+        finally:
+            self.hub.unsubscribe(self)
+
+
+class BroadcastHub:
+    CHANNEL = DailyStatsGateway.PACKET_CHANNEL
+    LOG = DailyStatsGateway.PACKET_LOG
+
+    def __init__(self, queue_size=None, max_dropped=None, replay_size=None):
+        self._queue_size = queue_size
+        self._max_dropped = max_dropped
+        self._replay_size = replay_size
+        self.subscribers = set()
+        # (seq, ts) -> (seq, frame), en orden de llegada
+        self.backlog = OrderedDict()
+        self._ready = None
+        self._task = None
+        self._loop = None
+        # `subscribe` y el fin de `_run` deciden bajo este lock si hay que relanzar la tarea
+        self._lock = threading.Lock()
+        self.messages = 0
+        self.replayed = 0
+        self.resets = 0
+        self.dropped = 0
+        self.slow_disconnects = 0
+
+    @property
+    def queue_size(self):
+        if self._queue_size is not None:
+            return self._queue_size
+        return getattr(settings, 'SSE_CLIENT_QUEUE', 32)
+
+    @property
+    def max_dropped(self):
+        if self._max_dropped is not None:
+            return self._max_dropped
+        return getattr(settings, 'SSE_SLOW_CLIENT_DROPS', 128)
+
+    @property
+    def replay_size(self):
+        if self._replay_size is not None:
+            return self._replay_size
+        return getattr(settings, 'SSE_REPLAY_SIZE', 500)
+
+    @staticmethod
+    def available():
+        return aioredis is not None and bool(getattr(settings, 'REDIS_URL', None))
+
+    def subscribe(self, last_event_id=None):
+        """Registra un cliente y arranca la suscripción a Redis si aún no corre en este loop."""
+        subscription = Subscription(self, self.queue_size, last_event_id)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self.subscribers.add(subscription)
+            if self._task is None or self._task.done() or self._loop is not loop:
+                self._loop = loop
+                self._ready = asyncio.Event()
+                self._task = loop.create_task(self._run())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self.subscribers.discard(subscription)
+
+    async def wait_ready(self, timeout):
+        """Espera a que el buffer se haya cargado desde Redis (o a que eso haya fallado)."""
+        if self._ready is None:
+            return
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def replay_after(self, last_event_id):
+        """Frames posteriores al último `seq` == `last_event_id`; None si ya salió del buffer."""
+        entries = list(self.backlog.items())
+        for index in range(len(entries) - 1, -1, -1):
+            if entries[index][1][0] == str(last_event_id):
+                missed = [(key, frame) for key, (_, frame) in entries[index + 1:]]
+                self.replayed += len(missed)
+                return missed
+        self.resets += 1
+        return None
+
+    def broadcast(self, data):
+        """Serializa el frame una vez, lo guarda en el buffer y lo reparte a todas las colas."""
+        remembered = self._remember(data)
+        if remembered is None:
+            return
+        self.messages += 1
+        key, frame = remembered
+        for subscription in list(self.subscribers):
+            subscription.offer(key, frame)
+
+    def _remember(self, data):
+        try:
+            packet = json.loads(data)
+            seq = str(packet["seq"])
+            key = (seq, packet.get("ts"))
+        except (ValueError, TypeError, KeyError):
+            logger.warning("Paquete inválido en %s: %.80r", self.CHANNEL, data)
+            return None
+        if key in self.backlog:
+            return None
+        frame = sse.format_event(data, event_id=seq).encode()
+        self.backlog[key] = (seq, frame)
+        while len(self.backlog) > self.replay_size:
+            self.backlog.popitem(last=False)
+        return key, frame
+
+    def stats(self):
+        return {
+            'subscribers': len(self.subscribers),
+            'messages': self.messages,
+            'backlog': len(self.backlog),
+            'replayed': self.replayed,
+            'resets': self.resets,
+            'dropped': self.dropped,
+            'slow_disconnects': self.slow_disconnects,
+            'listening': self._task is not None and not self._task.done(),
+        }
+
+    async def _seed(self, client):
+        """
+        Carga el buffer desde el Stream y devuelve el último id leído. Al arrancar solo llena
+        el buffer; tras un corte, además reparte lo que llegó mientras no había suscripción.
+        """
+        resumed = bool(self.backlog)
+        entries = await client.xrevrange(self.LOG, count=self.replay_size)
+        for _, fields in reversed(entries):
+            if resumed:
+                self.broadcast(fields.get("data", ""))
+            else:
+                self._remember(fields.get("data", ""))
+        return entries[0][0] if entries else "0-0"
+
+    async def _catch_up(self, client, last_id):
+        for _, fields in await client.xrange(self.LOG, min=f"({last_id}"):
+            self.broadcast(fields.get("data", ""))
+
+    async def _run(self):
+        backoff = 1
+        while True:
+            client = aioredis.from_url(
+                settings.REDIS_URL,
+                decode_responses=True,
+                socket_connect_timeout=getattr(settings, 'REDIS_CONNECT_TIMEOUT', 0.5),
+                health_check_interval=getattr(settings, 'REDIS_HEALTH_CHECK_INTERVAL', 30),
+            )
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                # lo publicado entre la lectura del Stream y la suscripción se recupera
+                # releyendo el Stream; lo que llegue por ambos lados lo descarta `_remember`
+                last_id = await self._seed(client)
+                await pubsub.subscribe(self.CHANNEL)
+                await self._catch_up(client, last_id)
+                self._ready.set()
+                backoff = 1
+                while self.subscribers:
+                    message = await pubsub.get_message(timeout=1.0)
+                    if message and message['type'] == 'message':
+                        self.broadcast(message['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self._ready.set()
+                logger.warning("Suscripción Redis del hub interrumpida: %s (reintento en %ss)", exc, backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                await pubsub.aclose()
+                await client.aclose()
+            # un cliente que llegue mientras se cierra la conexión ve la tarea viva y no la
+            # relanza: o lo ve este chequeo, o `subscribe` encuentra `_task` vacío
+            with self._lock:
+                if not self.subscribers:
+                    if self._task is asyncio.current_task():
+                        self._task = None
+                    return
+
+
+hub = BroadcastHub()
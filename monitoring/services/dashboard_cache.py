@@ -0,0 +1,116 @@
+"""
+Cache del contexto histórico del dashboard (KPIs, storyline, eventos y `chart_data`) y de
+sus fragmentos renderizados, en el alias `dashboard` de `CACHES` (LocMem por defecto; Redis
+con `DASHBOARD_CACHE_URL`).
+
+La clave es la tupla normalizada de filtros más un sello de versión de los datos. Hay dos
+contadores: `history` cambia cuando se reescribe el histórico (rollups reconstruidos,
+seed, borrado) o llega un paquete atrasado a un periodo cerrado; `current` cambia con cada
+lote ingerido. Un periodo cerrado (termina antes de las ventanas de tendencia de 30 días)
+solo depende de `history` y se guarda sin expiración; el resto depende también de
+`current` y del día, y expira a los `DASHBOARD_CACHE_TIMEOUT` segundos.
+
+Con LocMem cada proceso tiene su propio cache y sus propias versiones: la ingesta de otro
+proceso (p. ej. `consume_packets`) solo se ve al expirar la entrada. Con varios procesos
+conviene Redis.
+"""
+from __future__ import annotations
+
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from .historical import WINDOW_DAYS, local_midnight
+
+ALIAS = 'dashboard'
+HISTORY_KEY = 'dashboard:version:history'
+CURRENT_KEY = 'dashboard:version:current'
+
+_building = {}
+_building_guard = threading.Lock()
+
+
+def _cache():
+    return caches[ALIAS]
+
+
+def closed_before(today=None):
+    """Los periodos que terminan antes de este instante ya no cambian con la ingesta normal."""
+    return local_midnight((today or timezone.localdate()) - timedelta(days=2 * WINDOW_DAYS))
+
+
+def versions():
+    stored = _cache().get_many([HISTORY_KEY, CURRENT_KEY])
+    return stored.get(HISTORY_KEY, 0), stored.get(CURRENT_KEY, 0)
+
+
+def _bump(key):
+    cache = _cache()
+    # add() no pisa un valor existente; incr() es atómico en Redis
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # la clave expiró o se desalojó entre add() e incr()
+        cache.set(key, 1, timeout=None)
+
+
+def bump(timestamps):
+    """Llamar tras confirmar un lote ingerido con estos timestamps."""
+    if not timestamps:
+        return
+    if min(timestamps) < closed_before():
+        _bump(HISTORY_KEY)
+    _bump(CURRENT_KEY)
+
+
+def invalidate():
+    """Invalida todo el histórico cacheado (al confirmarse la transacción en curso, si la hay)."""
+    transaction.on_commit(lambda: (_bump(HISTORY_KEY), _bump(CURRENT_KEY)))
+
+
+def entry(filters, end_year, ranges, today=None):
+    """
+    `(clave, timeout)` del contexto para estos filtros. `ranges` son los de
+    `historical.period_ranges` (None = histórico completo, nunca cerrado).
+    """
+    today = today or timezone.localdate()
+    history, current = versions()
+    parts = [
+        'dashboard:historical',
+        f'h{history}',
+        'rollups' if settings.DASHBOARD_USE_ROLLUPS else 'samples',
+        *(str(filters[name] or '') for name in ('year', 'month', 'day')),
+        str(end_year),
+    ]
+    if ranges is not None and all(end <= closed_before(today) for _, end in ranges):
+        return ':'.join(parts), None
+    return ':'.join([*parts, f'c{current}', today.isoformat()]), settings.DASHBOARD_CACHE_TIMEOUT
+
+
+def get_or_build(key, timeout, build):
+    """
+    Contexto cacheado o `build()`. Los widgets del dashboard piden la misma clave en paralelo:
+    dentro del proceso solo uno la calcula y el resto espera y la lee del cache.
+    """
+    cache = _cache()
+    context = cache.get(key)
+    if context is not None:
+        return context
+    with _building_guard:
+        lock = _building.setdefault(key, threading.Lock())
+    try:
+        with lock:
+            context = cache.get(key)
+            if context is None:
+                context = build()
+                cache.set(key, context, timeout=timeout)
+    finally:
+        with _building_guard:
+            if _building.get(key) is lock:
+                del _building[key]
+    return context
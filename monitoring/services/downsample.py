@@ -0,0 +1,266 @@
+"""
+Series de humedad y pulso para un gráfico con zoom: como máximo `points` puntos para
+cualquier rango, sin cargar todos los samples en memoria.
+
+La fuente se elige por el ancho de bucket que pide el rango: rollups diarios u horarios
+cuando su resolución alcanza (tres años son ~26 mil filas horarias) y, para zooms más
+finos, `SensorSample` agrupado en la base de datos por bucket de tiempo (GROUP BY sobre el
+epoch del timestamp), que devuelve como mucho unas pocas miles de filas. Las filas se leen
+con `.iterator()` y se recorren una sola vez.
+
+- `minmax`: mínimo, promedio y máximo por bucket de tiempo fijo. Son exactos con cualquier
+  fuente: rollups y grupos guardan min/max/suma/conteo.
+- `lttb`: Largest-Triangle-Three-Buckets sobre los promedios de las filas (rollups o grupos
+  `LTTB_OVERSAMPLE` veces más finos que el resultado). Conserva la forma de la curva; se
+  calcula en streaming con memoria de un bucket.
+"""
+from __future__ import annotations
+
+import math
+from datetime import datetime
+
+from django.db.models import Count, F, FloatField, Func, Max, Min, Sum
+from django.db.models.functions import Floor
+
+from monitoring.models import SensorPacket, SensorRollup, SensorSample
+from monitoring.services.rollups import bucket_start
+
+MINMAX = 'minmax'
+LTTB = 'lttb'
+METHODS = (MINMAX, LTTB)
+
+SAMPLES = 'samples'
+# granularidad de rollup -> segundos que cubre cada fila (el mes no se usa: es irregular)
+ROLLUP_SECONDS = {
+    SensorRollup.DAY: 86400,
+    SensorRollup.HOUR: 3600,
+}
+CHUNK_SIZE = 5000
+# grupos de samples por punto pedido cuando LTTB parte de los samples
+LTTB_OVERSAMPLE = 4
+
+# (suma, mínimo, máximo) por serie en SensorRollup, y la columna en SensorSample
+SERIES = {
+    'humidity': ('soil_pct', 'soil_sum', 'soil_min', 'soil_max'),
+    'pulse': ('vib_pulse', 'pulse_sum', 'pulse_min', 'pulse_max'),
+}
+
+
+class Epoch(Func):
+    """Segundos desde 1970 de un DateTimeField (PostgreSQL y SQLite)."""
+
+    # EXTRACT devuelve numeric desde PostgreSQL 14: se castea para recibir float
+    template = 'CAST(EXTRACT(EPOCH FROM %(expressions)s) AS double precision)'
+    output_field = FloatField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # julianday acumula error de ~1e-5 s: se redondea a milisegundos
+        template = 'ROUND((julianday(%(expressions)s) - 2440587.5) * 86400.0, 3)'
+        return self.as_sql(compiler, connection, template=template, **extra_context)
+
+
+def data_bounds():
+    """Primer y último timestamp del histórico (índice de SensorPacket.timestamp)."""
+    bounds = SensorPacket.objects.aggregate(first=Min('timestamp'), last=Max('timestamp'))
+    return bounds['first'], bounds['last']
+
+
+def choose_source(start, end, points, use_rollups=True):
+    """La granularidad más gruesa cuyo bucket no supera el ancho pedido; samples si ninguna."""
+    width = (end - start).total_seconds() / points
+    if use_rollups:
+        for granularity, seconds in ROLLUP_SECONDS.items():
+            if width >= seconds and SensorRollup.objects.filter(granularity=granularity).exists():
+                return granularity
+    return SAMPLES
+
+
+def chart_series(start, end, points=500, method=MINMAX, use_rollups=True):
+    """Humedad y pulso entre `[start, end)` reducidos a `points` buckets (minmax) o puntos (lttb)."""
+    source = choose_source(start, end, points, use_rollups)
+    slots = points * LTTB_OVERSAMPLE if method == LTTB else points
+    queryset = _queryset(source, start, end, slots)
+    if method == LTTB:
+        # cada fila ocupa un lugar de una grilla de tiempo conocida: no hace falta contarlas
+        origin, width, total = _grid(source, start, end, slots)
+        reducers = [LargestTriangle(total, points, origin, width) for _ in SERIES]
+    else:
+        reducers = [MinMaxBuckets(start, end, points) for _ in SERIES]
+
+    rows = 0
+    for epoch, count, values in _rows(queryset):
+        rows += 1
+        if not count:
+            continue
+        for reducer, (total, low, high) in zip(reducers, values):
+            if total is not None:
+                reducer.add(epoch, count, total, low, high)
+
+    return {
+        'method': method,
+        'source': source,
+        'start': start,
+        'end': end,
+        'points': points,
+        'rows': rows,
+        'bucket_seconds': round((end - start).total_seconds() / points, 3) if method == MINMAX else None,
+        **{name: reducer.finish() for name, reducer in zip(SERIES, reducers)},
+    }
+
+
+def _grid(source, start, end, slots):
+    """`(origen, ancho, lugares)` de la grilla en la que caen las filas de `_queryset`."""
+    if source == SAMPLES:
+        return start.timestamp(), (end - start).total_seconds() / slots, slots
+    origin = bucket_start(start, source).timestamp()
+    width = ROLLUP_SECONDS[source]
+    return origin, width, math.ceil((end.timestamp() - origin) / width)
+
+
+def _queryset(source, start, end, slots):
+    """Filas `(epoch, conteo, suma, mín, máx por serie)` en orden de tiempo, de cualquier fuente."""
+    if source != SAMPLES:
+        columns = ['total_readings']
+        for _, *rollup_columns in SERIES.values():
+            columns += rollup_columns
+        # el bucket que contiene `start` empieza antes: se incluye, como el que contiene `end`
+        return (
+            SensorRollup.objects
+            .filter(granularity=source, bucket__gte=bucket_start(start, source), bucket__lt=end)
+            .order_by('bucket')
+            .values_list('bucket', *columns)
+        )
+
+    # cada sample cae en uno de `slots` grupos de tiempo; la base de datos los agrega
+    width = (end - start).total_seconds() / slots
+    aggregates = {'readings': Count('id')}
+    for name, (column, *_) in SERIES.items():
+        aggregates.update({
+            f'{name}_sum': Sum(column),
+            f'{name}_min': Min(column),
+            f'{name}_max': Max(column),
+        })
+    return (
+        SensorSample.objects
+        .filter(timestamp__gte=start, timestamp__lt=end)
+        .annotate(slot=Floor((Epoch('timestamp') - start.timestamp()) / width))
+        .values('slot')
+        .annotate(**aggregates)
+        .order_by('slot')
+        .values_list(start.timestamp() + F('slot') * width, *aggregates)
+    )
+
+
+def _rows(queryset):
+    """`(epoch, conteo, ((suma, mín, máx) por serie))`, en streaming."""
+    for moment, count, *values in queryset.iterator(chunk_size=CHUNK_SIZE):
+        epoch = moment.timestamp() if isinstance(moment, datetime) else float(moment)
+        yield epoch, count, [values[index:index + 3] for index in range(0, len(values), 3)]
+
+
+class MinMaxBuckets:
+    """Buckets de tiempo de ancho fijo con conteo, suma, mínimo y máximo."""
+
+    def __init__(self, start, end, points):
+        self.start = start.timestamp()
+        self.width = (end - start).total_seconds() / points
+        self.points = points
+        self.buckets = {}
+
+    def add(self, epoch, count, total, low, high):
+        # el epsilon absorbe el redondeo de `inicio + grupo * ancho` calculado en SQL; el
+        # rollup que contiene el inicio empieza antes y cae en el primer bucket
+        index = min(max(math.floor((epoch - self.start) / self.width + 1e-6), 0), self.points - 1)
+        bucket = self.buckets.get(index)
+        if bucket is None:
+            self.buckets[index] = [count, total, low, high]
+            return
+        bucket[0] += count
+        bucket[1] += total
+        if low < bucket[2]:
+            bucket[2] = low
+        if high > bucket[3]:
+            bucket[3] = high
+
+    def finish(self):
+        columns = {'t': [], 'min': [], 'avg': [], 'max': []}
+        for index in sorted(self.buckets):
+            count, total, low, high = self.buckets[index]
+            columns['t'].append(int((self.start + index * self.width) * 1000))
+            columns['min'].append(low)
+            columns['avg'].append(round(total / count, 2))
+            columns['max'].append(high)
+        return columns
+
+
+class LargestTriangle:
+    """
+    LTTB incremental: recibe los puntos en orden (`add`) y solo guarda el bucket anterior y
+    el actual. Cada punto ocupa un lugar de una grilla de `total` lugares (`origin` + i *
+    `width`; por defecto, uno por punto): los buckets se reparten sobre la grilla y un hueco
+    sin datos deja buckets vacíos. El primer y el último punto se conservan; si hay menos
+    lugares que `threshold`, se devuelven todos.
+    """
+
+    def __init__(self, total, threshold, origin=0.0, width=None):
+        self.threshold = threshold
+        self.every = (total - 2) / (threshold - 2) if 2 < threshold < total else None
+        self.origin = origin
+        self.width = width
+        self.selected = []
+        self.pending = None
+        self.filling = []
+        self.bucket = 0
+        self.index = 0
+
+    def add(self, epoch, count, total, low=None, high=None):
+        point = (epoch, total / count)
+        index = self.index
+        if self.width:
+            # el orden manda si el lugar calculado retrocede (p. ej. un cambio de horario)
+            index = max(round((epoch - self.origin) / self.width), index)
+        self.index = index + 1
+        if self.every is None or not self.selected:
+            self.selected.append(point)
+            return
+        # el último bucket se queda con lo que sobre (incluido el punto final)
+        while self.bucket < self.threshold - 3 and index >= math.floor((self.bucket + 1) * self.every) + 1:
+            self._close()
+        self.filling.append(point)
+
+    def _close(self):
+        # un bucket vacío no reemplaza al pendiente: este espera al siguiente con datos
+        if self.filling:
+            if self.pending:
+                self._select(self.pending, _centroid(self.filling))
+            self.pending, self.filling = self.filling, []
+        self.bucket += 1
+
+    def _select(self, points, following):
+        if not points or following is None:
+            return
+        a_t, a_v = self.selected[-1]
+        c_t, c_v = following
+        best = max(points, key=lambda point: abs((a_t - c_t) * (point[1] - a_v) - (a_t - point[0]) * (c_v - a_v)))
+        self.selected.append(best)
+
+    def finish(self):
+        if self.every is not None and (self.filling or self.pending):
+            last = self.filling.pop() if self.filling else self.pending.pop()
+            if self.pending:
+                self._select(self.pending, _centroid(self.filling) or last)
+            self._select(self.filling, last)
+            self.selected.append(last)
+        return {
+            't': [int(epoch * 1000) for epoch, _ in self.selected],
+            'value': [round(value, 2) for _, value in self.selected],
+        }
+
+
+def _centroid(points):
+    if not points:
+        return None
+    return (
+        math.fsum(point[0] for point in points) / len(points),
+        math.fsum(point[1] for point in points) / len(points),
+    )
@@ -0,0 +1,254 @@
+"""
+Capa de consultas del dashboard histórico.
+
+Produce en una sola pasada todo lo que necesitan los helpers de `DashboardView`
+(estadísticas globales, ventanas de 30 días, rango y serie mensual), ya sea desde los
+rollups o directamente desde `SensorSample` con agregados condicionales.
+"""
+from __future__ import annotations
+
+from calendar import monthrange
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from monitoring.models import SensorRollup
+
+from .rollups import COUNTERS, bucket_start, empty_bucket, merge_bounds
+
+WINDOW_DAYS = 30
+
+
+@dataclass
+class HistoricalSummary:
+    global_stats: dict | None
+    trend_windows: dict
+    monthly: list
+
+
+def fold(rows):
+    """Combina buckets (rollups o grupos mensuales) en las estadísticas globales del dashboard."""
+    total = empty_bucket()
+    for row in rows:
+        for field in COUNTERS:
+            total[field] += row[field] or 0
+        merge_bounds(total, row)
+    if not total['total_readings']:
+        return None
+    count = total['total_readings']
+    return {
+        'total_readings': count,
+        'avg_pulse': total['pulse_sum'] / count,
+        'avg_humidity': total['soil_sum'] / count,
+        'hit_events': total['hit_events'],
+        'inclination_events': total['tilt_events'],
+        'humidity_peak': total['soil_max'],
+        'humidity_floor': total['soil_min'],
+        'pulse_peak': total['pulse_max'],
+        'first_timestamp': total['first_timestamp'],
+        'last_timestamp': total['last_timestamp'],
+    }
+
+
+def _window(stats):
+    stats = stats or {}
+    return {
+        'total_readings': stats.get('total_readings', 0),
+        'hit_events': stats.get('hit_events', 0),
+        'inclination_events': stats.get('inclination_events', 0),
+        'avg_humidity': stats.get('avg_humidity'),
+    }
+
+
+def _window_bounds(today):
+    recent_start = today - timedelta(days=WINDOW_DAYS)
+    previous_start = recent_start - timedelta(days=WINDOW_DAYS)
+    return local_midnight(previous_start), local_midnight(recent_start)
+
+
+def local_midnight(day: date):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+# -------------------------------
+# RANGOS DE TIEMPO
+# -------------------------------
+def period_ranges(filters, first_year, last_year):
+    """
+    Traduce los filtros año/mes/día a rangos semiabiertos `[inicio, fin)` en hora de Lima,
+    para que las consultas comparen el timestamp directamente y puedan usar su índice
+    (EXTRACT o el cast a fecha lo impiden). Sin año, el mes o el día se repiten en cada año
+    entre `first_year` y `last_year`. None si no hay filtros.
+    """
+    if not any(filters.values()):
+        return None
+    years = [filters['year']] if filters['year'] else range(first_year, last_year + 1)
+    months = [filters['month']] if filters['month'] else range(1, 13)
+    ranges = []
+    for year in years:
+        if not filters['month'] and not filters['day']:
+            ranges.append((date(year, 1, 1), date(year + 1, 1, 1)))
+            continue
+        for month in months:
+            if not filters['day']:
+                ranges.append((date(year, month, 1), _next_month(year, month)))
+            elif filters['day'] <= monthrange(year, month)[1]:
+                day = date(year, month, filters['day'])
+                ranges.append((day, day + timedelta(days=1)))
+    return [(local_midnight(start), local_midnight(end)) for start, end in ranges]
+
+
+def parse_moment(raw, name, inclusive_day=False):
+    """
+    `YYYY-MM-DD` (medianoche de Lima) o fecha-hora ISO 8601 -> datetime aware. Con
+    `inclusive_day` una fecha sola apunta al día siguiente (límite de fin semiabierto).
+    """
+    try:
+        day = parse_date(raw)
+        if day is not None:
+            return local_midnight(day + timedelta(days=1) if inclusive_day else day)
+        moment = parse_datetime(raw)
+        if moment is None:
+            raise ValueError
+    except ValueError:
+        raise ValueError(f'{name} debe ser YYYY-MM-DD o una fecha-hora ISO 8601') from None
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+def range_q(field, ranges):
+    """Q con `field >= inicio AND field < fin` por cada rango (OR entre rangos)."""
+    if ranges is None:
+        return Q()
+    q = Q(pk__in=[])
+    for start, end in ranges:
+        q |= Q(**{f'{field}__gte': start, f'{field}__lt': end})
+    return q
+
+
+def _next_month(year, month):
+    return date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+
+
+# -------------------------------
+# DESDE ROLLUPS
+# -------------------------------
+def from_rollups(filters, ranges, start_date, today=None):
+    """
+    Una consulta sobre rollups: meses (o días si hay filtro de día) para las cifras
+    globales y días recientes para las ventanas de 30 días. None si no hay rollups.
+    """
+    previous_from, recent_from = _window_bounds(today or timezone.localdate())
+    granularity = SensorRollup.DAY if filters['day'] else SensorRollup.MONTH
+
+    period = range_q('bucket', ranges) & Q(bucket__gte=local_midnight(start_date))
+    rows = list(
+        SensorRollup.objects
+        .filter(
+            period & (
+                Q(granularity=granularity)
+                | Q(granularity=SensorRollup.DAY, bucket__gte=previous_from)
+            )
+        )
+        .values('granularity', 'bucket', *empty_bucket())
+        .order_by('bucket')
+    )
+    if not rows and not SensorRollup.objects.exists():
+        return None
+
+    main = [row for row in rows if row['granularity'] == granularity]
+    daily = [
+        row for row in rows
+        if row['granularity'] == SensorRollup.DAY and row['bucket'] >= previous_from
+    ]
+    return HistoricalSummary(
+        global_stats=fold(main),
+        trend_windows={
+            'recent': _window(fold(row for row in daily if row['bucket'] >= recent_from)),
+            'previous': _window(fold(row for row in daily if row['bucket'] < recent_from)),
+        },
+        monthly=_monthly(main),
+    )
+
+
+def _monthly(rows):
+    months = {}
+    for row in rows:
+        months.setdefault(bucket_start(row['bucket'], SensorRollup.MONTH), []).append(row)
+    series = []
+    for month in sorted(months):
+        stats = fold(months[month])
+        if stats:
+            series.append({'month': month, 'avg_pulse': stats['avg_pulse'], 'avg_humidity': stats['avg_humidity']})
+    return series
+
+
+# -------------------------------
+# DESDE SAMPLES (una sola pasada)
+# -------------------------------
+def from_samples(qs, today=None, time_field='timestamp'):
+    """
+    Recorre el queryset filtrado una sola vez agrupando por mes; las ventanas de 30 días
+    se calculan como agregados condicionales dentro del mismo GROUP BY.
+    `time_field='packet__timestamp'` reproduce la consulta con join (ver `bench_historical`).
+    """
+    previous_from, recent_from = _window_bounds(today or timezone.localdate())
+    windows = {
+        'recent': Q(**{f'{time_field}__gte': recent_from}),
+        'previous': Q(**{f'{time_field}__gte': previous_from, f'{time_field}__lt': recent_from}),
+    }
+    window_aggregates = {}
+    for name, condition in windows.items():
+        window_aggregates.update({
+            f'{name}_readings': Count('id', filter=condition),
+            f'{name}_soil_sum': Sum('soil_pct', filter=condition),
+            f'{name}_tilt': Count('id', filter=condition & Q(tilt=True)),
+            f'{name}_hit': Count('id', filter=condition & Q(vib_hit=True)),
+        })
+
+    rows = list(
+        qs.annotate(month=TruncMonth(time_field))
+        .values('month')
+        .annotate(
+            total_readings=Count('id'),
+            soil_sum=Sum('soil_pct'),
+            soil_min=Min('soil_pct'),
+            soil_max=Max('soil_pct'),
+            pulse_sum=Sum('vib_pulse'),
+            pulse_min=Min('vib_pulse'),
+            pulse_max=Max('vib_pulse'),
+            tilt_events=Count('id', filter=Q(tilt=True)),
+            hit_events=Count('id', filter=Q(vib_hit=True)),
+            first_timestamp=Min(time_field),
+            last_timestamp=Max(time_field),
+            **window_aggregates,
+        )
+        .order_by('month')
+    )
+
+    trend_windows = {}
+    for name in windows:
+        count = sum(row[f'{name}_readings'] for row in rows)
+        soil_sum = sum(row[f'{name}_soil_sum'] or 0 for row in rows)
+        trend_windows[name] = {
+            'total_readings': count,
+            'hit_events': sum(row[f'{name}_hit'] for row in rows),
+            'inclination_events': sum(row[f'{name}_tilt'] for row in rows),
+            'avg_humidity': soil_sum / count if count else None,
+        }
+
+    return HistoricalSummary(
+        global_stats=fold(rows),
+        trend_windows=trend_windows,
+        monthly=[
+            {
+                'month': row['month'],
+                'avg_pulse': row['pulse_sum'] / row['total_readings'],
+                'avg_humidity': row['soil_sum'] / row['total_readings'],
+            }
+            for row in rows
+        ],
+    )
@@ -0,0 +1,275 @@
+"""
+Ingesta de paquetes del borde hacia `SensorPacket`/`SensorSample`.
+
+Las peticiones validan sus paquetes y los entregan a un buffer de micro-lotes: un hilo
+por proceso agrupa lo recibido durante unos milisegundos y lo escribe con un único
+`bulk_create` para paquetes y otro para samples (group commit). Cada petición recibe su
+confirmación cuando el lote que la contiene ya fue confirmado en la base de datos.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from monitoring.models import SensorPacket, SensorSample
+
+from . import dashboard_cache, rollups
+from .redis_gateway import DailyStatsGateway
+
+logger = logging.getLogger(__name__)
+
+
+class PacketValidationError(ValueError):
+    pass
+
+
+@dataclass
+class IngestResult:
+    created: int = 0
+    duplicates: int = 0
+
+    def __add__(self, other):
+        return IngestResult(self.created + other.created, self.duplicates + other.duplicates)
+
+
+# -------------------------------
+# VALIDACIÓN
+# -------------------------------
+def parse_packet(data):
+    """
+    Valida un payload del borde (`seq`, `ts`, `alerta`, `samples[]`) y lo normaliza:
+    `ts` pasa a datetime aware (hora de Lima si llega sin zona) y los flags a 0/1.
+    """
+    if not isinstance(data, dict):
+        raise PacketValidationError("el paquete debe ser un objeto JSON")
+    try:
+        seq = int(data["seq"])
+    except (KeyError, TypeError, ValueError):
+        raise PacketValidationError("seq debe ser un entero") from None
+    if seq < 0:
+        raise PacketValidationError("seq no puede ser negativo")
+
+    samples = data.get("samples")
+    if not isinstance(samples, list) or not samples:
+        raise PacketValidationError("samples debe ser una lista no vacía")
+
+    normalized = []
+    seen = set()
+    for index, sample in enumerate(samples):
+        try:
+            sid = int(sample["id"])
+            soil = sample["soil"]
+            vib = sample["vib"]
+            item = {
+                "id": sid,
+                "soil": {"raw": int(soil.get("raw", 0)), "pct": float(soil["pct"])},
+                "tilt": 1 if sample.get("tilt") else 0,
+                "vib": {"pulse": int(vib["pulse"]), "hit": 1 if vib.get("hit") else 0},
+            }
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise PacketValidationError(f"samples[{index}] incompleto o con tipos inválidos") from None
+        if sid < 0 or item["soil"]["raw"] < 0 or item["vib"]["pulse"] < 0:
+            raise PacketValidationError(f"samples[{index}] contiene valores negativos")
+        if not 0 <= item["soil"]["pct"] <= 100:
+            raise PacketValidationError(f"samples[{index}].soil.pct fuera de rango (0-100)")
+        if sid in seen:
+            raise PacketValidationError(f"samples[{index}].id repetido en el paquete")
+        seen.add(sid)
+        normalized.append(item)
+
+    return {
+        "seq": seq,
+        "ts": _parse_timestamp(data.get("ts")),
+        "alerta": 1 if data.get("alerta") or any(s["tilt"] or s["vib"]["hit"] for s in normalized) else 0,
+        "samples": normalized,
+    }
+
+
+def _parse_timestamp(value):
+    if value in (None, ""):
+        raise PacketValidationError("ts es obligatorio")
+    try:
+        if isinstance(value, (int, float)):
+            # epoch en segundos o milisegundos, con la misma regla que `series.to_epoch`
+            return datetime.fromtimestamp(value / 1000 if value > 1e12 else value, tz=timezone.get_default_timezone())
+        moment = datetime.fromisoformat(str(value))
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise PacketValidationError("ts debe ser 'YYYY-MM-DD HH:MM:SS', ISO 8601 o epoch") from None
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, timezone.get_default_timezone())
+    return moment
+
+
+# -------------------------------
+# ESCRITURA EN LOTE
+# -------------------------------
+def store_packets(packets):
+    """
+    Inserta paquetes normalizados de forma idempotente: un paquete con el mismo
+    (`seq`, `ts`) que uno ya almacenado (o repetido en el lote) se cuenta como duplicado.
+    Devuelve una lista de booleanos alineada con `packets` (True = creado).
+    """
+    try:
+        return _store_packets(packets)
+    except IntegrityError:
+        # otro proceso insertó alguno de estos paquetes entre la verificación y el INSERT
+        return _store_packets(packets)
+
+
+def _store_packets(packets):
+    created_flags = [False] * len(packets)
+    if not packets:
+        return created_flags
+
+    with transaction.atomic():
+        existing = set(
+            SensorPacket.objects
+            .filter(seq__in={p["seq"] for p in packets})
+            .values_list("seq", "timestamp")
+        )
+        fresh = []
+        for index, packet in enumerate(packets):
+            key = (packet["seq"], packet["ts"])
+            if key in existing:
+                continue
+            existing.add(key)
+            created_flags[index] = True
+            fresh.append(packet)
+
+        if fresh:
+            rows = SensorPacket.objects.bulk_create([
+                SensorPacket(seq=p["seq"], timestamp=p["ts"], alerta=bool(p["alerta"]))
+                for p in fresh
+            ], batch_size=1000)
+            if not connection.features.can_return_rows_from_bulk_insert:
+                rows = _reload_packets(fresh)
+            SensorSample.objects.bulk_create([
+                SensorSample(
+                    packet=row,
+                    timestamp=packet["ts"],
+                    sample_id=sample["id"],
+                    soil_raw=sample["soil"]["raw"],
+                    soil_pct=sample["soil"]["pct"],
+                    tilt=bool(sample["tilt"]),
+                    vib_pulse=sample["vib"]["pulse"],
+                    vib_hit=bool(sample["vib"]["hit"]),
+                )
+                for row, packet in zip(rows, fresh)
+                for sample in packet["samples"]
+            ], batch_size=2000)
+            rollups.apply_packets(fresh)
+            transaction.on_commit(lambda: _invalidate_dashboard(fresh))
+            transaction.on_commit(lambda: _publish(fresh))
+
+    return created_flags
+
+
+def _reload_packets(packets):
+    lookup = {
+        (row.seq, row.timestamp): row
+        for row in SensorPacket.objects.filter(seq__in={p["seq"] for p in packets})
+    }
+    return [lookup[(p["seq"], p["ts"])] for p in packets]
+
+
+def _invalidate_dashboard(packets):
+    try:
+        dashboard_cache.bump([p["ts"] for p in packets])
+    except Exception as exc:
+        logger.warning("No se pudo invalidar el cache del dashboard: %s", exc)
+
+
+def _publish(packets):
+    try:
+        DailyStatsGateway().record_packets(packets)
+    except Exception as exc:
+        logger.warning("No se pudieron publicar %s paquetes en Redis: %s", len(packets), exc)
+
+
+# -------------------------------
+# BUFFER DE MICRO-LOTES
+# -------------------------------
+class PacketBuffer:
+
+    def __init__(self, max_batch=None, max_delay=None):
+        self._max_batch = max_batch
+        self._max_delay = max_delay
+        self._condition = threading.Condition()
+        self._pending = []
+        self._pending_packets = 0
+        self._thread = None
+
+    @property
+    def max_batch(self):
+        if self._max_batch is not None:
+            return self._max_batch
+        return getattr(settings, 'INGEST_BATCH_MAX', 1000)
+
+    @property
+    def max_delay(self):
+        if self._max_delay is not None:
+            return self._max_delay
+        return getattr(settings, 'INGEST_BATCH_DELAY_MS', 20) / 1000
+
+    def submit(self, packets, timeout=30):
+        """Encola los paquetes y espera a que su lote quede confirmado."""
+        if not packets:
+            return IngestResult()
+        if self.max_delay <= 0:
+            return self._result(store_packets(packets))
+
+        future = Future()
+        with self._condition:
+            self._ensure_worker()
+            self._pending.append((packets, future))
+            self._pending_packets += len(packets)
+            self._condition.notify()
+        return future.result(timeout=timeout)
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='packet-ingest-buffer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                # dar tiempo a que lleguen más peticiones, salvo que el lote ya esté lleno
+                self._condition.wait_for(lambda: self._pending_packets >= self.max_batch, timeout=self.max_delay)
+                batch, self._pending = self._pending, []
+                self._pending_packets = 0
+            self._flush(batch)
+
+    def _flush(self, batch):
+        packets = [packet for submitted, _ in batch for packet in submitted]
+        close_old_connections()
+        try:
+            flags = store_packets(packets)
+        except Exception as exc:
+            logger.exception("Fallo al escribir un lote de %s paquetes", len(packets))
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+        finally:
+            close_old_connections()
+        offset = 0
+        for submitted, future in batch:
+            future.set_result(self._result(flags[offset:offset + len(submitted)]))
+            offset += len(submitted)
+
+    @staticmethod
+    def _result(flags):
+        created = sum(flags)
+        return IngestResult(created=created, duplicates=len(flags) - created)
+
+
+packet_buffer = PacketBuffer()
@@ -0,0 +1,307 @@
+"""
+Métricas del proceso en formato de texto de Prometheus (`GET /metrics/`).
+
+`MetricsMiddleware` abre un `RequestStats` por petición (en una ContextVar, que también ven
+las vistas síncronas bajo ASGI) y al terminar registra la latencia por vista junto con las
+consultas SQL y los comandos Redis que hizo. Las consultas se miden con un
+`execute_wrapper` que se instala en cada conexión al crearse (`install()`); los comandos
+Redis, con el cliente instrumentado de `redis_pool`. El cache del snapshot, las conexiones
+SSE y los contadores del pool se leen al exportar.
+
+Los valores son por proceso, como los de `/ops/redis/`: con varios workers, Prometheus
+debe consultar cada uno (o agregarlos con `sum`).
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from django.db.backends.signals import connection_created
+
+# segundos; cubren desde un GET en cache (~ms) hasta el histórico sin rollups
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+REDIS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple((name, labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """`(sufijo, etiquetas, valor)` de cada serie."""
+        return []
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for suffix, labels, value in self.samples():
+            lines.append(f'{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}')
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [('_total', key, value) for key, value in sorted(self._values.items())]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # por serie: conteos por bucket (no acumulados), suma y total
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels):
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip((*self.buckets, math.inf), counts):
+                    cumulative += bucket_count
+                    samples.append(('_bucket', key + (('le', _format_value(float(bound))),), cumulative))
+                samples.append(('_sum', key, total))
+                samples.append(('_count', key, count))
+        return samples
+
+
+class Collected(Metric):
+    """Métrica que se lee al exportar: `collect()` devuelve `[(etiquetas, valor)]`."""
+
+    def __init__(self, name, documentation, kind, collect):
+        super().__init__(name, documentation)
+        self.kind = kind
+        self.collect = collect
+
+    def samples(self):
+        suffix = '_total' if self.kind == 'counter' else ''
+        return [(suffix, tuple(labels.items()), value) for labels, value in self.collect()]
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def collected(self, name, documentation, kind, collect):
+        return self.register(Collected(name, documentation, kind, collect))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception:
+                # una fuente caída (p. ej. Redis) no debe impedir exportar el resto
+                continue
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.histogram(
+    'http_request_duration_seconds', 'Latencia de las peticiones por vista.', ('view', 'method', 'status'),
+)
+REQUEST_DB_QUERIES = registry.counter(
+    'http_request_db_queries', 'Consultas SQL hechas por las peticiones, por vista.', ('view',),
+)
+REQUEST_DB_SECONDS = registry.counter(
+    'http_request_db_seconds', 'Tiempo en consultas SQL de las peticiones, por vista.', ('view',),
+)
+REQUEST_REDIS_COMMANDS = registry.counter(
+    'http_request_redis_commands', 'Comandos Redis enviados por las peticiones, por vista.', ('view',),
+)
+REQUEST_REDIS_SECONDS = registry.counter(
+    'http_request_redis_seconds', 'Tiempo de espera a Redis de las peticiones, por vista.', ('view',),
+)
+REDIS_ROUNDTRIPS = registry.histogram(
+    'redis_roundtrip_duration_seconds',
+    'Latencia de cada ida y vuelta a Redis (un comando o un pipeline completo).',
+    ('kind',),
+    REDIS_BUCKETS,
+)
+REDIS_COMMANDS = registry.counter('redis_commands', 'Comandos Redis enviados por el proceso.', ('kind',))
+SNAPSHOT_CACHE = registry.counter(
+    'snapshot_cache_requests',
+    'Lecturas del cache del snapshot: hit (vigente), miss (recalculada) o coalesced (esperó otro cálculo).',
+    ('result',),
+)
+
+
+@dataclass
+class RequestStats:
+    started: float = field(default_factory=time.perf_counter)
+    db_queries: int = 0
+    db_seconds: float = 0.0
+    redis_commands: int = 0
+    redis_seconds: float = 0.0
+
+
+_current = ContextVar('monitoring_request_stats', default=None)
+
+
+def start_request():
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def finish_request(request, response, stats, token):
+    """Registra la petición y devuelve la duración en segundos."""
+    _current.reset(token)
+    elapsed = time.perf_counter() - stats.started
+    match = getattr(request, 'resolver_match', None)
+    view = match.view_name if match is not None else 'unmatched'
+    REQUEST_LATENCY.observe(elapsed, view=view, method=request.method, status=response.status_code)
+    REQUEST_DB_QUERIES.inc(stats.db_queries, view=view)
+    REQUEST_DB_SECONDS.inc(stats.db_seconds, view=view)
+    REQUEST_REDIS_COMMANDS.inc(stats.redis_commands, view=view)
+    REQUEST_REDIS_SECONDS.inc(stats.redis_seconds, view=view)
+    return elapsed
+
+
+def server_timing(stats, elapsed):
+    """Valor de la cabecera `Server-Timing` (pestaña Timing de las devtools)."""
+    return ', '.join([
+        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.db_queries} consultas"',
+        f'redis;dur={stats.redis_seconds * 1000:.1f};desc="{stats.redis_commands} comandos"',
+        f'app;dur={elapsed * 1000:.1f}',
+    ])
+
+
+# -------------------------------
+# SQL Y REDIS
+# -------------------------------
+def db_wrapper(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_queries += 1
+        stats.db_seconds += time.perf_counter() - started
+
+
+def _install_wrapper(sender, connection, **kwargs):
+    # la señal se repite en cada reconexión del mismo DatabaseWrapper
+    if db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_wrapper)
+
+
+def install():
+    """Mide las consultas de todas las conexiones (se llama desde `MonitoringConfig.ready`)."""
+    connection_created.connect(_install_wrapper, dispatch_uid='monitoring.metrics.db_wrapper')
+
+
+def record_redis(kind, commands, seconds):
+    REDIS_ROUNDTRIPS.observe(seconds, kind=kind)
+    REDIS_COMMANDS.inc(commands, kind=kind)
+    stats = _current.get()
+    if stats is not None:
+        stats.redis_commands += commands
+        stats.redis_seconds += seconds
+
+
+# -------------------------------
+# ESTADO LEÍDO AL EXPORTAR
+# -------------------------------
+def _sse_connections():
+    from . import sse
+
+    return [({'state': 'active'}, sse.limiter.active), ({'state': 'limit'}, sse.limiter.limit)]
+
+
+def _broadcast_subscribers():
+    from . import broadcast
+
+    return [({}, broadcast.hub.stats()['subscribers'])]
+
+
+def _redis_pool_events():
+    from . import redis_pool
+
+    return [({'event': name}, value) for name, value in sorted(redis_pool.counters.snapshot().items())]
+
+
+def _redis_breaker():
+    from . import redis_pool
+
+    state = redis_pool.breaker.state
+    return [({'state': name}, int(name == state)) for name in ('closed', 'half_open', 'open')]
+
+
+registry.collected('sse_connections', 'Conexiones SSE abiertas en el proceso y su límite.', 'gauge', _sse_connections)
+registry.collected('broadcast_subscribers', 'Clientes suscritos al hub pub/sub del proceso.', 'gauge', _broadcast_subscribers)
+registry.collected('redis_pool_events', 'Eventos del pool Redis (conexiones, fallos, esperas, breaker).', 'counter', _redis_pool_events)
+registry.collected('redis_breaker_state', 'Estado del circuit breaker de Redis (1 = actual).', 'gauge', _redis_breaker)
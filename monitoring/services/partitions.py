@@ -0,0 +1,334 @@
+"""
+Particionado mensual opcional de `SensorSample` en PostgreSQL.
+
+`convert()` (`manage_partitions --convert`) reemplaza la tabla de samples por una tabla
+particionada por rango de `timestamp` (un mes de Lima por partición, más una partición por
+defecto); los filtros del dashboard ya son rangos sobre `timestamp`, así que PostgreSQL
+descarta las particiones fuera del rango. `revert()` vuelve a una tabla simple.
+`ensure_partitions()` crea los meses futuros y `prune()` separa o elimina los antiguos.
+Todas pueden solo mostrar su SQL (`dry_run`). En SQLite todo queda como una única tabla.
+
+La tabla particionada conserva los nombres de índices y restricciones que espera el estado
+de las migraciones; solo la clave primaria pasa a ser (`id`, `timestamp`), porque
+PostgreSQL exige la clave de partición en toda clave única (el estado sigue viendo `id`, que
+el identity mantiene único). `SensorPacket` no se particiona: los samples lo referencian
+por `id`.
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, time
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from monitoring.models import SensorPacket, SensorRollup, SensorSample
+
+from . import dashboard_cache
+
+logger = logging.getLogger(__name__)
+
+PARTITION_SUFFIX = "_p{year:04d}_{month:02d}"
+DEFAULT_SUFFIX = "_default"
+
+
+class PartitioningUnavailable(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class Partition:
+    name: str
+    start: date
+    end: date
+
+
+def supported():
+    return connection.vendor == "postgresql"
+
+
+def _table():
+    return SensorSample._meta.db_table
+
+
+def _qn(name):
+    return connection.ops.quote_name(name)
+
+
+def _require_postgres():
+    if not supported():
+        raise PartitioningUnavailable("El particionado solo está disponible en PostgreSQL.")
+
+
+def is_partitioned():
+    if not supported():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [_table()])
+        row = cursor.fetchone()
+    return bool(row) and row[0] == "p"
+
+
+# -------------------------------
+# RANGOS MENSUALES
+# -------------------------------
+def month_start(day: date):
+    return date(day.year, day.month, 1)
+
+
+def add_months(day: date, months: int):
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _bound(day: date):
+    # literal timestamptz con el offset de Lima (el DDL de particiones no admite parámetros)
+    return timezone.make_aware(datetime.combine(day, time.min)).isoformat(sep=" ")
+
+
+def partition_for(day: date):
+    start = month_start(day)
+    return Partition(
+        name=_table() + PARTITION_SUFFIX.format(year=start.year, month=start.month),
+        start=start,
+        end=add_months(start, 1),
+    )
+
+
+def list_partitions():
+    """Particiones mensuales existentes (la partición por defecto no se incluye)."""
+    _require_postgres()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.oid = to_regclass(%s)
+            """,
+            [_table()],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = []
+    prefix = _table() + "_p"
+    for name in names:
+        if not name.startswith(prefix):
+            continue
+        try:
+            year, month = (int(part) for part in name[len(prefix):].split("_"))
+        except ValueError:
+            continue
+        partitions.append(partition_for(date(year, month, 1)))
+    return sorted(partitions, key=lambda partition: partition.start)
+
+
+# -------------------------------
+# SQL
+# -------------------------------
+def _range(partition):
+    # literales y no parámetros: el DDL de particiones no los admite (y así el SQL se puede mostrar)
+    return f"FOR VALUES FROM ('{_bound(partition.start)}') TO ('{_bound(partition.end)}')"
+
+
+def create_partition_sql(partition):
+    """
+    Sentencias para crear una partición mensual. Si la partición por defecto ya tiene filas
+    de ese mes, PostgreSQL rechaza el CREATE: se mueven primero a una tabla temporal y se
+    reinsertan en la partición nueva.
+    """
+    table = _table()
+    default = table + DEFAULT_SUFFIX
+    return [
+        f"CREATE TEMP TABLE pending_samples (LIKE {_qn(table)}) ON COMMIT DROP",
+        f"WITH moved AS (DELETE FROM {_qn(default)} WHERE timestamp >= '{_bound(partition.start)}' "
+        f"AND timestamp < '{_bound(partition.end)}' RETURNING *) INSERT INTO pending_samples SELECT * FROM moved",
+        f"CREATE TABLE {_qn(partition.name)} PARTITION OF {_qn(table)} {_range(partition)}",
+        f"INSERT INTO {_qn(table)} OVERRIDING SYSTEM VALUE SELECT * FROM pending_samples",
+        # dentro de una transacción externa ON COMMIT DROP no alcanza para la partición siguiente
+        "DROP TABLE pending_samples",
+    ]
+
+
+def prune_partition_sql(partition, drop=False):
+    """Sentencias para separar una partición y, con `drop`, eliminarla junto con sus paquetes."""
+    statements = [f"ALTER TABLE {_qn(_table())} DETACH PARTITION {_qn(partition.name)}"]
+    if drop:
+        statements += [
+            f"DROP TABLE {_qn(partition.name)}",
+            # los samples ya no existen: se borran los paquetes sin pasar por el cascade del ORM
+            f"DELETE FROM {_qn(SensorPacket._meta.db_table)} "
+            f"WHERE timestamp >= '{_bound(partition.start)}' AND timestamp < '{_bound(partition.end)}'",
+        ]
+    return statements
+
+
+def _rebuild_sql(partitioned, first=None, last=None):
+    """
+    Sentencias que copian la tabla de samples en una tabla nueva (particionada por mes de
+    `first` a `last`, más una partición por defecto, o simple) y la reemplazan. Los índices,
+    la restricción única y la FK se recrean con el schema editor de Django, con los mismos
+    nombres que crea `migrate`.
+    """
+    table = _table()
+    staging = table + ("_partitioned" if partitioned else "_plain")
+    statements = [
+        f"LOCK TABLE {_qn(table)} IN ACCESS EXCLUSIVE MODE",
+        f"CREATE TABLE {_qn(staging)} (LIKE {_qn(table)} INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING CONSTRAINTS)"
+        + (" PARTITION BY RANGE (timestamp)" if partitioned else ""),
+    ]
+    if partitioned:
+        statements.append(f"CREATE TABLE {_qn(staging + DEFAULT_SUFFIX)} PARTITION OF {_qn(staging)} DEFAULT")
+        while first <= last:
+            partition = partition_for(first)
+            statements.append(f"CREATE TABLE {_qn(partition.name)} PARTITION OF {_qn(staging)} {_range(partition)}")
+            first = partition.end
+    statements += [
+        f"INSERT INTO {_qn(staging)} OVERRIDING SYSTEM VALUE SELECT * FROM {_qn(table)}",
+        # con la tabla se van sus particiones, índices y la secuencia del identity
+        f"DROP TABLE {_qn(table)}",
+        f"ALTER TABLE {_qn(staging)} RENAME TO {_qn(table)}",
+        f"ALTER SEQUENCE {_qn(staging + '_id_seq')} RENAME TO {_qn(table + '_id_seq')}",
+    ]
+    if partitioned:
+        statements.append(f"ALTER TABLE {_qn(staging + DEFAULT_SUFFIX)} RENAME TO {_qn(table + DEFAULT_SUFFIX)}")
+    primary_key = "id, timestamp" if partitioned else "id"
+    statements += [
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce(max(id), 0) + 1, false) FROM {_qn(table)}",
+        f"ALTER TABLE {_qn(table)} ADD CONSTRAINT {_qn(table + '_pkey')} PRIMARY KEY ({primary_key})",
+    ]
+    editor = connection.schema_editor()
+    packet = SensorSample._meta.get_field("packet")
+    statements += [str(constraint.create_sql(SensorSample, editor)) for constraint in SensorSample._meta.constraints]
+    statements.append(str(editor._create_fk_sql(SensorSample, packet, "_fk_%(to_table)s_%(to_column)s")))
+    statements += [str(statement) for statement in editor._model_indexes_sql(SensorSample)]
+    return statements
+
+
+def convert_sql(first, last):
+    """Sentencias que particionan la tabla de samples con meses de `first` a `last`."""
+    return _rebuild_sql(True, first, last)
+
+
+def revert_sql():
+    """Sentencias que devuelven los samples (incluida la partición por defecto) a una tabla simple."""
+    return _rebuild_sql(False)
+
+
+def _run(statements, dry_run=False, echo=None):
+    """Ejecuta las sentencias en una transacción; con `dry_run` solo las pasa a `echo`."""
+    if dry_run:
+        for statement in statements:
+            if echo:
+                echo(statement + ";")
+        return
+    with transaction.atomic(), connection.cursor() as cursor:
+        # las FK diferidas con eventos pendientes impiden DROP y TRUNCATE en la misma transacción
+        connection.check_constraints()
+        for statement in statements:
+            if echo:
+                echo(statement + ";")
+            cursor.execute(statement)
+
+
+# -------------------------------
+# OPERACIONES
+# -------------------------------
+def ensure_partitions(months_ahead=3, since=None, dry_run=False, echo=None):
+    """
+    Crea las particiones mensuales desde `since` (o el mes actual) hasta `months_ahead`
+    meses adelante. Con `dry_run` solo pasa el SQL a `echo`.
+    """
+    _require_postgres()
+    if not is_partitioned():
+        raise PartitioningUnavailable("La tabla de samples no está particionada: usa --convert.")
+    existing = {partition.name for partition in list_partitions()}
+    current = month_start(since or timezone.localdate())
+    last = add_months(month_start(timezone.localdate()), months_ahead)
+    created = []
+    while current <= last:
+        partition = partition_for(current)
+        if partition.name not in existing:
+            _run(create_partition_sql(partition), dry_run, echo)
+            if not dry_run:
+                logger.info("Partición %s creada", partition.name)
+            created.append(partition)
+        current = partition.end
+    return created
+
+
+def prune(retain_months, drop=False, today=None, dry_run=False, echo=None):
+    """
+    Separa (DETACH) las particiones completamente anteriores a los últimos `retain_months`
+    meses; con `drop=True` además las elimina junto con sus paquetes. Los rollups se
+    conservan, así que el dashboard mantiene los totales históricos. Con `dry_run` solo
+    pasa el SQL a `echo`.
+    """
+    _require_postgres()
+    cutoff = add_months(month_start(today or timezone.localdate()), -retain_months)
+    removed = []
+    for partition in list_partitions():
+        if partition.end > cutoff:
+            continue
+        _run(prune_partition_sql(partition, drop), dry_run, echo)
+        removed.append(partition)
+    if drop and removed and not dry_run:
+        dashboard_cache.invalidate()
+    return removed
+
+
+def convert(months_ahead=3, dry_run=False, echo=None):
+    """
+    Particiona la tabla de samples, con un mes por partición desde el sample más antiguo
+    hasta `months_ahead` meses adelante. Bloquea la tabla mientras copia las filas. Devuelve
+    las particiones creadas.
+    """
+    _require_postgres()
+    if is_partitioned():
+        raise PartitioningUnavailable("La tabla de samples ya está particionada.")
+    oldest = SensorSample.objects.order_by("timestamp").values_list("timestamp", flat=True).first()
+    first = month_start(timezone.localtime(oldest).date() if oldest else timezone.localdate())
+    last = add_months(month_start(timezone.localdate()), months_ahead)
+    _run(convert_sql(first, last), dry_run, echo)
+    created = []
+    while first <= last:
+        created.append(partition_for(first))
+        first = created[-1].end
+    if not dry_run:
+        logger.info("Tabla de samples particionada (%d meses)", len(created))
+    return created
+
+
+def revert(dry_run=False, echo=None):
+    """Devuelve los samples a una tabla sin particionar (deshace `convert()`)."""
+    _require_postgres()
+    if not is_partitioned():
+        raise PartitioningUnavailable("La tabla de samples no está particionada.")
+    _run(revert_sql(), dry_run, echo)
+    if not dry_run:
+        logger.info("Tabla de samples sin particionar")
+
+
+# -------------------------------
+# BORRADO COMPLETO
+# -------------------------------
+def truncate_history():
+    """
+    Borra paquetes, samples y rollups. En PostgreSQL es un TRUNCATE (instantáneo, también
+    con particiones); en SQLite los samples se borran con un DELETE directo antes que los
+    paquetes, para que el cascade del ORM no tenga filas que recorrer.
+    """
+    packets = SensorPacket.objects.count()
+    with transaction.atomic():
+        if supported():
+            tables = ", ".join(_qn(model._meta.db_table) for model in (SensorSample, SensorPacket, SensorRollup))
+            connection.check_constraints()  # ver _run()
+            with connection.cursor() as cursor:
+                cursor.execute(f"TRUNCATE {tables} RESTART IDENTITY")
+        else:
+            SensorSample.objects.all().delete()
+            SensorPacket.objects.all().delete()
+            SensorRollup.objects.all().delete()
+    dashboard_cache.invalidate()
+    return packets
@@ -1,13 +1,22 @@
 from __future__ import annotations
+from array import array
+from datetime import datetime
 from typing import Dict, Optional
 from django.conf import settings
 from django.utils import timezone
 import json
+import logging
+
+from . import redis_pool, series
 
 try:
-    import redis
+    from redis.client import NEVER_DECODE
+    from redis.exceptions import WatchError
 except ImportError:
-    redis = None
+    NEVER_DECODE = "NEVER_DECODE"
+    WatchError = None
+
+logger = logging.getLogger(__name__)
 
 
 class DailyStatsGateway:
@@ -15,170 +24,498 @@ class DailyStatsGateway:
     HUM_HIST = "sensor:humedad:{id}:historico"
     VIB_HIST = "sensor:vibracion:{id}:historico"
     INC_HIST = "sensor:inclinacion:{id}:historico"
+    # historiales compactos (series.RECORD por entrada, ver services.series)
+    HUM_PACKED = "sensor:humedad:{id}:packed:v%d" % series.PACKED_VERSION
+    VIB_PACKED = "sensor:vibracion:{id}:packed:v%d" % series.PACKED_VERSION
+    INC_PACKED = "sensor:inclinacion:{id}:packed:v%d" % series.PACKED_VERSION
+    HISTORIES = (("humidity", HUM_HIST, HUM_PACKED), ("vibration", VIB_HIST, VIB_PACKED), ("inclination", INC_HIST, INC_PACKED))
+    # el desglose por sensor con agregados solo lee del historial humedad y vibración
+    BREAKDOWN_HISTORIES = HISTORIES[:2]
     VIB_STATS = "sensor:vibracion:{id}:stats"
     ALERT_STATS = "sensor:alerta:stats"
+    LAST_PACKET = "sensor:last_packet"
+    # canal pub/sub con cada paquete nuevo (ver services.broadcast)
+    PACKET_CHANNEL = "sensor:packets"
+    # los mismos paquetes en un Stream acotado, para reenviar lo perdido al reconectar
+    PACKET_LOG = "sensor:packets:log"
+    PACKET_LOG_MAXLEN = 1000
+    # SET opcional mantenido por el escritor con los ids de sensores activos.
+    SENSOR_REGISTRY = "sensor:registry"
+    # Agregados diarios mantenidos en escritura: HASH con campos "{sid}:{campo}"
+    # y ZSETs (miembro = sensor) para mínimos/máximos actualizados con ZADD GT/LT.
+    DAILY_AGG = "sensor:agg:{day}"
+    DAILY_EXTREME = "sensor:agg:{day}:{name}"
+    EXTREMES = ("hum_min", "hum_max", "pulse_min", "pulse_max")
 
-    def __init__(self):
-        self.client = None
-        if getattr(settings, "REDIS_URL", None) and redis is not None:
-            try:
-                self.client = redis.Redis.from_url(
-                    settings.REDIS_URL, decode_responses=True
-                )
-                self.client.ping()
-                print("REDIS Conectado OK")
-            except Exception as e:
-                print("REDIS ERROR:", e)
-                self.client = None
+    HISTORY_WINDOW = 200
+    HISTORY_MAXLEN = 1000
+    # un string compacto se recorta al pasar este factor de HISTORY_MAXLEN (amortiza el rewrite)
+    PACKED_TRIM_SLACK = 1.25
+    AGG_TTL_SECONDS = 3 * 86400
+    SCAN_COUNT = 500
+
+    def __init__(self, client=None, breaker=None, history_format=None):
+        # el cliente compartido del proceso reutiliza conexiones; no hay connect + PING por petición
+        self.client = client if client is not None else redis_pool.get_client()
+        self.breaker = breaker or redis_pool.breaker
+        # "packed" (compacto), "json" (listas anteriores) o "both" durante la migración
+        self.history_format = history_format or getattr(settings, 'REDIS_HISTORY_FORMAT', 'packed')
 
-    def get_today_snapshot(self):
-        if self.client:
+    def get_today_snapshot(self, sensor_ids=None, bucket=None, breakdown=False):
+        """
+        Totales del día. Con `breakdown` agrega `sensors`: estadísticas por sensor (todos o
+        `sensor_ids`) y, si se indica `bucket` en segundos, sus series en buckets fijos.
+        """
+        if self.client and self.breaker.allow():
             try:
-                return self._read_from_backend_redis() | {"source": "redis"}
+                if breakdown:
+                    totals, sensors = self._read_with_breakdown(sensor_ids, bucket)
+                    snapshot = totals | {"source": "redis", "sensors": sensors, "bucket_seconds": bucket}
+                else:
+                    snapshot = self._read_from_backend_redis() | {"source": "redis"}
             except Exception as e:
-                print("REDIS SNAPSHOT ERROR:", e)
+                self.breaker.record_failure()
+                redis_pool.counters.incr("command_failures")
+                logger.warning("REDIS SNAPSHOT ERROR: %s", e)
+            else:
+                self.breaker.record_success()
+                return snapshot
 
         return {"source": "database"}  # evitar fallbacks incorrectos
 
 
+    # -------------------------------
+    # ESCRITURA (un paquete del borde)
+    # -------------------------------
+    def record_packets(self, packets):
+        """
+        Registra paquetes normalizados (`seq`, `ts`, `alerta`, `samples[]`) en Redis:
+        historiales, último paquete y agregados diarios, todo en una transacción MULTI.
+        Cada paquete se publica en `PACKET_CHANNEL` y se agrega a `PACKET_LOG` dentro de la
+        misma transacción.
+        """
+        if not self.client or not packets:
+            return False
+        write_json = self.history_format in ("json", "both")
+        write_packed = self.history_format in ("packed", "both")
+        pipe = self.client.pipeline(transaction=True)
+        touched = set()
+        for packet in packets:
+            ts = self._packet_ts(packet["ts"])
+            epoch = series.to_epoch(packet["ts"])
+            day = ts[:10]
+            agg_key = self.DAILY_AGG.format(day=day)
+            for sample in packet["samples"]:
+                sid = sample["id"]
+                pct = float(sample["soil"]["pct"])
+                pulse = float(sample["vib"]["pulse"])
+                tilt = int(bool(sample["tilt"]))
+                hit = int(bool(sample["vib"]["hit"]))
+
+                pipe.hincrby(agg_key, f"{sid}:hum_count", 1)
+                pipe.hincrbyfloat(agg_key, f"{sid}:hum_sum", pct)
+                pipe.hincrby(agg_key, f"{sid}:pulse_count", 1)
+                pipe.hincrbyfloat(agg_key, f"{sid}:pulse_sum", pulse)
+                if tilt:
+                    pipe.hincrby(agg_key, f"{sid}:tilt", 1)
+                if hit:
+                    pipe.hincrby(agg_key, f"{sid}:hit", 1)
+                pipe.zadd(self.DAILY_EXTREME.format(day=day, name="hum_min"), {sid: pct}, lt=True)
+                pipe.zadd(self.DAILY_EXTREME.format(day=day, name="hum_max"), {sid: pct}, gt=True)
+                pipe.zadd(self.DAILY_EXTREME.format(day=day, name="pulse_min"), {sid: pulse}, lt=True)
+                pipe.zadd(self.DAILY_EXTREME.format(day=day, name="pulse_max"), {sid: pulse}, gt=True)
+
+                if write_json:
+                    pipe.rpush(self.HUM_HIST.format(id=sid), json.dumps({"ts": ts, "porcentaje": pct}))
+                    pipe.rpush(self.VIB_HIST.format(id=sid), json.dumps({"ts": ts, "pulse": pulse}))
+                    pipe.rpush(self.INC_HIST.format(id=sid), json.dumps({"ts": ts, "estado": tilt}))
+                if write_packed:
+                    pipe.append(self.HUM_PACKED.format(id=sid), series.pack(pct, epoch))
+                    pipe.append(self.VIB_PACKED.format(id=sid), series.pack(pulse, epoch))
+                    pipe.append(self.INC_PACKED.format(id=sid), series.pack(tilt, epoch))
+                pipe.sadd(self.SENSOR_REGISTRY, sid)
+                touched.add((day, sid))
+            pipe.set(self.LAST_PACKET, json.dumps({"seq": packet["seq"], "ts": ts}))
+            payload = json.dumps({
+                "seq": packet["seq"],
+                "ts": ts,
+                "alerta": int(bool(packet["alerta"])),
+                "samples": packet["samples"],
+            })
+            pipe.publish(self.PACKET_CHANNEL, payload)
+            pipe.xadd(self.PACKET_LOG, {"data": payload}, maxlen=self.PACKET_LOG_MAXLEN, approximate=True)
+
+        for day in {day for day, _ in touched}:
+            self._expire_day(pipe, day)
+        sensors = sorted({sid for _, sid in touched})
+        packed_keys = [
+            packed.format(id=sid) for sid in sensors for _, _, packed in self.HISTORIES
+        ] if write_packed else []
+        for sid in sensors:
+            if write_json:
+                for template in (self.HUM_HIST, self.VIB_HIST, self.INC_HIST):
+                    pipe.ltrim(template.format(id=sid), -self.HISTORY_MAXLEN, -1)
+        for key in packed_keys:
+            pipe.strlen(key)
+        results = pipe.execute()
+
+        limit = self.HISTORY_MAXLEN * self.PACKED_TRIM_SLACK * series.RECORD.size
+        for key, length in zip(packed_keys, results[len(results) - len(packed_keys):]):
+            if length > limit:
+                self._trim_packed(key)
+        return True
+
+    def _trim_packed(self, key):
+        """Deja los últimos HISTORY_MAXLEN registros; WATCH evita perder un APPEND concurrente."""
+        keep = self.HISTORY_MAXLEN * series.RECORD.size
+        with self.client.pipeline(transaction=True) as pipe:
+            for _ in range(3):
+                try:
+                    pipe.watch(key)
+                    length = pipe.strlen(key)
+                    if length <= keep:
+                        return
+                    tail = pipe.execute_command("GETRANGE", key, length - keep, -1, **{NEVER_DECODE: True})
+                    pipe.multi()
+                    pipe.set(key, tail)
+                    pipe.execute()
+                    return
+                except Exception as exc:
+                    if WatchError is None or not isinstance(exc, WatchError):
+                        raise
+        logger.warning("No se pudo recortar %s: escrituras concurrentes", key)
+
+    def read_packed(self, pipe, key, window=None):
+        """Encola la lectura cruda (bytes) de un historial compacto: todo o los últimos `window` registros."""
+        start = -window * series.RECORD.size if window else 0
+        return pipe.execute_command("GETRANGE", key, start, -1, **{NEVER_DECODE: True})
+
+    def write_daily_aggregates(self, day, per_sensor):
+        """Reemplaza los agregados de un día (usado por el backfill desde historiales)."""
+        agg_key = self.DAILY_AGG.format(day=day)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(agg_key, *[self.DAILY_EXTREME.format(day=day, name=name) for name in self.EXTREMES])
+        fields = {}
+        for sid, stats in per_sensor.items():
+            for name in ("hum_count", "hum_sum", "pulse_count", "pulse_sum", "tilt", "hit"):
+                if stats.get(name):
+                    fields[f"{sid}:{name}"] = stats[name]
+            for name in self.EXTREMES:
+                if stats.get(name) is not None:
+                    pipe.zadd(self.DAILY_EXTREME.format(day=day, name=name), {sid: stats[name]})
+        if fields:
+            pipe.hset(agg_key, mapping=fields)
+        self._expire_day(pipe, day)
+        pipe.execute()
+
+    def _expire_day(self, pipe, day):
+        pipe.expire(self.DAILY_AGG.format(day=day), self.AGG_TTL_SECONDS)
+        for name in self.EXTREMES:
+            pipe.expire(self.DAILY_EXTREME.format(day=day, name=name), self.AGG_TTL_SECONDS)
+
+    @staticmethod
+    def _packet_ts(ts):
+        # formato del borde: "YYYY-MM-DD HH:MM:SS" en hora local
+        if hasattr(ts, "strftime"):
+            if timezone.is_aware(ts):
+                ts = timezone.localtime(ts)
+            return ts.strftime("%Y-%m-%d %H:%M:%S")
+        return str(ts)
+
     # -------------------------------
     # LECTURA REAL DE REDIS
     # -------------------------------
     def _read_from_backend_redis(self):
-        sensor_ids = self._discover_sensor_ids()
+        # agregados diarios: O(sensores); los historiales quedan como respaldo mientras se migra
+        snapshot = self._read_daily_aggregates(timezone.localdate().isoformat())
+        if snapshot is not None:
+            return snapshot
+        return self._read_from_history()
+
+    def _read_daily_aggregates(self, day):
+        pipe = self.client.pipeline(transaction=False)
+        self._queue_daily_aggregates(pipe, day)
+        return self._daily_totals(pipe.execute(raise_on_error=False))
+
+    def _queue_daily_aggregates(self, pipe, day):
+        """Encola la lectura de los agregados de `day`; devuelve cuántos comandos encoló."""
+        pipe.hgetall(self.DAILY_AGG.format(day=day))
+        for name in self.EXTREMES:
+            pipe.zrange(self.DAILY_EXTREME.format(day=day, name=name), 0, -1, withscores=True)
+        pipe.get(self.LAST_PACKET)
+        pipe.zrevrange(self.ALERT_STATS, 0, 0)
+        return 3 + len(self.EXTREMES)
+
+    def _daily_totals(self, results):
+        """Snapshot del día a partir de lo encolado por `_queue_daily_aggregates`; None si no hay agregados."""
+        fields, hum_min, hum_max, _pulse_min, pulse_max, last_raw, latest_alert = results
+        fields = self._ok(fields, {})
+        if not fields:
+            return None
+
+        totals = {}
+        for key, value in fields.items():
+            name = key.rpartition(":")[2]
+            totals[name] = totals.get(name, 0) + float(value)
+        hum_count = int(totals.get("hum_count", 0))
+        pulse_count = int(totals.get("pulse_count", 0))
+        hum_peaks = [score for _, score in self._ok(hum_max, [])]
+        hum_floors = [score for _, score in self._ok(hum_min, [])]
+        pulse_peaks = [score for _, score in self._ok(pulse_max, [])]
+        last_seq, last_ts = self._last_packet(last_raw, self._ok(latest_alert, []))
+
+        return {
+            "pulse_avg": round(totals.get("pulse_sum", 0) / pulse_count, 2) if pulse_count else 0,
+            "pulse_peak": max(pulse_peaks) if pulse_peaks else 0,
+
+            "humidity_avg": round(totals.get("hum_sum", 0) / hum_count, 2) if hum_count else 0,
+            "humidity_peak": max(hum_peaks) if hum_peaks else 0,
+            "humidity_floor": min(hum_floors) if hum_floors else 0,
+
+            "hit_events": int(totals.get("hit", 0)),
+            "inclination_events": int(totals.get("tilt", 0)),
+            "total_readings": max(hum_count, pulse_count),
+            "last_seq": last_seq,
+            "last_timestamp": last_ts
+        }
+
+    def _read_from_history(self, sensor_ids=None):
+        sensor_ids = sensor_ids or self._discover_sensor_ids()
+
+        # Todas las lecturas viajan en un único pipeline: 1 round trip en lugar de 4N+3.
+        pipe = self.client.pipeline(transaction=False)
+        # durante la migración se leen ambos formatos; si hay compacto, manda el compacto
+        for sid in sensor_ids:
+            for _, template, packed in self.HISTORIES:
+                self.read_packed(pipe, packed.format(id=sid), self.HISTORY_WINDOW)
+                pipe.lrange(template.format(id=sid), -self.HISTORY_WINDOW, -1)
+            pipe.zrange(self.VIB_STATS.format(id=sid), 0, -1, withscores=True)
+        pipe.zrange(self.ALERT_STATS, 0, -1)
+        pipe.get(self.LAST_PACKET)
+        pipe.zrevrange(self.ALERT_STATS, 0, 0)
+        results = pipe.execute(raise_on_error=False)
 
         humidity = []
         vibration = []
         tilt_events = 0
-        hit_events = 0
-
-        for sid in sensor_ids:
 
-            # --- HUMEDAD (LIST) -> cada elemento es JSON {"porcentaje":.., ...}
-            h_items = self.client.lrange(self.HUM_HIST.format(id=sid), -200, -1)
-            for entry in h_items:
-                try:
-                    obj = json.loads(entry)
-                    pct = obj.get("porcentaje") or obj.get("pct") or None
-                    if pct is not None:
-                        humidity.append(float(pct))
-                except Exception:
-                    # fallback: si no es JSON, intentar split por ":" como antes (legacy)
-                    try:
-                        parts = entry.split(":")
-                        if len(parts) == 2:
-                            humidity.append(float(parts[1]))
-                    except Exception:
-                        pass
-
-            # --- VIBRACIÓN (LIST)
-            v_items = self.client.lrange(self.VIB_HIST.format(id=sid), -200, -1)
-            for entry in v_items:
-                # intentar JSON primero
-                try:
-                    obj = json.loads(entry)
-                    # si guardas objetos o formatos distintos, intenta mapear:
-                    # si es {"pulse": X} o similar
-                    if isinstance(obj, dict) and "pulse" in obj:
-                        vibration.append(float(obj["pulse"]))
-                        continue
-                except Exception:
-                    pass
-                # fallback: si es "timestamp:value" como antes
-                try:
-                    parts = entry.split(":")
-                    if len(parts) == 2:
-                        vibration.append(float(parts[1]))
-                except Exception:
-                    pass
-
-            # --- INCLINACIÓN (LIST)
-            inc_items = self.client.lrange(self.INC_HIST.format(id=sid), -200, -1)
-            for entry in inc_items:
-                try:
-                    obj = json.loads(entry)
-                    val = obj.get("estado") if isinstance(obj, dict) else None
-                    if val is None:
-                        # legacy
-                        parts = entry.split(":")
-                        if len(parts) == 2 and parts[1].isdigit():
-                            tilt_events += int(parts[1])
-                    else:
-                        tilt_events += int(val)
-                except Exception:
-                    try:
-                        parts = entry.split(":")
-                        if len(parts) == 2 and parts[1].isdigit():
-                            tilt_events += int(parts[1])
-                    except Exception:
-                        pass
+        # cada lista se decodifica entera a un array('d'); las estadísticas salen de una pasada
+        for offset in range(0, len(sensor_ids) * 7, 7):
+            h_packed, h_items, v_packed, v_items, inc_packed, inc_items, vib_stats = (
+                self._ok(result, []) for result in results[offset:offset + 7]
+            )
+            humidity.append(series.packed_values(h_packed) if h_packed else series.humidity(h_items))
+            vibration.append(series.packed_values(v_packed) if v_packed else series.pulses(v_items))
+            if inc_packed:
+                tilt_events += int(sum(series.packed_values(inc_packed)))
+            else:
+                tilt_events += series.tilt_events(inc_items)
 
             # --- STATS VIBRACIÓN (ZSET) -> algunos guardan score=pulse
+            vibration.append(array("d", (score for _, score in vib_stats if score is not None)))
+
+        alert_items, last_raw, latest_alert = results[-3:]
+        alert_tilt, hit_events = self._count_alert_events(self._ok(alert_items, []))
+        tilt_events += alert_tilt
+        last_seq, last_ts = self._last_packet(last_raw, self._ok(latest_alert, []))
+        hum = series.summarize(humidity)
+        pulse = series.summarize(vibration)
+
+        # mismas claves que `_read_daily_aggregates`: el cliente no distingue la fuente
+        return {
+            "pulse_avg": round(pulse.mean, 2),
+            "pulse_peak": pulse.peak,
+
+            "humidity_avg": round(hum.mean, 2),
+            "humidity_peak": hum.peak,
+            "humidity_floor": hum.floor,
+
+            "hit_events": hit_events,
+            "inclination_events": tilt_events,
+            "total_readings": max(hum.count, pulse.count),
+            "last_seq": last_seq,
+            "last_timestamp": last_ts
+        }
+
+    def read_sensor_breakdown(self, sensor_ids=None, bucket=None):
+        """Solo el desglose por sensor de `_read_with_breakdown`."""
+        return self._read_with_breakdown(sensor_ids, bucket)[1]
+
+    def _read_with_breakdown(self, sensor_ids=None, bucket=None):
+        """
+        Totales del día y estadísticas por sensor (todos o `sensor_ids`; los ids desconocidos
+        se ignoran) en un único pipeline tras descubrir los sensores. Conteos, medias, extremos
+        y eventos salen de los agregados del día, así que suman lo mismo que los totales; del
+        historial solo se lee el último registro o, con `bucket`, la ventana, recortada al día.
+        """
+        discovered = self._discover_sensor_ids()
+        known = discovered
+        if sensor_ids is not None:
+            wanted = set(sensor_ids)
+            known = [sid for sid in known if sid in wanted]
+        day = timezone.localdate()
+        start = timezone.make_aware(datetime.combine(day, datetime.min.time())).timestamp()
+        end = start + 86400
+        window = self.HISTORY_WINDOW if bucket else 1
+
+        pipe = self.client.pipeline(transaction=False)
+        queued = self._queue_daily_aggregates(pipe, day.isoformat())
+        for sid in known:
+            self._queue_series(pipe, sid, window)
+        results = pipe.execute(raise_on_error=False)
+        aggregates = results[:queued]
+        totals = self._daily_totals(aggregates)
+        if totals is None:
+            # día sin agregados (escritor anterior a record_packets): todo sale del historial
+            return self._read_from_history(discovered), self._history_breakdown(known, bucket, start, end)
+
+        counters = {}
+        for key, value in self._ok(aggregates[0], {}).items():
+            sid, _, name = key.rpartition(":")
+            counters.setdefault(sid, {})[name] = float(value)
+        extremes = {
+            name: {str(member): score for member, score in self._ok(result, [])}
+            for name, result in zip(self.EXTREMES, aggregates[1:1 + len(self.EXTREMES)])
+        }
+
+        sensors = {}
+        for index, sid in enumerate(known):
+            offset = queued + index * len(self.BREAKDOWN_HISTORIES) * 2
+            columns = self._series_columns(results[offset:offset + len(self.BREAKDOWN_HISTORIES) * 2], start, end)
+            sensor = counters.get(str(sid), {})
+            stats = {
+                "humidity": self._aggregate_stats(sensor, extremes, str(sid), "hum", columns["humidity"]),
+                "pulse": self._aggregate_stats(sensor, extremes, str(sid), "pulse", columns["vibration"]),
+                "inclination_events": int(sensor.get("tilt", 0)),
+                "hit_events": int(sensor.get("hit", 0)),
+                "last_timestamp": self._last_timestamp(columns),
+            }
+            if bucket:
+                stats["buckets"] = {
+                    "humidity": series.bucketize(*columns["humidity"], bucket),
+                    "pulse": series.bucketize(*columns["vibration"], bucket),
+                }
+            sensors[sid] = stats
+        return totals, sensors
+
+    def _history_breakdown(self, known, bucket, start, end):
+        """Desglose desde la ventana de historial (recortada al día) cuando el día no tiene agregados."""
+        pipe = self.client.pipeline(transaction=False)
+        for sid in known:
+            self._queue_series(pipe, sid, self.HISTORY_WINDOW, self.HISTORIES)
+        results = pipe.execute(raise_on_error=False)
+        sensors = {}
+        for index, sid in enumerate(known):
+            offset = index * len(self.HISTORIES) * 2
+            columns = self._series_columns(results[offset:offset + len(self.HISTORIES) * 2], start, end, self.HISTORIES)
+            stats = {
+                "humidity": series.describe(columns["humidity"][1]),
+                "pulse": series.describe(columns["vibration"][1]),
+                "inclination_events": int(sum(columns["inclination"][1])),
+                "last_timestamp": self._last_timestamp(columns),
+            }
+            if bucket:
+                stats["buckets"] = {
+                    "humidity": series.bucketize(*columns["humidity"], bucket),
+                    "pulse": series.bucketize(*columns["vibration"], bucket),
+                }
+            sensors[sid] = stats
+        return sensors
+
+    def _queue_series(self, pipe, sid, window, histories=None):
+        # el compacto y la lista: 2 comandos por serie
+        for _, template, packed in histories or self.BREAKDOWN_HISTORIES:
+            self.read_packed(pipe, packed.format(id=sid), window)
+            pipe.lrange(template.format(id=sid), -window, -1)
+
+    def _series_columns(self, results, start, end, histories=None):
+        """`{serie: (epochs, valores)}` de lo encolado por `_queue_series`, solo con registros en `[start, end)`."""
+        columns = {}
+        for position, (kind, _, _) in enumerate(histories or self.BREAKDOWN_HISTORIES):
+            blob, items = (self._ok(result, []) for result in results[position * 2:position * 2 + 2])
+            if blob:
+                epochs, values = series.packed_columns(blob)
+            else:
+                epochs, values = series.record_columns(series.history_records(items, kind))
+            columns[kind] = series.clip(epochs, values, start, end)
+        return columns
+
+    @staticmethod
+    def _aggregate_stats(counters, extremes, sid, prefix, column):
+        count = int(counters.get(f"{prefix}_count", 0))
+        values = column[1]
+        return {
+            "count": count,
+            "avg": round(counters.get(f"{prefix}_sum", 0) / count, 2) if count else None,
+            "min": extremes[f"{prefix}_min"].get(sid),
+            "max": extremes[f"{prefix}_max"].get(sid),
+            "last": values[-1] if values else None,
+        }
+
+    def _last_timestamp(self, columns):
+        last_epoch = max(columns["humidity"][0][-1:] + columns["vibration"][0][-1:], default=0)
+        if not last_epoch:
+            return None
+        return self._packet_ts(datetime.fromtimestamp(last_epoch, tz=timezone.get_default_timezone()))
+
+    @staticmethod
+    def _ok(result, default):
+        # con raise_on_error=False el pipeline devuelve la excepción en lugar de lanzarla
+        return default if isinstance(result, Exception) or result is None else result
+
+    # --- STATS ALERTA (ZSET con JSON) -> agregar conteo de eventos
+    def _count_alert_events(self, items):
+        tilt_events = 0
+        hit_events = 0
+        for raw in items:
             try:
-                vib_stats = self.client.zrange(self.VIB_STATS.format(id=sid), 0, -1, withscores=True)
-                vibration.extend([float(score) for (_, score) in vib_stats if score is not None])
+                data = json.loads(raw)
+                for s in data.get("payload", {}).get("samples", []):
+                    if s.get("tilt") == 1:
+                        tilt_events += 1
+                    if s.get("vib", {}).get("hit", 0) == 1:
+                        hit_events += 1
             except Exception:
                 pass
+        return tilt_events, hit_events
 
-        # --- STATS ALERTA (ZSET con JSON) -> agregar conteo de eventos
-        try:
-            alert_items = self.client.zrange(self.ALERT_STATS, 0, -1)
-            for raw in alert_items:
-                try:
-                    data = json.loads(raw)
-                    for s in data.get("payload", {}).get("samples", []):
-                        if s.get("tilt") == 1:
-                            tilt_events += 1
-                        if s.get("vib", {}).get("hit", 0) == 1:
-                            hit_events += 1
-                except Exception:
-                    pass
-        except Exception:
-            pass
-
-        # --- último paquete guardado explícitamente (mejor fuente para last_ts/seq)
-        last_seq = None
-        last_ts = None
+    # --- último paquete guardado explícitamente (mejor fuente para last_ts/seq)
+    def _last_packet(self, last_raw, latest_alert):
         try:
-            last_raw = self.client.get("sensor:last_packet")
+            if isinstance(last_raw, Exception):
+                raise last_raw
             if last_raw:
                 last_obj = json.loads(last_raw)
-                last_seq = last_obj.get("seq")
-                last_ts = last_obj.get("ts")
+                return last_obj.get("seq"), last_obj.get("ts")
+            return None, None
         except Exception:
-            # fallback a última alerta en zset (si quieres)
+            # fallback a última alerta en zset
             try:
-                latest_alert = self.client.zrevrange(self.ALERT_STATS, 0, 0)
                 if latest_alert:
                     a = json.loads(latest_alert[0])
-                    last_seq = a.get("seq") or a.get("payload", {}).get("seq")
-                    last_ts = a.get("timestamp") or a.get("payload", {}).get("ts")
+                    return (
+                        a.get("seq") or a.get("payload", {}).get("seq"),
+                        a.get("timestamp") or a.get("payload", {}).get("ts"),
+                    )
             except Exception:
                 pass
+        return None, None
 
-        return {
-            "pulse_avg": round(sum(vibration) / len(vibration), 2) if vibration else 0,
-            "pulse_peak": max(vibration) if vibration else 0,
-
-            "humidity_avg": round(sum(humidity) / len(humidity), 2) if humidity else 0,
-            "humidity_peak": max(humidity) if humidity else 0,
-            "humidity_floor": min(humidity) if humidity else 0,
-
-            "hit_events": hit_events,
-            "inclination_events": tilt_events,
-            "total_readings": max(len(humidity), len(vibration)),
-            "last_seq": last_seq,
-            "last_timestamp": last_ts
-        }
-
-    # detectar sensores disponibles
+    # detectar sensores disponibles: registro explícito o SCAN incremental (nunca KEYS)
     def _discover_sensor_ids(self):
-        keys = self.client.keys("sensor:humedad:*:historico")
+        raw_ids = self.client.smembers(self.SENSOR_REGISTRY)
+        if not raw_ids:
+            raw_ids = (
+                k.split(":")[2]
+                for template in (self.HUM_PACKED, self.HUM_HIST)
+                for k in self.client.scan_iter(
+                    match=template.format(id="*"), count=self.SCAN_COUNT
+                )
+            )
         ids = set()
-        for k in keys:
+        for raw in raw_ids:
             try:
-                ids.add(int(k.split(":")[2]))
-            except:
+                ids.add(int(raw))
+            except (TypeError, ValueError):
                 pass
         return sorted(ids or [1])
-# -------------------------------
@@ -0,0 +1,232 @@
+"""
+Pool de conexiones Redis compartido por proceso, con circuit breaker y contadores.
+
+Cada worker crea el cliente una sola vez (de forma perezosa y thread-safe); las vistas
+reutilizan sus conexiones en lugar de abrir una conexión + PING por petición.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from . import metrics
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+class RedisCounters:
+    """Contadores acumulados por proceso (conexiones, fallos, esperas en el pool...)."""
+
+    NAMES = (
+        'connects',
+        'connect_failures',
+        'pool_waits',
+        'command_failures',
+        'breaker_opened',
+        'breaker_rejections',
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = dict.fromkeys(self.NAMES, 0)
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+
+class CircuitBreaker:
+    """
+    Tras `failure_threshold` fallos consecutivos deja de intentar Redis durante
+    `reset_timeout` segundos; luego permite una única petición de prueba (half-open).
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=None, reset_timeout=None, counters=None):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self.counters = counters
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def failure_threshold(self):
+        if self._failure_threshold is not None:
+            return self._failure_threshold
+        return getattr(settings, 'REDIS_BREAKER_THRESHOLD', 3)
+
+    @property
+    def reset_timeout(self):
+        if self._reset_timeout is not None:
+            return self._reset_timeout
+        return getattr(settings, 'REDIS_BREAKER_RESET', 10.0)
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+        if self.counters:
+            self.counters.incr('breaker_rejections')
+        return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            reopen = self._trial_in_flight or self._failures >= self.failure_threshold
+            self._trial_in_flight = False
+            if reopen:
+                was_closed = self._opened_at is None
+                self._opened_at = time.monotonic()
+        if reopen and was_closed and self.counters:
+            self.counters.incr('breaker_opened')
+
+
+counters = RedisCounters()
+breaker = CircuitBreaker(counters=counters)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+if redis is not None:
+
+    class _CountingConnectionMixin:
+
+        def connect(self):
+            if self._sock:
+                return
+            try:
+                super().connect()
+            except Exception:
+                counters.incr('connect_failures')
+                raise
+            counters.incr('connects')
+
+    class _CountingBlockingPool(redis.BlockingConnectionPool):
+
+        def get_connection(self, command_name, *keys, **options):
+            # la cola vacía significa que todas las conexiones están prestadas: toca esperar
+            if self.pool.empty():
+                counters.incr('pool_waits')
+            return super().get_connection(command_name, *keys, **options)
+
+    class _TimedPipeline(redis.client.Pipeline):
+
+        def immediate_execute_command(self, *args, **options):
+            # tras WATCH los comandos se ejecutan al momento, uno por ida y vuelta
+            started = time.perf_counter()
+            try:
+                return super().immediate_execute_command(*args, **options)
+            finally:
+                metrics.record_redis('command', 1, time.perf_counter() - started)
+
+        def execute(self, raise_on_error=True):
+            commands = len(self.command_stack)
+            started = time.perf_counter()
+            try:
+                return super().execute(raise_on_error)
+            finally:
+                if commands:
+                    metrics.record_redis('pipeline', commands, time.perf_counter() - started)
+
+    class _TimedRedis(redis.Redis):
+        """Registra cada comando y cada pipeline (cantidad y latencia) en `services.metrics`."""
+
+        def execute_command(self, *args, **options):
+            started = time.perf_counter()
+            try:
+                return super().execute_command(*args, **options)
+            finally:
+                metrics.record_redis('command', 1, time.perf_counter() - started)
+
+        def pipeline(self, transaction=True, shard_hint=None):
+            return _TimedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+def _build_client(url):
+    pool = _CountingBlockingPool.from_url(
+        url,
+        decode_responses=True,
+        max_connections=getattr(settings, 'REDIS_MAX_CONNECTIONS', 20),
+        timeout=getattr(settings, 'REDIS_POOL_TIMEOUT', 0.5),
+        socket_timeout=getattr(settings, 'REDIS_SOCKET_TIMEOUT', 1.0),
+        socket_connect_timeout=getattr(settings, 'REDIS_CONNECT_TIMEOUT', 0.5),
+        health_check_interval=getattr(settings, 'REDIS_HEALTH_CHECK_INTERVAL', 30),
+    )
+    base = pool.connection_class
+    pool.connection_class = type(f"Counting{base.__name__}", (_CountingConnectionMixin, base), {})
+    return _TimedRedis(connection_pool=pool)
+
+
+def get_client():
+    """Cliente compartido del proceso, o None si Redis no está configurado."""
+    global _client
+    url = getattr(settings, 'REDIS_URL', None)
+    if not url or redis is None:
+        return None
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _build_client(url)
+                logger.info("Pool Redis inicializado (max_connections=%s)", _client.connection_pool.max_connections)
+    return _client
+
+
+def reset_client():
+    """Descarta el pool actual (p. ej. tras cambiar REDIS_URL en pruebas)."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.connection_pool.disconnect()
+        _client = None
+
+
+def stats():
+    pool = _client.connection_pool if _client is not None else None
+    return {
+        'counters': counters.snapshot(),
+        'breaker': breaker.state,
+        'pool': {
+            'max_connections': pool.max_connections,
+            'created_connections': len(pool._connections),
+        } if pool is not None else None,
+    }
@@ -0,0 +1,154 @@
+"""
+Rollups por hora, día y mes del histórico de sensores.
+
+La ingesta suma cada lote a sus buckets (`apply_packets`) y `rebuild` los recalcula desde
+`SensorSample`. La lectura para el dashboard vive en `services.historical`.
+"""
+from __future__ import annotations
+
+from datetime import datetime, time
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour, TruncMonth
+from django.utils import timezone
+
+from monitoring.models import SensorRollup, SensorSample
+
+TRUNCATORS = {
+    SensorRollup.HOUR: TruncHour,
+    SensorRollup.DAY: TruncDay,
+    SensorRollup.MONTH: TruncMonth,
+}
+
+COUNTERS = ('total_readings', 'soil_sum', 'pulse_sum', 'tilt_events', 'hit_events')
+
+
+def bucket_start(moment, granularity):
+    local = timezone.localtime(moment)
+    if granularity == SensorRollup.HOUR:
+        naive = datetime.combine(local.date(), time(local.hour))
+    elif granularity == SensorRollup.DAY:
+        naive = datetime.combine(local.date(), time.min)
+    else:
+        naive = datetime(local.year, local.month, 1)
+    return timezone.make_aware(naive)
+
+
+# -------------------------------
+# ESCRITURA
+# -------------------------------
+def apply_packets(packets):
+    """Suma paquetes normalizados (ver `services.ingest.parse_packet`) a sus rollups."""
+    deltas = {}
+    for packet in packets:
+        for granularity in TRUNCATORS:
+            key = (granularity, bucket_start(packet["ts"], granularity))
+            delta = deltas.setdefault(key, empty_bucket())
+            for sample in packet["samples"]:
+                _merge_sample(delta, packet["ts"], sample["soil"]["pct"], sample["vib"]["pulse"],
+                              sample["tilt"], sample["vib"]["hit"])
+    if deltas:
+        _upsert(deltas)
+
+
+def empty_bucket():
+    return {
+        'total_readings': 0, 'soil_sum': 0.0, 'pulse_sum': 0, 'tilt_events': 0, 'hit_events': 0,
+        'soil_min': None, 'soil_max': None, 'pulse_min': None, 'pulse_max': None,
+        'first_timestamp': None, 'last_timestamp': None,
+    }
+
+
+def _merge_sample(delta, ts, soil_pct, pulse, tilt, hit):
+    delta['total_readings'] += 1
+    delta['soil_sum'] += soil_pct
+    delta['pulse_sum'] += pulse
+    delta['tilt_events'] += 1 if tilt else 0
+    delta['hit_events'] += 1 if hit else 0
+    merge_bounds(delta, {
+        'soil_min': soil_pct, 'soil_max': soil_pct, 'pulse_min': pulse, 'pulse_max': pulse,
+        'first_timestamp': ts, 'last_timestamp': ts,
+    })
+
+
+def merge_bounds(target, other):
+    for field in ('soil_min', 'pulse_min', 'first_timestamp'):
+        if other[field] is not None and (target[field] is None or other[field] < target[field]):
+            target[field] = other[field]
+    for field in ('soil_max', 'pulse_max', 'last_timestamp'):
+        if other[field] is not None and (target[field] is None or other[field] > target[field]):
+            target[field] = other[field]
+
+
+def _upsert(deltas):
+    with transaction.atomic():
+        lookup = Q()
+        for granularity, bucket in deltas:
+            lookup |= Q(granularity=granularity, bucket=bucket)
+        existing = {
+            (row.granularity, row.bucket): row
+            for row in SensorRollup.objects.select_for_update().filter(lookup)
+        }
+        to_update, to_create = [], []
+        for (granularity, bucket), delta in deltas.items():
+            row = existing.get((granularity, bucket))
+            if row is None:
+                to_create.append(SensorRollup(granularity=granularity, bucket=bucket, **delta))
+                continue
+            for field in COUNTERS:
+                setattr(row, field, getattr(row, field) + delta[field])
+            current = {field: getattr(row, field) for field in delta if field not in COUNTERS}
+            merge_bounds(current, delta)
+            for field, value in current.items():
+                setattr(row, field, value)
+            to_update.append(row)
+        if to_create:
+            SensorRollup.objects.bulk_create(to_create)
+        if to_update:
+            SensorRollup.objects.bulk_update(to_update, list(empty_bucket()))
+
+
+def rebuild(granularities=None, batch_size=2000):
+    """Recalcula los rollups desde cero a partir de `SensorSample`."""
+    granularities = granularities or list(TRUNCATORS)
+    created = {}
+    with transaction.atomic():
+        SensorRollup.objects.filter(granularity__in=granularities).delete()
+        for granularity in granularities:
+            rows = (
+                SensorSample.objects
+                .annotate(rollup_bucket=TRUNCATORS[granularity]('timestamp'))
+                .values('rollup_bucket')
+                .annotate(
+                    total_readings=Count('id'),
+                    soil_sum=Sum('soil_pct'),
+                    soil_min=Min('soil_pct'),
+                    soil_max=Max('soil_pct'),
+                    pulse_sum=Sum('vib_pulse'),
+                    pulse_min=Min('vib_pulse'),
+                    pulse_max=Max('vib_pulse'),
+                    tilt_events=Count('id', filter=Q(tilt=True)),
+                    hit_events=Count('id', filter=Q(vib_hit=True)),
+                    first_timestamp=Min('timestamp'),
+                    last_timestamp=Max('timestamp'),
+                )
+                .order_by()
+            )
+            objs = [
+                SensorRollup(granularity=granularity, bucket=row.pop('rollup_bucket'), **row)
+                for row in rows.iterator(chunk_size=batch_size)
+            ]
+            SensorRollup.objects.bulk_create(objs, batch_size=batch_size)
+            created[granularity] = len(objs)
+    # import diferido: dashboard_cache depende de historical, que importa este módulo
+    from .dashboard_cache import invalidate
+
+    invalidate()
+    return created
+
+
+def latest_timestamp():
+    return SensorRollup.objects.filter(granularity=SensorRollup.MONTH).aggregate(
+        latest=Max('last_timestamp')
+    )['latest']
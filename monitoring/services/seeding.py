@@ -0,0 +1,205 @@
+"""
+Generación masiva de datos simulados para `seed_sensor_data`.
+
+Cada día se genera con su propio `random.Random` (semilla + fecha) y sus `seq` e ids de
+paquete y sample salen del índice del día, así que el resultado no depende de cómo se
+reparta el rango: los bloques de días pueden escribirse en cualquier orden y desde varios
+procesos. Los ids se asignan de antemano (no hace falta un INSERT por paquete para conocer
+su clave) y cada bloque se escribe en una transacción con `COPY ... FROM STDIN` en
+PostgreSQL o `executemany` en el resto de bases. Al terminar se ajustan las secuencias.
+"""
+from __future__ import annotations
+
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from monitoring.models import SensorPacket, SensorSample
+
+from . import dashboard_cache
+
+SEED = 42
+# samples por bloque escrito en una transacción (el bloque siempre abarca días completos)
+BLOCK_SAMPLES = 50_000
+
+PACKET_COLUMNS = ('id', 'seq', 'timestamp', 'alerta', 'created_at', 'updated_at')
+SAMPLE_COLUMNS = (
+    'id', 'packet_id', 'timestamp', 'sample_id', 'soil_raw', 'soil_pct',
+    'tilt', 'vib_pulse', 'vib_hit', 'created_at', 'updated_at',
+)
+
+
+@dataclass(frozen=True)
+class SeedPlan:
+    start: date
+    end: date
+    per_day: int
+    sensors: int
+    first_packet_id: int = 1
+    first_sample_id: int = 1
+    first_seq: int = 1
+    seed: int = SEED
+
+    @property
+    def days(self):
+        return (self.end - self.start).days + 1
+
+    @property
+    def packets(self):
+        return self.days * self.per_day
+
+    @property
+    def samples(self):
+        return self.packets * self.sensors
+
+    @property
+    def block_days(self):
+        return max(1, BLOCK_SAMPLES // (self.per_day * self.sensors))
+
+    def blocks(self):
+        """Rangos `[desde, hasta)` de índices de día que se escriben juntos."""
+        return [(first, min(first + self.block_days, self.days)) for first in range(0, self.days, self.block_days)]
+
+
+def plan(start, end, per_day, sensors):
+    """Plan para `[start, end]` (fechas locales) con ids a continuación de los existentes."""
+    last_packet = SensorPacket.objects.aggregate(last=Max('id'))['last'] or 0
+    last_sample = SensorSample.objects.aggregate(last=Max('id'))['last'] or 0
+    last_seq = SensorPacket.objects.aggregate(last=Max('seq'))['last'] or 0
+    return SeedPlan(
+        start=start,
+        end=end,
+        per_day=per_day,
+        sensors=sensors,
+        first_packet_id=last_packet + 1,
+        first_sample_id=last_sample + 1,
+        first_seq=last_seq + 1,
+    )
+
+
+def generate_day(plan, index):
+    """Filas `(paquetes, samples)` del día `index` del plan, en el orden de `*_COLUMNS` sin las fechas de auditoría."""
+    day = plan.start + timedelta(days=index)
+    rng = random.Random(f'{plan.seed}:{day.isoformat()}')
+    base = timezone.make_aware(datetime.combine(day, time.min))
+    slot_seconds = 86400 // plan.per_day
+    first = index * plan.per_day
+
+    packets, samples = [], []
+    for slot in range(plan.per_day):
+        number = first + slot
+        packet_id = plan.first_packet_id + number
+        timestamp = base + timedelta(seconds=slot * slot_seconds + rng.randrange(max(1, slot_seconds)))
+        packets.append((packet_id, plan.first_seq + number, timestamp, rng.random() > 0.85))
+
+        sample_id = plan.first_sample_id + number * plan.sensors
+        for sensor in range(1, plan.sensors + 1):
+            soil_raw = rng.randint(250, 900)
+            soil_pct = max(0, min(100, round((soil_raw / 1024) * 100 + rng.uniform(-3, 3), 2)))
+            samples.append((
+                sample_id, packet_id, timestamp, sensor, soil_raw, soil_pct,
+                rng.random() > 0.78, rng.randint(40, 1400), rng.random() > 0.7,
+            ))
+            sample_id += 1
+    return packets, samples
+
+
+def parallel_supported():
+    # SQLite admite un único escritor: los procesos solo se estorbarían
+    return connection.vendor == 'postgresql'
+
+
+def seed(plan, workers=1, progress=None):
+    """
+    Escribe el plan completo y devuelve `(paquetes, samples)`. Con `workers > 1` (solo
+    PostgreSQL) los bloques de días se reparten entre procesos. `progress(paquetes)` se
+    llama al terminar cada bloque.
+    """
+    blocks = plan.blocks()
+    packets = samples = 0
+    if workers > 1 and parallel_supported() and len(blocks) > 1:
+        # los procesos hijos no deben heredar la conexión abierta del padre
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = [pool.submit(write_days, plan, first, last) for first, last in blocks]
+            for future in as_completed(futures):
+                done = future.result()
+                packets += done[0]
+                samples += done[1]
+                if progress:
+                    progress(packets)
+    else:
+        for first, last in blocks:
+            done = write_days(plan, first, last)
+            packets += done[0]
+            samples += done[1]
+            if progress:
+                progress(packets)
+    reset_sequences()
+    dashboard_cache.invalidate()
+    return packets, samples
+
+
+def _init_worker():
+    import django
+
+    django.setup()
+
+
+def write_days(plan, first, last):
+    """Genera y escribe los días `[first, last)` del plan en una transacción."""
+    packets, samples = [], []
+    for index in range(first, last):
+        day_packets, day_samples = generate_day(plan, index)
+        packets.extend(day_packets)
+        samples.extend(day_samples)
+
+    now = timezone.now()
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            _copy(cursor, SensorPacket, PACKET_COLUMNS, packets, (now, now))
+            _copy(cursor, SensorSample, SAMPLE_COLUMNS, samples, (now, now))
+        else:
+            adapt = connection.ops.adapt_datetimefield_value
+            stamp = adapt(now)
+            stamps = {row[2]: adapt(row[2]) for row in packets}
+            _insert(cursor, SensorPacket, PACKET_COLUMNS, (
+                (row[0], row[1], stamps[row[2]], row[3], stamp, stamp) for row in packets
+            ))
+            _insert(cursor, SensorSample, SAMPLE_COLUMNS, (
+                (*row[:2], stamps[row[2]], *row[3:], stamp, stamp) for row in samples
+            ))
+    return len(packets), len(samples)
+
+
+def _columns(columns):
+    return ', '.join(connection.ops.quote_name(column) for column in columns)
+
+
+def _copy(cursor, model, columns, rows, audit):
+    table = connection.ops.quote_name(model._meta.db_table)
+    with cursor.copy(f'COPY {table} ({_columns(columns)}) FROM STDIN') as copy:
+        for row in rows:
+            copy.write_row(row + audit)
+
+
+def _insert(cursor, model, columns, rows):
+    table = connection.ops.quote_name(model._meta.db_table)
+    placeholders = ', '.join(['%s'] * len(columns))
+    cursor.executemany(f'INSERT INTO {table} ({_columns(columns)}) VALUES ({placeholders})', rows)
+
+
+def reset_sequences():
+    """Deja las secuencias de id después de los ids escritos a mano (no-op en SQLite)."""
+    statements = connection.ops.sequence_reset_sql(no_style(), [SensorPacket, SensorSample])
+    if not statements:
+        return
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
@@ -0,0 +1,320 @@
+"""
+Decodificación por lotes de los historiales de Redis (`sensor:*:{id}:historico`).
+
+Cada lista se decodifica completa con una sola estrategia según su formato, que se detecta
+una vez por clave: JSON (`{"ts": .., "porcentaje": ..}`) se parsea uniendo las entradas en
+un único arreglo JSON, y el formato legacy (`<ts>:<valor>`) con una sola expresión regular
+sobre la lista completa. Los valores quedan en `array('d')` compactos y las estadísticas se
+calculan sobre todos ellos juntos, con NumPy si está instalado.
+
+Formato compacto (versión `PACKED_VERSION`, en claves `...:packed:v1`): un string de Redis
+con registros de ancho fijo `<valor:f64><epoch:f64>` little-endian, que se agregan con
+`APPEND` y se leen con `GETRANGE` (solo la ventana pedida). Decodificarlo es copiar bytes
+a un `array('d')` y tomar uno de cada dos valores.
+"""
+from __future__ import annotations
+
+import json
+import math
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.utils import timezone
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+JSON = "json"
+LEGACY = "legacy"
+
+PACKED_VERSION = 1
+RECORD = struct.Struct("<dd")
+
+# campo de cada serie en el formato JSON, en orden de preferencia
+FIELDS = {
+    "humidity": ("porcentaje", "pct"),
+    "vibration": ("pulse",),
+    "inclination": ("estado",),
+}
+
+# `<ts>:<valor>` con exactamente un ":" (las entradas con más partes se ignoran, como antes)
+_LEGACY_VALUE = re.compile(r"^[^:\n]*:([^:\n]*)$", re.MULTILINE)
+
+
+@dataclass(frozen=True)
+class SeriesStats:
+    count: int = 0
+    mean: float = 0.0
+    peak: float = 0.0
+    floor: float = 0.0
+    p50: float = 0.0
+    p95: float = 0.0
+
+
+def detect_format(items):
+    for entry in items:
+        if entry:
+            return JSON if entry.lstrip().startswith("{") else LEGACY
+    return JSON
+
+
+def _decode_json(items):
+    try:
+        return json.loads("[" + ",".join(items) + "]")
+    except ValueError:
+        # alguna entrada corrupta: solo entonces se decodifica una por una
+        decoded = []
+        for entry in items:
+            try:
+                decoded.append(json.loads(entry))
+            except ValueError:
+                decoded.append(None)
+        return decoded
+
+
+def _to_array(values):
+    try:
+        return array("d", values)
+    except TypeError:
+        pass
+    result = array("d")
+    for value in values:
+        try:
+            result.append(float(value))
+        except (TypeError, ValueError):
+            pass
+    return result
+
+
+def _legacy_values(items):
+    matches = _LEGACY_VALUE.findall("\n".join(items))
+    try:
+        return array("d", map(float, matches))
+    except ValueError:
+        return _to_array(matches)
+
+
+def _json_field(items, *names):
+    values = []
+    for obj in _decode_json(items):
+        if isinstance(obj, dict):
+            for name in names:
+                # mismo criterio que el parser anterior: el primer campo con valor no vacío
+                value = obj.get(name)
+                if value:
+                    values.append(value)
+                    break
+    return values
+
+
+def humidity(items):
+    """Porcentajes de humedad de una lista (`porcentaje` o `pct`)."""
+    if detect_format(items) == LEGACY:
+        return _legacy_values(items)
+    return _to_array(_json_field(items, "porcentaje", "pct"))
+
+
+def pulses(items):
+    """Pulsos de vibración de una lista (`pulse`)."""
+    if detect_format(items) == LEGACY:
+        return _legacy_values(items)
+    values = [obj["pulse"] for obj in _decode_json(items) if isinstance(obj, dict) and "pulse" in obj]
+    return _to_array(values)
+
+
+def tilt_events(items):
+    """Suma de los estados de inclinación de una lista (`estado`, 0/1)."""
+    if detect_format(items) == LEGACY:
+        return sum(int(value) for value in _LEGACY_VALUE.findall("\n".join(items)) if value.isdigit())
+    total = 0
+    for obj in _decode_json(items):
+        if isinstance(obj, dict) and obj.get("estado") is not None:
+            try:
+                total += int(obj["estado"])
+            except (TypeError, ValueError):
+                pass
+    return total
+
+
+def summarize(chunks):
+    """Media, pico, piso y percentiles 50/95 de todos los arreglos de `chunks` juntos."""
+    chunks = [chunk for chunk in chunks if len(chunk)]
+    if not chunks:
+        return SeriesStats()
+    if np is not None:
+        data = np.concatenate([np.frombuffer(chunk, dtype=np.float64) for chunk in chunks])
+        p50, p95 = np.percentile(data, (50, 95))
+        return SeriesStats(
+            count=int(data.size),
+            mean=float(data.mean()),
+            peak=float(data.max()),
+            floor=float(data.min()),
+            p50=float(p50),
+            p95=float(p95),
+        )
+    data = array("d")
+    for chunk in chunks:
+        data.extend(chunk)
+    ordered = sorted(data)
+    return SeriesStats(
+        count=len(ordered),
+        mean=math.fsum(ordered) / len(ordered),
+        peak=ordered[-1],
+        floor=ordered[0],
+        p50=_percentile(ordered, 50),
+        p95=_percentile(ordered, 95),
+    )
+
+
+def _percentile(ordered, q):
+    # interpolación lineal entre rangos vecinos (mismo método por defecto que NumPy)
+    position = (len(ordered) - 1) * q / 100
+    low = math.floor(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+# -------------------------------
+# FORMATO COMPACTO
+# -------------------------------
+def pack(value, epoch):
+    return RECORD.pack(float(value), float(epoch))
+
+
+def pack_records(records):
+    """`(epoch, valor)` en orden de llegada -> bytes listos para `SET`/`APPEND`."""
+    return b"".join(RECORD.pack(float(value), float(epoch)) for epoch, value in records)
+
+
+def _packed_array(blob):
+    # un GETRANGE con inicio negativo puede cortar a mitad de registro: se descarta el resto
+    blob = bytes(blob)[len(blob) % RECORD.size:]
+    data = array("d")
+    data.frombytes(blob)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data
+
+
+def packed_values(blob):
+    """Valores de un blob compacto, como `array('d')`."""
+    return _packed_array(blob)[0::2]
+
+
+def packed_records(blob):
+    """Pares `(epoch, valor)` de un blob compacto."""
+    epochs, values = packed_columns(blob)
+    return list(zip(epochs, values))
+
+
+def packed_columns(blob):
+    """`(epochs, valores)` de un blob compacto, como dos `array('d')` paralelos."""
+    data = _packed_array(blob)
+    return data[1::2], data[0::2]
+
+
+def record_columns(records):
+    """`(epochs, valores)` de pares `(epoch, valor)` como los de `history_records`."""
+    return array("d", (epoch for epoch, _ in records)), array("d", (value for _, value in records))
+
+
+def to_epoch(raw_ts):
+    """Timestamp (datetime, epoch s/ms, ISO o "YYYY-MM-DD HH:MM:SS" local) a epoch; 0 si no se entiende."""
+    if raw_ts in (None, ""):
+        return 0.0
+    if isinstance(raw_ts, datetime):
+        moment = raw_ts
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment, timezone.get_default_timezone())
+        return moment.timestamp()
+    try:
+        epoch = float(raw_ts)
+        return epoch / 1000 if epoch > 1e12 else epoch
+    except (TypeError, ValueError):
+        pass
+    try:
+        moment = datetime.fromisoformat(str(raw_ts))
+    except ValueError:
+        return 0.0
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, timezone.get_default_timezone())
+    return moment.timestamp()
+
+
+def history_records(items, kind):
+    """Entradas JSON o legacy de una lista de historial -> `(epoch, valor)` para convertirlas."""
+    records = []
+    if detect_format(items) == LEGACY:
+        for match in _LEGACY_VALUE.finditer("\n".join(items)):
+            raw_ts, _, value = match.group(0).partition(":")
+            try:
+                records.append((to_epoch(raw_ts), float(value)))
+            except ValueError:
+                pass
+        return records
+    for obj in _decode_json(items):
+        if not isinstance(obj, dict):
+            continue
+        value = next((obj[name] for name in FIELDS[kind] if obj.get(name) is not None), None)
+        try:
+            records.append((to_epoch(obj.get("ts") or obj.get("timestamp")), float(value)))
+        except (TypeError, ValueError):
+            pass
+    return records
+
+
+# -------------------------------
+# DESGLOSE POR SENSOR
+# -------------------------------
+def describe(values):
+    """Conteo, media, mínimo, máximo y último valor de una serie de un sensor."""
+    if not len(values):
+        return {"count": 0, "avg": None, "min": None, "max": None, "last": None}
+    return {
+        "count": len(values),
+        "avg": round(math.fsum(values) / len(values), 2),
+        "min": min(values),
+        "max": max(values),
+        "last": values[-1],
+    }
+
+
+def clip(epochs, values, start, end):
+    """Registros con epoch en `[start, end)`, como dos `array('d')` paralelos."""
+    keep = [index for index, epoch in enumerate(epochs) if start <= epoch < end]
+    if len(keep) == len(epochs):
+        return epochs, values
+    return array("d", (epochs[index] for index in keep)), array("d", (values[index] for index in keep))
+
+
+def bucketize(epochs, values, width):
+    """
+    Buckets de `width` segundos alineados a epoch: columnas `t` (inicio del bucket), `min`,
+    `avg` y `max` ordenadas por tiempo. Los registros llegan casi siempre en orden, así que
+    cada bucket se ubica con `bisect` y se resume sobre un slice (sin recorrer cada valor en
+    Python). Se omiten registros sin timestamp.
+    """
+    ordered = sorted(epochs)
+    if ordered != epochs.tolist():
+        order = sorted(range(len(epochs)), key=epochs.__getitem__)
+        values = array("d", (values[index] for index in order))
+    epochs = ordered
+    columns = {"t": [], "min": [], "avg": [], "max": []}
+    low, end = bisect_right(epochs, 0), len(epochs)
+    while low < end:
+        start = int(epochs[low] // width) * width
+        high = bisect_left(epochs, start + width, low)
+        chunk = values[low:high]
+        columns["t"].append(start)
+        columns["min"].append(min(chunk))
+        columns["avg"].append(round(math.fsum(chunk) / len(chunk), 2))
+        columns["max"].append(max(chunk))
+        low = high
+    return columns
@@ -0,0 +1,113 @@
+"""
+Cache por proceso del snapshot en tiempo real con recomputo single-flight.
+
+Todas las pestañas del dashboard consultan `/realtime-redis/` cada 5 s; con este cache
+las peticiones concurrentes comparten un único cálculo por intervalo y la respuesta se
+serializa una sola vez (cuerpo JSON + ETag) para todos los clientes.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from . import metrics
+
+
+@dataclass(frozen=True)
+class CachedSnapshot:
+    data: dict
+    body: bytes
+    etag: str
+    expires_at: float
+
+    @classmethod
+    def build(cls, data, ttl):
+        body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True).encode()
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()[:20]
+        return cls(data=data, body=body, etag=etag, expires_at=time.monotonic() + ttl)
+
+    @property
+    def fresh(self):
+        return self.expires_at > time.monotonic()
+
+
+@dataclass
+class _Flight:
+    event: threading.Event = field(default_factory=threading.Event)
+    entry: CachedSnapshot | None = None
+    error: BaseException | None = None
+
+
+class SnapshotCache:
+
+    def __init__(self, ttl=None, wait_timeout=10.0, max_entries=64):
+        self._ttl = ttl
+        self.wait_timeout = wait_timeout
+        # una entrada por combinación de parámetros (sensores/bucket): se acota la cantidad
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._inflight = {}
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return getattr(settings, 'REALTIME_SNAPSHOT_TTL', 2.0)
+
+    def get(self, key, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.fresh:
+                metrics.SNAPSHOT_CACHE.inc(result='hit')
+                return entry
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        metrics.SNAPSHOT_CACHE.inc(result='miss' if leader else 'coalesced')
+        if not leader:
+            # otra petición ya está recalculando: esperar su resultado en lugar de duplicarlo
+            flight.event.wait(self.wait_timeout)
+            if flight.entry is not None:
+                return flight.entry
+            if entry is not None:
+                return entry
+            if flight.error is not None:
+                raise flight.error
+            return self.get(key, compute)
+
+        try:
+            flight.entry = CachedSnapshot.build(compute(), self.ttl)
+            with self._lock:
+                self._entries[key] = flight.entry
+                if len(self._entries) > self.max_entries:
+                    self._prune()
+            return flight.entry
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def _prune(self):
+        for key in [key for key, entry in self._entries.items() if not entry.fresh]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            del self._entries[min(self._entries, key=lambda key: self._entries[key].expires_at)]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+snapshot_cache = SnapshotCache()
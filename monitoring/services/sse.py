@@ -0,0 +1,114 @@
+"""
+Utilidades para Server-Sent Events servidos bajo ASGI (ver `monitoring.asgi`).
+
+Cada cliente conectado es una corrutina suspendida en el event loop (no un worker ni un
+hilo), así que el límite real es la memoria por conexión: `ConnectionLimiter` acota cuántas
+acepta cada proceso y responde 503 al resto.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import random
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+HEARTBEAT = ": ping\n\n"
+
+
+class ConnectionLimiter:
+    """Contador de conexiones SSE abiertas en el proceso (solo se usa desde el event loop)."""
+
+    def __init__(self, limit=None):
+        self._limit = limit
+        self.active = 0
+        self.rejected = 0
+
+    @property
+    def limit(self):
+        if self._limit is not None:
+            return self._limit
+        return getattr(settings, 'SSE_MAX_CONNECTIONS', 2000)
+
+    def try_acquire(self):
+        if self.active >= self.limit:
+            self.rejected += 1
+            return False
+        self.active += 1
+        return True
+
+    def release(self):
+        self.active = max(0, self.active - 1)
+
+
+limiter = ConnectionLimiter()
+
+
+def format_event(data, event=None, event_id=None, retry=None):
+    """Serializa un evento SSE; `data` ya debe venir como texto (JSON)."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    if retry is not None:
+        lines.append(f"retry: {int(retry)}")
+    lines.extend(f"data: {line}" for line in data.splitlines() or [""])
+    return "\n".join(lines) + "\n\n"
+
+
+# -------------------------------
+# STREAM SIMULADO
+# -------------------------------
+def simulated_packet(seq, rng):
+    timestamp = timezone.localtime()
+    sample_count = rng.randint(2, 4)
+    samples = []
+    for sensor_id in range(1, sample_count + 1):
+        soil_raw = rng.randint(250, 940)
+        soil_pct = round(min(100, max(0, (soil_raw / 1024) * 100 + rng.uniform(-2, 2))), 2)
+        tilt = 1 if rng.random() > 0.78 else 0
+        vib_hit = 1 if rng.random() > 0.7 else 0
+        samples.append({
+            'id': sensor_id,
+            'soil': {'raw': soil_raw, 'pct': soil_pct},
+            'tilt': tilt,
+            'vib': {
+                'pulse': rng.randint(60, 1500),
+                'hit': vib_hit,
+            },
+        })
+    payload = {
+        'seq': seq,
+        'alerta': 1 if any(sample['tilt'] or sample['vib']['hit'] for sample in samples) else 0,
+        'ts': timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+        'samples': samples,
+    }
+    return payload
+
+
+def simulated_event(seq, rng, retry=None):
+    return format_event(json.dumps(simulated_packet(seq, rng), cls=DjangoJSONEncoder), event_id=seq, retry=retry)
+
+
+async def simulated_events(interval, heartbeat=None):
+    """Un paquete simulado cada `interval` segundos y un comentario de heartbeat en los silencios largos."""
+    heartbeat = heartbeat or getattr(settings, 'SSE_HEARTBEAT_SECONDS', 15)
+    rng = random.Random()
+    seq_counter = itertools.count(start=int(timezone.now().timestamp()))
+    loop = asyncio.get_running_loop()
+    next_event = loop.time()
+    while True:
+        wait = next_event - loop.time()
+        if wait <= 0:
+            yield simulated_event(next(seq_counter), rng)
+            next_event += interval
+        elif wait > heartbeat:
+            # mantiene vivos los proxies intermedios y hace fallar pronto el envío a clientes caídos
+            await asyncio.sleep(heartbeat)
+            yield HEARTBEAT
+        else:
+            await asyncio.sleep(wait)
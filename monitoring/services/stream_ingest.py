@@ -0,0 +1,234 @@
+"""
+Ingesta desde un Redis Stream con consumer group (`manage.py consume_packets`).
+
+Los puentes del borde agregan paquetes crudos a `INGEST_STREAM` (`XADD ... data <json>`).
+Cada worker lee lotes con `XREADGROUP`, los valida con `ingest.parse_packet`, los escribe con
+`ingest.store_packets` (el mismo camino que `POST /ingest/packets/`, que al confirmar
+actualiza también los agregados de Redis) y solo entonces hace `XACK`. Si un worker muere con
+mensajes entregados y sin confirmar, otro los reclama con `XCLAIM` cuando superan
+`claim_idle_ms`; los que fallan demasiadas veces van a `<stream>:dead`.
+
+Varios procesos con el mismo grupo y distinto nombre de consumidor se reparten el Stream.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+
+from . import ingest
+
+try:
+    import redis
+    from redis.exceptions import ResponseError
+except ImportError:
+    redis = None
+    ResponseError = Exception
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY = "sensor:ingest:workers:{consumer}"
+METRICS_TTL_SECONDS = 60
+
+
+def stream_name():
+    return getattr(settings, 'INGEST_STREAM', 'sensor:ingest')
+
+
+def group_name():
+    return getattr(settings, 'INGEST_STREAM_GROUP', 'ingest')
+
+
+def connect(block_ms):
+    """
+    Cliente propio del worker: el pool compartido corta los comandos a `REDIS_SOCKET_TIMEOUT`,
+    menos de lo que bloquea `XREADGROUP`. None si Redis no está configurado.
+    """
+    url = getattr(settings, 'REDIS_URL', None)
+    if not url or redis is None:
+        return None
+    return redis.Redis.from_url(
+        url,
+        decode_responses=True,
+        socket_timeout=block_ms / 1000 + getattr(settings, 'REDIS_SOCKET_TIMEOUT', 1.0),
+        socket_connect_timeout=getattr(settings, 'REDIS_CONNECT_TIMEOUT', 0.5),
+        health_check_interval=getattr(settings, 'REDIS_HEALTH_CHECK_INTERVAL', 30),
+    )
+
+
+def enqueue(client, payloads):
+    """Agrega paquetes crudos (dicts) al Stream de ingesta; devuelve los ids asignados."""
+    pipe = client.pipeline(transaction=False)
+    for payload in payloads:
+        pipe.xadd(stream_name(), {"data": json.dumps(payload, cls=DjangoJSONEncoder)})
+    return pipe.execute()
+
+
+@dataclass
+class ConsumerMetrics:
+    batches: int = 0
+    packets: int = 0
+    created: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    claimed: int = 0
+    dead_lettered: int = 0
+    failures: int = 0
+    last_batch_size: int = 0
+    last_batch_ms: float = 0.0
+    lag: int | None = None
+    pending: int | None = None
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def throughput(self):
+        """Paquetes confirmados por segundo desde el arranque del worker."""
+        elapsed = time.monotonic() - self.started
+        return self.packets / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self):
+        data = asdict(self)
+        data.pop('started')
+        data['throughput'] = round(self.throughput, 1)
+        data['last_batch_ms'] = round(self.last_batch_ms, 1)
+        return data
+
+
+class StreamConsumer:
+
+    def __init__(self, client, consumer, batch_size=500, block_ms=2000, claim_idle_ms=60000, max_deliveries=5):
+        self.client = client
+        self.consumer = consumer
+        self.stream = stream_name()
+        self.group = group_name()
+        self.dead_letter = f"{self.stream}:dead"
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.max_deliveries = max_deliveries
+        self.metrics = ConsumerMetrics()
+
+    def ensure_group(self):
+        """Crea el grupo (y el Stream) si no existen; el grupo empieza desde el primer mensaje."""
+        try:
+            self.client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except ResponseError as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+
+    def run_once(self):
+        """Procesa un lote: primero lo abandonado por otros consumidores, luego lo nuevo."""
+        entries = self._claim_stale()
+        if not entries:
+            response = self.client.xreadgroup(
+                self.group, self.consumer, {self.stream: ">"}, count=self.batch_size, block=self.block_ms,
+            )
+            entries = response[0][1] if response else []
+        if entries:
+            self.process(entries)
+        return len(entries)
+
+    def process(self, entries):
+        """Escribe el lote en la base de datos y confirma en Redis solo lo ya confirmado en SQL."""
+        started = time.perf_counter()
+        packets, stored_ids, rejected = [], [], []
+        for message_id, fields in entries:
+            try:
+                packets.append(ingest.parse_packet(json.loads((fields or {})["data"])))
+                stored_ids.append(message_id)
+            except (KeyError, TypeError, ValueError) as exc:
+                rejected.append((message_id, fields, str(exc)))
+
+        close_old_connections()
+        try:
+            flags = ingest.store_packets(packets)
+        except Exception:
+            # sin XACK: los mensajes quedan pendientes y se reintentan al reclamarlos
+            self.metrics.failures += 1
+            logger.exception("Fallo al escribir un lote de %s paquetes del Stream", len(packets))
+            raise
+        finally:
+            close_old_connections()
+
+        pipe = self.client.pipeline(transaction=True)
+        for message_id, fields, error in rejected:
+            pipe.xadd(self.dead_letter, {"id": message_id, "data": (fields or {}).get("data", ""), "error": error})
+        acked = stored_ids + [message_id for message_id, _, _ in rejected]
+        pipe.xack(self.stream, self.group, *acked)
+        # el Stream es la cola de trabajo de este grupo: lo confirmado ya no hace falta
+        pipe.xdel(self.stream, *acked)
+        pipe.execute()
+
+        created = sum(flags)
+        self.metrics.batches += 1
+        self.metrics.packets += len(packets)
+        self.metrics.created += created
+        self.metrics.duplicates += len(flags) - created
+        self.metrics.invalid += len(rejected)
+        self.metrics.last_batch_size = len(entries)
+        self.metrics.last_batch_ms = (time.perf_counter() - started) * 1000
+
+    def _claim_stale(self):
+        pending = self.client.xpending_range(
+            self.stream, self.group, min="-", max="+", count=self.batch_size, idle=self.claim_idle_ms,
+        )
+        if not pending:
+            return []
+        poisoned = [item["message_id"] for item in pending if item["times_delivered"] >= self.max_deliveries]
+        if poisoned:
+            self._dead_letter(poisoned)
+        retry = [item["message_id"] for item in pending if item["times_delivered"] < self.max_deliveries]
+        if not retry:
+            return []
+        claimed = self.client.xclaim(self.stream, self.group, self.consumer, self.claim_idle_ms, retry)
+        self.metrics.claimed += len(claimed)
+        return claimed
+
+    def _dead_letter(self, message_ids):
+        pipe = self.client.pipeline(transaction=True)
+        for message_id in message_ids:
+            pipe.xrange(self.stream, min=message_id, max=message_id)
+        entries = pipe.execute()
+        pipe = self.client.pipeline(transaction=True)
+        for message_id, found in zip(message_ids, entries):
+            data = found[0][1].get("data", "") if found else ""
+            pipe.xadd(self.dead_letter, {"id": message_id, "data": data, "error": "demasiados reintentos"})
+        pipe.xack(self.stream, self.group, *message_ids)
+        pipe.xdel(self.stream, *message_ids)
+        pipe.execute()
+        self.metrics.dead_lettered += len(message_ids)
+        logger.warning("%s mensajes del Stream enviados a %s tras %s entregas",
+                       len(message_ids), self.dead_letter, self.max_deliveries)
+
+    def refresh_lag(self):
+        """Lag del grupo (mensajes sin entregar, Redis >= 7) y pendientes sin confirmar."""
+        for info in self.client.xinfo_groups(self.stream):
+            if info.get("name") == self.group:
+                self.metrics.lag = info.get("lag")
+                self.metrics.pending = info.get("pending")
+        return self.metrics
+
+    def publish_metrics(self):
+        key = METRICS_KEY.format(consumer=self.consumer)
+        values = {name: ("" if value is None else value) for name, value in self.metrics.as_dict().items()}
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hset(key, mapping=values)
+        pipe.expire(key, METRICS_TTL_SECONDS)
+        pipe.execute()
+
+
+def worker_metrics(client):
+    """Métricas publicadas por los workers vivos, por nombre de consumidor."""
+    prefix = METRICS_KEY.format(consumer="")
+    keys = sorted(client.scan_iter(match=f"{prefix}*", count=100))
+    if not keys:
+        return {}
+    pipe = client.pipeline(transaction=False)
+    for key in keys:
+        pipe.hgetall(key)
+    return {key[len(prefix):]: values for key, values in zip(keys, pipe.execute())}
@@ -1,3 +1,1775 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from unittest import skipUnless
+from unittest.mock import AsyncMock, MagicMock, patch
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+from django.test import AsyncClient, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import admin as monitoring_admin
+from .asgi import SensorStreamApp
+from .models import SensorPacket, SensorRollup, SensorSample
+from .benchmarks import series as series_bench
+from .benchmarks import snapshot as snapshot_bench
+from .benchmarks import suite as benchmark_suite
+from .benchmarks.fake_redis import FakeRedis
+from .services import broadcast, dashboard_cache, downsample, export, historical, ingest, metrics, partitions, redis_pool, rollups, seeding, series, sse, stream_ingest
+from .services.redis_gateway import DailyStatsGateway
+from .services.snapshot_cache import SnapshotCache, snapshot_cache
+from .views import ChartSeriesView, DashboardView, HistoricalWidgetView, RealtimeRedisView
+
+STATIC_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+@override_settings(STORAGES=STATIC_STORAGES, REDIS_URL=None)
+class DashboardQueryCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('operador', password='x')
+        now = timezone.now()
+        timestamps = [now - timedelta(days=offset) for offset in (1, 10, 45, 400)]
+        timestamps.append(timezone.make_aware(datetime(2024, 3, 15, 10, 30)))
+        for seq, ts in enumerate(timestamps, start=1):
+            packet = SensorPacket.objects.create(seq=seq, timestamp=ts, alerta=seq % 2 == 0)
+            for sample_id in (1, 2):
+                SensorSample.objects.create(
+                    packet=packet,
+                    sample_id=sample_id,
+                    soil_raw=500,
+                    soil_pct=40 + seq + sample_id,
+                    tilt=sample_id == 1,
+                    vib_pulse=100 * seq,
+                    vib_hit=seq % 2 == 0,
+                )
+
+    def setUp(self):
+        # los datos de cada test difieren pero las versiones del cache no cambian sin commit
+        caches['dashboard'].clear()
+        self.addCleanup(caches['dashboard'].clear)
+
+    def render(self, **params):
+        request = RequestFactory().get('/', params)
+        request.user = self.user
+        response = DashboardView.as_view()(request)
+        response.render()
+        return response
+
+    def widget(self, name, **params):
+        request = RequestFactory().get(f'/widgets/{name}/', params)
+        request.user = self.user
+        return HistoricalWidgetView.as_view()(request, name=name)
+
+    def test_shell_does_not_aggregate_or_read_redis(self):
+        rollups.rebuild()
+        # solo el último año (un extremo del índice), para el máximo del filtro
+        with patch.object(snapshot_cache, 'get') as snapshot, self.assertNumQueries(1):
+            response = self.render(year=2024, month=3)
+        snapshot.assert_not_called()
+        self.assertEqual(response.context_data['widget_urls']['kpis'], '/widgets/kpis/?year=2024&month=3')
+        self.assertContains(response, 'id="historical-widgets"')
+
+    def test_raw_samples_dashboard_uses_two_queries(self):
+        with self.settings(DASHBOARD_USE_ROLLUPS=False):
+            for params in ({}, {'year': 2024}, {'month': 3, 'day': 15}):
+                with self.subTest(**params), self.assertNumQueries(2):
+                    response = self.widget('kpis', **params)
+                self.assertEqual(response.status_code, 200)
+
+    def test_rollup_dashboard_uses_two_queries(self):
+        rollups.rebuild()
+        for params in ({}, {'year': 2024}, {'month': 3, 'day': 15}):
+            with self.subTest(**params), self.assertNumQueries(2):
+                response = self.widget('kpis', **params)
+            self.assertEqual(response.status_code, 200)
+
+    def test_raw_and_rollup_paths_agree(self):
+        rollups.rebuild()
+        for params in ({}, {'year': 2024}, {'day': 15}):
+            payloads = []
+            for use_rollups in (False, True):
+                with self.settings(DASHBOARD_USE_ROLLUPS=use_rollups):
+                    payloads.append({
+                        name: json.loads(self.widget(name, **params).content)
+                        for name in HistoricalWidgetView.widgets
+                    })
+            with self.subTest(**params):
+                self.assertEqual(payloads[0], payloads[1])
+
+    def test_totals_and_trend_windows(self):
+        with self.settings(DASHBOARD_USE_ROLLUPS=False):
+            payload = json.loads(self.widget('kpis').content)
+        readings, hits, tilts, humidity = payload['kpi_cards']
+        self.assertEqual(readings['value'], '10')
+        self.assertEqual(readings['helper'], 'Últimos 30 días: 4')
+        self.assertEqual(hits['value'], '4')
+        self.assertEqual(tilts['value'], '5')
+        self.assertEqual(self.render().context_data['filter_range']['end_year'], timezone.localdate().year)
+
+    def test_widgets_are_conditional_and_compressed(self):
+        rollups.rebuild()
+        request = RequestFactory().get('/widgets/kpis/', {'year': 2024}, HTTP_ACCEPT_ENCODING='gzip')
+        request.user = self.user
+        response = HistoricalWidgetView.as_view()(request, name='kpis')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        # 2024 es un periodo cerrado: el navegador puede reutilizarlo sin revalidar
+        self.assertEqual(response['Cache-Control'], f'private, max-age={HistoricalWidgetView.closed_max_age}')
+        # gzip vuelve débil el ETag; la comparación de If-None-Match lo acepta igual
+        request = RequestFactory().get('/widgets/kpis/', {'year': 2024}, HTTP_IF_NONE_MATCH=response['ETag'])
+        request.user = self.user
+        self.assertEqual(HistoricalWidgetView.as_view()(request, name='kpis').status_code, 304)
+        self.assertEqual(self.widget('charts')['Cache-Control'], 'private, no-cache')
+        self.assertEqual(self.widget('otro').status_code, 404)
+
+
+@override_settings(STORAGES=STATIC_STORAGES, REDIS_URL=None)
+class DashboardCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('operador', password='x')
+        packet = SensorPacket.objects.create(seq=1, timestamp=timezone.make_aware(datetime(2024, 3, 15, 10)))
+        SensorSample.objects.create(packet=packet, sample_id=1, soil_raw=1, soil_pct=40, vib_pulse=100)
+        rollups.rebuild()
+
+    def setUp(self):
+        caches['dashboard'].clear()
+        self.addCleanup(caches['dashboard'].clear)
+
+    def widget(self, name='kpis', **params):
+        request = RequestFactory().get(f'/widgets/{name}/', params)
+        request.user = self.user
+        response = HistoricalWidgetView.as_view()(request, name=name)
+        return response, json.loads(response.content)
+
+    def ingest(self, ts):
+        payload = {'seq': 99, 'ts': ts, 'samples': [{'id': 1, 'soil': {'pct': 50}, 'vib': {'pulse': 300}}]}
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest.store_packets([ingest.parse_packet(payload)])
+
+    def test_closed_period_is_cached_without_expiry(self):
+        filters = {'year': 2024, 'month': 3, 'day': None}
+        ranges = historical.period_ranges(filters, first_year=2023, last_year=timezone.localdate().year)
+        key, timeout = dashboard_cache.entry(filters, timezone.localdate().year, ranges)
+        self.assertIsNone(timeout)
+        first, payload = self.widget(year=2024, month=3)
+        self.assertIn('Lecturas registradas', payload['html'])
+        # contexto y fragmento en cache: solo queda la consulta del último año
+        with self.assertNumQueries(1):
+            second, _ = self.widget(year=2024, month=3)
+        self.assertEqual(second.content, first.content)
+
+        # la ingesta del día no toca el periodo cerrado
+        self.ingest(timezone.localtime().strftime('%Y-%m-%d %H:%M:%S'))
+        self.assertEqual(dashboard_cache.entry(filters, timezone.localdate().year, ranges), (key, None))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.widget(year=2024, month=3)[0]['ETag'], first['ETag'])
+
+    def test_ingest_invalidates_open_periods(self):
+        response, payload = self.widget()
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        self.assertEqual(payload['kpi_cards'][0]['value'], '1')
+        self.ingest(timezone.localtime().strftime('%Y-%m-%d %H:%M:%S'))
+        _, payload = self.widget()
+        self.assertEqual(payload['kpi_cards'][0]['value'], '2')
+        self.assertIn('<p class="kpi-value">\n                2', payload['html'])
+
+    def test_late_packet_invalidates_closed_periods(self):
+        first, _ = self.widget(year=2024, month=3)
+        self.ingest('2024-03-20 08:00:00')
+        response, payload = self.widget(year=2024, month=3)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertEqual(payload['kpi_cards'][0]['value'], '2')
+
+    def test_parallel_widgets_build_context_once(self):
+        started, release, builds = threading.Event(), threading.Event(), []
+
+        def build():
+            builds.append(1)
+            started.set()
+            release.wait(5)
+            return {'total': 1}
+
+        waiter = threading.Thread(target=lambda: dashboard_cache.get_or_build('demo', 60, build))
+        waiter.start()
+        started.wait(5)
+        other = threading.Thread(target=lambda: builds.append(dashboard_cache.get_or_build('demo', 60, build)))
+        other.start()
+        release.set()
+        waiter.join(5)
+        other.join(5)
+        self.assertEqual(builds, [1, {'total': 1}])
+
+
+class TimeRangeFilterTests(TestCase):
+
+    def lima(self, *args):
+        return timezone.make_aware(datetime(*args))
+
+    def test_filters_become_half_open_ranges(self):
+        cases = [
+            ({'year': 2024, 'month': None, 'day': None}, [(self.lima(2024, 1, 1), self.lima(2025, 1, 1))]),
+            ({'year': 2024, 'month': 12, 'day': None}, [(self.lima(2024, 12, 1), self.lima(2025, 1, 1))]),
+            ({'year': 2024, 'month': 2, 'day': 29}, [(self.lima(2024, 2, 29), self.lima(2024, 3, 1))]),
+            ({'year': 2023, 'month': 2, 'day': 29}, []),
+            ({'year': None, 'month': 3, 'day': None}, [
+                (self.lima(2023, 3, 1), self.lima(2023, 4, 1)),
+                (self.lima(2024, 3, 1), self.lima(2024, 4, 1)),
+            ]),
+        ]
+        for filters, expected in cases:
+            with self.subTest(**filters):
+                self.assertEqual(historical.period_ranges(filters, first_year=2023, last_year=2024), expected)
+        self.assertIsNone(historical.period_ranges({'year': None, 'month': None, 'day': None}, 2023, 2024))
+
+    def test_ranges_match_extract_lookups(self):
+        packet = SensorPacket.objects.create(seq=1, timestamp=self.lima(2024, 3, 31, 23, 59))
+        SensorSample.objects.create(packet=packet, sample_id=1, soil_raw=1, soil_pct=1, vib_pulse=1)
+        filters = {'year': 2024, 'month': 3, 'day': 31}
+        ranges = historical.period_ranges(filters, first_year=2023, last_year=2024)
+        self.assertEqual(
+            SensorSample.objects.filter(historical.range_q('timestamp', ranges)).count(),
+            SensorSample.objects.filter(
+                packet__timestamp__year=2024, packet__timestamp__month=3, packet__timestamp__day=31,
+            ).count(),
+        )
+
+    def test_filtered_aggregate_uses_indexes(self):
+        ranges = historical.period_ranges({'year': 2024, 'month': 3, 'day': 15}, first_year=2023, last_year=2024)
+        if connection.vendor == 'postgresql':
+            # con la tabla casi vacía el planner prefiere recorrerla entera
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = (
+            SensorSample.objects
+            .filter(historical.range_q('timestamp', ranges))
+            .annotate(month=TruncMonth('timestamp'))
+            .values('month')
+            .annotate(total=Count('id'), soil=Sum('soil_pct'))
+            .explain()
+        )
+        if connection.vendor == 'sqlite':
+            self.assertIn(
+                'SEARCH monitoring_sensorsample USING COVERING INDEX monitoring_sample_ts_agg_idx '
+                '(timestamp>? AND timestamp<?)',
+                plan,
+            )
+            self.assertNotIn('monitoring_sensorpacket', plan)
+        else:
+            self.assertIn('Index', plan)
+
+
+class SampleTimestampTests(TestCase):
+
+    def test_timestamp_is_copied_from_packet(self):
+        packet = SensorPacket.objects.create(seq=1, timestamp=timezone.make_aware(datetime(2024, 5, 1, 8)))
+        sample = SensorSample.objects.create(packet=packet, sample_id=1, soil_raw=1, soil_pct=1, vib_pulse=1)
+        self.assertEqual(sample.timestamp, packet.timestamp)
+
+        packet.timestamp += timedelta(hours=2)
+        packet.save()
+        sample.refresh_from_db()
+        self.assertEqual(sample.timestamp, packet.timestamp)
+
+    def test_ingest_sets_sample_timestamp(self):
+        packet = ingest.parse_packet({
+            'seq': 7,
+            'ts': '2024-05-01 08:30:00',
+            'samples': [{'id': 1, 'soil': {'raw': 10, 'pct': 20}, 'vib': {'pulse': 3}}],
+        })
+        with self.captureOnCommitCallbacks():
+            ingest.store_packets([packet])
+        self.assertEqual(SensorSample.objects.get().timestamp, packet['ts'])
+
+
+class PartitionFallbackTests(TestCase):
+
+    def test_truncate_history_without_postgres(self):
+        packet = SensorPacket.objects.create(seq=1, timestamp=timezone.now())
+        SensorSample.objects.create(packet=packet, sample_id=1, soil_raw=1, soil_pct=1, vib_pulse=1)
+        rollups.rebuild()
+
+        self.assertEqual(partitions.truncate_history(), 1)
+        self.assertFalse(SensorPacket.objects.exists())
+        self.assertFalse(SensorSample.objects.exists())
+        self.assertFalse(SensorRollup.objects.exists())
+
+    def test_partition_operations_require_postgres(self):
+        if partitions.supported():
+            self.skipTest('solo aplica a backends sin particionado')
+        self.assertFalse(partitions.is_partitioned())
+        for operation in (partitions.ensure_partitions, partitions.convert, partitions.revert):
+            with self.subTest(operation=operation.__name__), self.assertRaises(partitions.PartitioningUnavailable):
+                operation()
+        out = io.StringIO()
+        call_command('manage_partitions', '--convert', stdout=out)
+        self.assertIn('no es PostgreSQL', out.getvalue())
+
+    def test_partition_sql_uses_lima_month_bounds(self):
+        march = partitions.partition_for(date(2025, 3, 17))
+        self.assertEqual(march.name, 'monitoring_sensorsample_p2025_03')
+        create = partitions.create_partition_sql(march)
+        self.assertIn(
+            "PARTITION OF \"monitoring_sensorsample\" "
+            "FOR VALUES FROM ('2025-03-01 00:00:00-05:00') TO ('2025-04-01 00:00:00-05:00')",
+            create[2],
+        )
+        self.assertEqual(create[-1], 'DROP TABLE pending_samples')
+        self.assertEqual(len(partitions.prune_partition_sql(march)), 1)
+        detach, drop, delete = partitions.prune_partition_sql(march, drop=True)
+        self.assertIn('DETACH PARTITION "monitoring_sensorsample_p2025_03"', detach)
+        self.assertIn("timestamp >= '2025-03-01 00:00:00-05:00'", delete)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'el particionado requiere PostgreSQL')
+class PostgresPartitionTests(TestCase):
+    # el DDL de PostgreSQL es transaccional: la conversión se deshace al terminar cada test
+
+    def setUp(self):
+        self.migrated = self.schema()
+        self.old = self.sample_at(1, timezone.now() - timedelta(days=420))
+        partitions.convert()
+
+    def schema(self):
+        with connection.cursor() as cursor:
+            return connection.introspection.get_constraints(cursor, SensorSample._meta.db_table)
+
+    def partition_of(self, sample):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT tableoid::regclass::text FROM {partitions._qn(SensorSample._meta.db_table)} WHERE id = %s',
+                [sample.pk],
+            )
+            return cursor.fetchone()[0]
+
+    def sample_at(self, seq, moment):
+        packet = SensorPacket.objects.create(seq=seq, timestamp=moment)
+        return SensorSample.objects.create(packet=packet, sample_id=1, soil_raw=1, soil_pct=1, vib_pulse=1)
+
+    def test_convert_keeps_rows_and_migration_names(self):
+        self.assertTrue(partitions.is_partitioned())
+        names = {partition.name for partition in partitions.list_partitions()}
+        self.assertIn(partitions.partition_for(timezone.localdate()).name, names)
+        self.assertEqual(self.partition_of(self.old), partitions.partition_for(timezone.localtime(self.old.timestamp).date()).name)
+
+        converted = self.schema()
+        self.assertEqual(set(converted), set(self.migrated))
+        primary_key = SensorSample._meta.db_table + '_pkey'
+        self.assertEqual(converted[primary_key]['columns'], ['id', 'timestamp'])
+        for name, info in self.migrated.items():
+            if name != primary_key:
+                self.assertEqual(converted[name]['columns'], info['columns'], name)
+
+        # el identity sigue donde quedó y la restricción única se mantiene
+        recent = self.sample_at(2, timezone.now())
+        self.assertGreater(recent.pk, self.old.pk)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            SensorSample.objects.create(packet=recent.packet, timestamp=recent.timestamp, sample_id=1, soil_raw=1, soil_pct=1, vib_pulse=1)
+
+        partitions.revert()
+        self.assertFalse(partitions.is_partitioned())
+        self.assertEqual(self.schema(), self.migrated)
+        self.assertEqual(SensorSample.objects.count(), 2)
+        self.assertGreater(self.sample_at(3, timezone.now()).pk, recent.pk)
+
+    def test_dry_run_only_prints_sql(self):
+        out = io.StringIO()
+        call_command('manage_partitions', '--revert', '--dry-run', stdout=out)
+        self.assertIn('DROP TABLE "monitoring_sensorsample";', out.getvalue())
+        self.assertTrue(partitions.is_partitioned())
+        with self.assertRaises(CommandError):
+            call_command('manage_partitions', '--convert', stdout=io.StringIO())
+
+    def test_ensure_moves_rows_out_of_the_default_partition(self):
+        month = partitions.add_months(partitions.month_start(timezone.localdate()), 6)
+        sample = self.sample_at(2, timezone.make_aware(datetime.combine(month, datetime.min.time())))
+        self.assertEqual(self.partition_of(sample), SensorSample._meta.db_table + partitions.DEFAULT_SUFFIX)
+
+        lines = []
+        planned = partitions.ensure_partitions(months_ahead=6, dry_run=True, echo=lines.append)
+        self.assertEqual(self.partition_of(sample), SensorSample._meta.db_table + partitions.DEFAULT_SUFFIX)
+        self.assertTrue(any('CREATE TABLE' in line for line in lines))
+
+        created = partitions.ensure_partitions(months_ahead=6)
+        self.assertEqual(created, planned)
+        self.assertEqual(self.partition_of(sample), partitions.partition_for(month).name)
+        self.assertEqual(partitions.ensure_partitions(months_ahead=6), [])
+
+    def test_prune_detaches_or_drops_old_months(self):
+        today = timezone.localdate()
+        old = partitions.add_months(partitions.month_start(today), -24)
+        partitions.ensure_partitions(since=old)
+        self.sample_at(2, timezone.make_aware(datetime.combine(old, datetime.min.time())))
+        recent = self.sample_at(3, timezone.now())
+
+        removed = partitions.prune(12, drop=True, today=today)
+        self.assertIn(partitions.partition_for(old), removed)
+        self.assertEqual(sorted(SensorSample.objects.values_list('pk', flat=True)), [recent.pk])
+        self.assertEqual(list(SensorPacket.objects.values_list('seq', flat=True)), [3])
+        self.assertNotIn(partitions.partition_for(old), partitions.list_partitions())
+
+
+@override_settings(REDIS_URL=None)
+class SensorStreamAppTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('operador', password='x')
+
+    def setUp(self):
+        # dentro de la transacción del test cerraría la conexión, como evita el cliente de pruebas
+        patcher = patch('monitoring.asgi.close_old_connections')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def call(self, cookie=''):
+        disconnected = asyncio.Event()
+        messages = []
+
+        async def receive():
+            if not messages:
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            messages.append(message)
+            if b'data:' in message.get('body', b''):
+                disconnected.set()
+
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': '/stream/', 'query_string': b'',
+            'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+        }
+        await asyncio.wait_for(SensorStreamApp()(scope, receive, send), timeout=5)
+        return messages
+
+    async def login_cookie(self):
+        await self.async_client.aforce_login(self.user)
+        return f"{settings.SESSION_COOKIE_NAME}={self.async_client.cookies[settings.SESSION_COOKIE_NAME].value}"
+
+    async def test_anonymous_clients_are_redirected(self):
+        start = (await self.call())[0]
+        self.assertEqual(start['status'], 302)
+        self.assertIn((b'Location', b'/accounts/login/?next=/stream/'), start['headers'])
+
+    async def test_stream_sends_event_and_releases_slot_on_disconnect(self):
+        messages = await self.call(await self.login_cookie())
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), messages[0]['headers'])
+        self.assertRegex(messages[1]['body'], rb'^id: \d+\ndata: \{"seq"')
+        self.assertEqual(sse.limiter.active, 0)
+
+    async def test_connection_limit_returns_503(self):
+        cookie = await self.login_cookie()
+        with patch.object(sse, 'limiter', sse.ConnectionLimiter(limit=0)):
+            start = (await self.call(cookie))[0]
+        self.assertEqual(start['status'], 503)
+        self.assertIn((b'Retry-After', b'5'), start['headers'])
+
+    def test_wsgi_fallback_does_not_simulate_with_redis(self):
+        self.client.force_login(self.user)
+        with patch.object(broadcast.hub, 'available', return_value=True), override_settings(STORAGES=STATIC_STORAGES):
+            response = self.client.get('/stream/')
+            shell = self.client.get('/')
+        self.assertEqual(response.status_code, 204)
+        # bajo WSGI nadie atiende el hub: el navegador sondea en lugar de abrir el stream
+        self.assertFalse(shell.context['live_stream_enabled'])
+        self.assertContains(shell, 'window.streamEndpoint = null')
+
+
+class BroadcastHubTests(TestCase):
+
+    def make_hub(self, **kwargs):
+        hub = broadcast.BroadcastHub(**kwargs)
+
+        async def idle():
+            hub._ready.set()
+            await asyncio.Event().wait()
+
+        hub._run = idle
+        return hub
+
+    async def test_frame_is_serialized_once_for_all_subscribers(self):
+        hub = self.make_hub(queue_size=4)
+        first, second = hub.subscribe(), hub.subscribe()
+        hub.broadcast('{"seq": 1}')
+        _, frame = first.queue.get_nowait()
+        self.assertEqual(frame, b'id: 1\ndata: {"seq": 1}\n\n')
+        self.assertIs(second.queue.get_nowait()[1], frame)
+        hub._task.cancel()
+
+    async def test_slow_client_keeps_latest_frames_and_is_closed(self):
+        hub = self.make_hub(queue_size=2, max_dropped=3)
+        slow = hub.subscribe()
+        for seq in range(4):
+            hub.broadcast(f'{{"seq": {seq}}}')
+        self.assertEqual(slow.dropped, 2)
+        self.assertEqual([slow.queue.get_nowait()[1], slow.queue.get_nowait()[1]],
+                         [b'id: 2\ndata: {"seq": 2}\n\n', b'id: 3\ndata: {"seq": 3}\n\n'])
+
+        for seq in range(4, 8):
+            hub.broadcast(f'{{"seq": {seq}}}')
+        self.assertTrue(slow.closed)
+        self.assertEqual([frame async for frame in slow.events(heartbeat=1)], [])
+        self.assertEqual(hub.stats()['subscribers'], 0)
+        self.assertEqual(hub.slow_disconnects, 1)
+        hub._task.cancel()
+
+    @override_settings(SIM_STREAM_ENABLED=False)
+    async def test_stream_relays_published_packets(self):
+        hub = self.make_hub()
+        user = await get_user_model().objects.acreate(username='operador')
+        await self.async_client.aforce_login(user)
+        cookie = f"{settings.SESSION_COOKIE_NAME}={self.async_client.cookies[settings.SESSION_COOKIE_NAME].value}"
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': '/stream/', 'query_string': b'',
+            'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+        }
+        messages = []
+        disconnected = asyncio.Event()
+
+        async def receive():
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            messages.append(message)
+            if message['type'] == 'http.response.start':
+                hub.broadcast('{"seq": 7}')
+            elif message.get('body'):
+                disconnected.set()
+
+        with patch.object(broadcast, 'hub', hub), patch.object(hub, 'available', return_value=True):
+            await asyncio.wait_for(SensorStreamApp()(scope, receive, send), timeout=5)
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertEqual(messages[1]['body'], b'id: 7\ndata: {"seq": 7}\n\n')
+        self.assertEqual(hub.stats()['subscribers'], 0)
+        hub._task.cancel()
+
+    async def test_last_event_id_replays_only_missed_packets(self):
+        hub = self.make_hub(replay_size=4)
+        for seq in range(1, 6):
+            hub.broadcast(f'{{"seq": {seq}, "ts": "2025-01-01 00:00:0{seq}"}}')
+        self.assertEqual([seq for seq, _ in hub.backlog.values()], ['2', '3', '4', '5'])
+
+        resumed = hub.subscribe(last_event_id='3')
+        events = resumed.events(heartbeat=1)
+        hub.broadcast('{"seq": 6, "ts": "2025-01-01 00:00:06"}')
+        received = [await events.__anext__() for _ in range(3)]
+        self.assertEqual([frame.split(b'\n')[0] for frame in received], [b'id: 4', b'id: 5', b'id: 6'])
+        await events.aclose()
+
+        # el id ya salió del buffer: no se puede reanudar y el cliente debe pedir el snapshot
+        stale = hub.subscribe(last_event_id='1').events(heartbeat=1)
+        self.assertEqual(await stale.__anext__(), broadcast.RESET_FRAME)
+        await stale.aclose()
+        self.assertEqual(hub.stats()['replayed'], 3)
+        self.assertEqual(hub.resets, 1)
+        hub._task.cancel()
+
+    async def test_drops_reset_once_the_client_catches_up(self):
+        hub = self.make_hub(queue_size=2, max_dropped=3)
+        client = hub.subscribe()
+        events = client.events(heartbeat=1)
+        for burst in range(3):
+            for seq in range(burst * 4, burst * 4 + 4):
+                hub.broadcast(f'{{"seq": {seq}}}')
+            await events.__anext__()
+            await events.__anext__()
+            self.assertEqual(client.dropped, 0)
+        # seis descartes en total, pero nunca tres sin ponerse al día
+        self.assertFalse(client.closed)
+        self.assertEqual(hub.dropped, 6)
+        await events.aclose()
+        hub._task.cancel()
+
+    @override_settings(REDIS_URL='redis://localhost:6379/0')
+    async def test_subscriber_arriving_while_listener_stops_restarts_it(self):
+        hub = broadcast.BroadcastHub()
+        closing, release = asyncio.Event(), asyncio.Event()
+
+        async def get_message(timeout):
+            await asyncio.sleep(0.01)
+
+        async def close_pubsub():
+            closing.set()
+            await release.wait()
+
+        def connect(*args, **kwargs):
+            client = MagicMock()
+            client.xrevrange = AsyncMock(return_value=[])
+            client.xrange = AsyncMock(return_value=[])
+            client.aclose = AsyncMock()
+            pubsub = client.pubsub.return_value
+            pubsub.subscribe = AsyncMock()
+            pubsub.get_message = get_message
+            pubsub.aclose = close_pubsub
+            return client
+
+        aioredis = MagicMock()
+        aioredis.from_url.side_effect = connect
+        with patch.object(broadcast, 'aioredis', aioredis):
+            first = hub.subscribe()
+            await asyncio.wait_for(hub._ready.wait(), timeout=1)
+            hub.unsubscribe(first)
+            # el último cliente se fue y la tarea está cerrando la conexión
+            await asyncio.wait_for(closing.wait(), timeout=1)
+            second = hub.subscribe()
+            release.set()
+            await asyncio.sleep(0.05)
+            self.assertEqual(aioredis.from_url.call_count, 2)
+            self.assertTrue(hub.stats()['listening'])
+
+            task = hub._task
+            hub.unsubscribe(second)
+            await asyncio.wait_for(task, timeout=1)
+            self.assertIsNone(hub._task)
+            hub.subscribe()
+            await asyncio.sleep(0.05)
+            self.assertEqual(aioredis.from_url.call_count, 3)
+            hub._task.cancel()
+
+    async def test_duplicate_packets_are_not_rebroadcast(self):
+        hub = self.make_hub()
+        subscription = hub.subscribe()
+        hub.broadcast('{"seq": 1, "ts": "2025-01-01 00:00:01"}')
+        hub.broadcast('{"seq": 1, "ts": "2025-01-01 00:00:01"}')
+        hub.broadcast('not json')
+        self.assertEqual(subscription.queue.qsize(), 1)
+        self.assertEqual(hub.messages, 1)
+        hub._task.cancel()
+
+
+class RollupIngestTests(TestCase):
+
+    def packet(self, seq, moment, *samples):
+        return {'seq': seq, 'ts': timezone.make_aware(moment), 'alerta': 0, 'samples': [
+            {'id': sid, 'soil': {'raw': 0, 'pct': pct}, 'tilt': tilt, 'vib': {'pulse': pulse, 'hit': hit}}
+            for sid, pct, pulse, tilt, hit in samples
+        ]}
+
+    def rollups(self):
+        fields = [field.name for field in SensorRollup._meta.fields if field.name != 'id']
+        return {(row['granularity'], row['bucket']): row for row in SensorRollup.objects.values(*fields)}
+
+    def test_incremental_rollups_match_rebuild_across_boundaries(self):
+        # fin de año en hora de Lima: cambian hora, día y mes a la vez
+        first = [
+            self.packet(1, datetime(2024, 12, 31, 23, 59, 50), (1, 40.5, 300, 0, 1), (2, 60.25, 800, 1, 0)),
+            self.packet(2, datetime(2025, 1, 1, 0, 0, 5), (1, 41.0, 250, 0, 0)),
+        ]
+        # segundo lote sobre buckets ya existentes: nuevos mínimos y máximos, y un bucket nuevo
+        second = [
+            self.packet(3, datetime(2024, 12, 31, 23, 30), (1, 12.75, 1400, 1, 1)),
+            self.packet(4, datetime(2025, 1, 1, 0, 59, 59), (2, 95.5, 20, 0, 1)),
+            self.packet(5, datetime(2025, 1, 1, 1, 0), (1, 50.0, 500, 1, 0)),
+        ]
+        self.assertEqual(ingest.store_packets(first), [True, True])
+        self.assertEqual(ingest.store_packets(second + first[:1]), [True, True, True, False])
+        incremental = self.rollups()
+
+        self.assertEqual(rollups.rebuild(), {'hour': 3, 'day': 2, 'month': 2})
+        self.assertEqual(incremental, self.rollups())
+
+        hour = incremental[('hour', timezone.make_aware(datetime(2024, 12, 31, 23)))]
+        self.assertEqual((hour['total_readings'], hour['soil_sum'], hour['pulse_sum']), (3, 113.5, 2500))
+        self.assertEqual((hour['soil_min'], hour['soil_max'], hour['pulse_min'], hour['pulse_max']), (12.75, 60.25, 300, 1400))
+        self.assertEqual((hour['tilt_events'], hour['hit_events']), (2, 2))
+        self.assertEqual(hour['first_timestamp'], timezone.make_aware(datetime(2024, 12, 31, 23, 30)))
+        day = incremental[('day', timezone.make_aware(datetime(2025, 1, 1)))]
+        self.assertEqual((day['total_readings'], day['pulse_min'], day['soil_max']), (3, 20, 95.5))
+        self.assertEqual(day['last_timestamp'], timezone.make_aware(datetime(2025, 1, 1, 1)))
+
+
+@override_settings(REDIS_URL=None, INGEST_TOKEN='secreto', INGEST_BATCH_DELAY_MS=0)
+class PacketIngestTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = get_user_model().objects.create_user('ops', password='x', is_staff=True)
+        cls.operator = get_user_model().objects.create_user('operador', password='x')
+
+    def payload(self, seq, ts='2025-01-02 05:00:00', **extra):
+        return {'seq': seq, 'ts': ts, 'samples': [{'id': 1, 'soil': {'pct': 40}, 'vib': {'pulse': 300}}], **extra}
+
+    def post(self, body, content_type='application/json', token='secreto'):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        if not isinstance(body, (bytes, str)):
+            body = json.dumps(body)
+        return self.client.post('/ingest/packets/', body, content_type=content_type, headers=headers)
+
+    def test_bearer_token_or_staff_session(self):
+        self.assertEqual(self.post(self.payload(1), token=None).status_code, 401)
+        self.assertEqual(self.post(self.payload(1), token='otro').status_code, 401)
+        self.client.force_login(self.operator)
+        self.assertEqual(self.post(self.payload(1), token=None).status_code, 401)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.post(self.payload(1), token=None).status_code, 200)
+        self.client.logout()
+        self.assertEqual(self.post(self.payload(2)).json(), {'received': 1, 'created': 1, 'duplicates': 0, 'errors': []})
+        with override_settings(INGEST_TOKEN=''):
+            # sin token configurado solo entra una sesión staff
+            self.assertEqual(self.post(self.payload(3), token='').status_code, 401)
+
+    def test_json_list_and_ndjson_report_errors_per_item(self):
+        body = self.post([self.payload(1), self.payload('x'), self.payload(2, samples=[])]).json()
+        self.assertEqual((body['received'], body['created']), (1, 1))
+        self.assertEqual([error['item'] for error in body['errors']], [2, 3])
+        self.assertEqual(body['errors'][0]['error'], 'seq debe ser un entero')
+
+        lines = [json.dumps(self.payload(3)), 'no es json', '', json.dumps(self.payload(4, ts=None))]
+        body = self.post('\n'.join(lines), content_type='application/x-ndjson').json()
+        self.assertEqual((body['received'], body['created']), (1, 1))
+        self.assertEqual([error['item'] for error in body['errors']], [2, 4])
+        self.assertEqual(body['errors'][1]['error'], 'ts es obligatorio')
+        self.assertEqual(SensorPacket.objects.count(), 2)
+
+        self.assertEqual(self.post('{', content_type='application/json').status_code, 400)
+        response = self.post([self.payload(-1)])
+        self.assertEqual((response.status_code, response.json()['received']), (400, 0))
+
+    def test_duplicates_are_idempotent(self):
+        self.assertEqual(self.post([self.payload(1), self.payload(1)]).json()['duplicates'], 1)
+        body = self.post([self.payload(1), self.payload(1, ts='2025-01-02 05:00:01')]).json()
+        self.assertEqual((body['created'], body['duplicates']), (1, 1))
+        self.assertEqual(SensorPacket.objects.count(), 2)
+        self.assertEqual(SensorSample.objects.count(), 2)
+
+    def test_integrity_error_is_retried_as_duplicate(self):
+        packet = ingest.parse_packet(self.payload(7))
+        store = ingest._store_packets
+
+        def racing(packets):
+            if not SensorPacket.objects.exists():
+                # otro proceso guarda el paquete entre la verificación y el INSERT
+                SensorPacket.objects.create(seq=7, timestamp=packet['ts'])
+                raise IntegrityError('duplicate key value violates unique constraint')
+            return store(packets)
+
+        with patch.object(ingest, '_store_packets', side_effect=racing):
+            self.assertEqual(ingest.store_packets([packet]), [False])
+        self.assertEqual(SensorPacket.objects.count(), 1)
+
+    @override_settings(INGEST_MAX_PACKETS=2)
+    def test_too_many_packets_returns_413(self):
+        response = self.post([self.payload(seq) for seq in (1, 2, 3)])
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(SensorPacket.objects.exists())
+
+    def test_epoch_milliseconds_are_accepted(self):
+        seconds = ingest.parse_packet(self.payload(1, ts=1735812000))['ts']
+        self.assertEqual(ingest.parse_packet(self.payload(1, ts=1735812000000))['ts'], seconds)
+        self.assertEqual(ingest.parse_packet(self.payload(1, ts=1735812000500.0))['ts'], seconds + timedelta(milliseconds=500))
+        self.assertEqual(self.post(self.payload(1, ts=1735812000000)).status_code, 200)
+        self.assertEqual(SensorPacket.objects.get().timestamp, seconds)
+
+
+class PacketBufferTests(TestCase):
+    # sin base de datos: el hilo del buffer usa otra conexión, fuera de la transacción del test
+
+    def setUp(self):
+        self.batches = []
+        patcher = patch.object(ingest, 'store_packets', side_effect=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def store(self, packets):
+        self.batches.append([packet['seq'] for packet in packets])
+        if any(packet['seq'] < 0 for packet in packets):
+            raise RuntimeError('db caída')
+        # los seq pares simulan duplicados
+        return [packet['seq'] % 2 == 1 for packet in packets]
+
+    def submit_together(self, buffer, *submissions):
+        results = [None] * len(submissions)
+
+        def submit(index):
+            try:
+                results[index] = buffer.submit([{'seq': seq} for seq in submissions[index]], timeout=5)
+            except Exception as exc:
+                results[index] = exc
+
+        threads = [threading.Thread(target=submit, args=(index,)) for index in range(len(submissions))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+        return results
+
+    def test_full_batch_is_flushed_in_one_write(self):
+        # la espera es larga: el lote se escribe al llenarse
+        buffer = ingest.PacketBuffer(max_batch=4, max_delay=5)
+        started = time.perf_counter()
+        first, second = self.submit_together(buffer, [1, 2], [3, 5])
+        self.assertLess(time.perf_counter() - started, 4)
+        self.assertEqual(len(self.batches), 1)
+        self.assertEqual(sorted(self.batches[0]), [1, 2, 3, 5])
+        self.assertEqual(first, ingest.IngestResult(created=1, duplicates=1))
+        self.assertEqual(second, ingest.IngestResult(created=2, duplicates=0))
+
+    def test_partial_batch_is_flushed_after_the_delay(self):
+        buffer = ingest.PacketBuffer(max_batch=100, max_delay=0.01)
+        self.assertEqual(buffer.submit([{'seq': 1}], timeout=5), ingest.IngestResult(created=1))
+        self.assertEqual(buffer.submit([{'seq': 2}], timeout=5), ingest.IngestResult(duplicates=1))
+        self.assertEqual(self.batches, [[1], [2]])
+
+    def test_failed_write_reaches_every_caller_in_the_batch(self):
+        buffer = ingest.PacketBuffer(max_batch=2, max_delay=5)
+        with self.assertLogs('monitoring.services.ingest', 'ERROR'):
+            results = self.submit_together(buffer, [-1], [3])
+        self.assertEqual([type(result) for result in results], [RuntimeError, RuntimeError])
+        self.assertEqual(len(self.batches), 1)
+        # el hilo sigue atendiendo lotes
+        self.assertEqual(buffer.submit([{'seq': 5}, {'seq': 7}], timeout=5), ingest.IngestResult(created=2))
+
+    def test_without_delay_writes_synchronously(self):
+        buffer = ingest.PacketBuffer(max_batch=100, max_delay=0)
+        self.assertEqual(buffer.submit([{'seq': 1}, {'seq': 2}]), ingest.IngestResult(created=1, duplicates=1))
+        self.assertIsNone(buffer._thread)
+        self.assertEqual(buffer.submit([]), ingest.IngestResult())
+        self.assertEqual(self.batches, [[1, 2]])
+
+
+class StreamConsumerTests(TestCase):
+
+    def setUp(self):
+        # ver SensorStreamAppTests.setUp
+        patcher = patch('monitoring.services.stream_ingest.close_old_connections')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def entry(self, message_id, seq):
+        payload = {'seq': seq, 'ts': '2024-05-01 08:30:00', 'samples': [{'id': 1, 'soil': {'pct': 20}, 'vib': {'pulse': 3}}]}
+        return message_id, {'data': json.dumps(payload)}
+
+    def test_batch_is_acked_after_commit_and_invalid_messages_are_dead_lettered(self):
+        client = MagicMock()
+        pipe = client.pipeline.return_value
+        pipe.execute.side_effect = lambda: self.assertEqual(SensorPacket.objects.count(), 2)
+        consumer = stream_ingest.StreamConsumer(client, 'w1')
+
+        consumer.process([self.entry('1-0', 1), self.entry('2-0', 2), ('3-0', {'data': '{"seq": "x"}'})])
+
+        pipe.xack.assert_called_once_with('sensor:ingest', 'ingest', '1-0', '2-0', '3-0')
+        pipe.xadd.assert_called_once()
+        self.assertEqual(pipe.xadd.call_args.args[0], 'sensor:ingest:dead')
+        self.assertEqual((consumer.metrics.created, consumer.metrics.invalid), (2, 1))
+
+    def test_failed_batch_stays_pending(self):
+        client = MagicMock()
+        consumer = stream_ingest.StreamConsumer(client, 'w1')
+        with patch.object(ingest, 'store_packets', side_effect=RuntimeError('db caída')):
+            with self.assertRaises(RuntimeError):
+                consumer.process([self.entry('1-0', 1)])
+        client.pipeline.return_value.xack.assert_not_called()
+        self.assertEqual(consumer.metrics.failures, 1)
+
+    def test_stale_messages_are_claimed_until_max_deliveries(self):
+        client = MagicMock()
+        client.xpending_range.return_value = [
+            {'message_id': '1-0', 'consumer': 'caido', 'time_since_delivered': 90000, 'times_delivered': 1},
+            {'message_id': '2-0', 'consumer': 'caido', 'time_since_delivered': 90000, 'times_delivered': 5},
+        ]
+        client.xclaim.return_value = [self.entry('1-0', 1)]
+        client.pipeline.return_value.execute.return_value = [[self.entry('2-0', 2)]]
+        consumer = stream_ingest.StreamConsumer(client, 'w1', max_deliveries=5)
+
+        self.assertEqual(consumer._claim_stale(), [self.entry('1-0', 1)])
+        client.xclaim.assert_called_once_with('sensor:ingest', 'ingest', 'w1', 60000, ['1-0'])
+        client.pipeline.return_value.xack.assert_called_once_with('sensor:ingest', 'ingest', '2-0')
+        self.assertEqual((consumer.metrics.claimed, consumer.metrics.dead_lettered), (1, 1))
+
+
+class SeriesDecodeTests(TestCase):
+
+    def test_batch_decoding_matches_per_element_parser(self):
+        for legacy in (False, True):
+            lists = series_bench.build_lists(sensors=4, entries=50, legacy=legacy)
+            self.assertEqual(series_bench.batch_summary(lists), series_bench.loop_summary(lists))
+
+    def test_corrupt_entries_are_skipped(self):
+        items = ['{"ts": "a", "porcentaje": 40}', 'basura', '{"ts": "b", "pct": "55.5"}', '{"ts": "c", "porcentaje": 0}']
+        self.assertEqual(list(series.humidity(items)), series_bench.loop_humidity(items))
+        self.assertEqual(list(series.pulses(['1700000000:12', '1700000001:x', 'a:b:3'])), [12.0])
+        self.assertEqual(series.tilt_events(['{"estado": 1}', '{"estado": null}', '{"estado": 1}']), 2)
+
+    def test_summary_statistics(self):
+        stats = series.summarize([series.array('d', [4, 1]), series.array('d', []), series.array('d', [3, 2, 5])])
+        self.assertEqual((stats.count, stats.mean, stats.peak, stats.floor, stats.p50), (5, 3.0, 5.0, 1.0, 3.0))
+        self.assertAlmostEqual(stats.p95, 4.8)
+        self.assertEqual(series.summarize([]), series.SeriesStats())
+
+
+class HistoryReadTests(TestCase):
+
+    def per_key_read(self, client):
+        """El lector anterior: KEYS y un comando por lista, ZSET y clave auxiliar."""
+        gateway = DailyStatsGateway
+        ids = sorted({int(k.split(':')[2]) for k in client.keys('sensor:humedad:*:historico')} or {1})
+        humidity, vibration, tilt = [], [], 0
+        for sid in ids:
+            humidity += series_bench.loop_humidity(client.lrange(gateway.HUM_HIST.format(id=sid), -200, -1))
+            vibration += series_bench.loop_pulses(client.lrange(gateway.VIB_HIST.format(id=sid), -200, -1))
+            tilt += series_bench.loop_tilt_events(client.lrange(gateway.INC_HIST.format(id=sid), -200, -1))
+            vibration += [score for _, score in client.zrange(gateway.VIB_STATS.format(id=sid), 0, -1, withscores=True)]
+        hits = 0
+        for raw in client.zrange(gateway.ALERT_STATS, 0, -1):
+            for sample in json.loads(raw)['payload']['samples']:
+                tilt += sample.get('tilt') == 1
+                hits += sample.get('vib', {}).get('hit', 0) == 1
+        last = json.loads(client.get(gateway.LAST_PACKET))
+        return {
+            'pulse_avg': round(sum(vibration) / len(vibration), 2),
+            'pulse_peak': max(vibration),
+            'humidity_avg': round(sum(humidity) / len(humidity), 2),
+            'humidity_peak': max(humidity),
+            'humidity_floor': min(humidity),
+            'hit_events': hits,
+            'inclination_events': tilt,
+            'total_readings': max(len(humidity), len(vibration)),
+            'last_seq': last['seq'],
+            'last_timestamp': last['ts'],
+        }
+
+    def populate(self, sensors):
+        client = FakeRedis()
+        snapshot_bench.populate(client, sensors=sensors, entries=30, history_format='json')
+        for sid in (1, sensors):
+            client.zadd(DailyStatsGateway.VIB_STATS.format(id=sid), {f'{sid}:a': 1500.5, f'{sid}:b': 12})
+        for seq, tilt, hit in ((7, 1, 0), (9, 1, 1)):
+            client.zadd(DailyStatsGateway.ALERT_STATS, {json.dumps({'seq': seq, 'payload': {
+                'seq': seq, 'samples': [{'id': 1, 'tilt': tilt, 'vib': {'hit': hit}}, {'id': 2, 'tilt': 0, 'vib': {'hit': 1}}],
+            }}): seq})
+        client.reset_counters()
+        return client
+
+    def test_pipelined_read_matches_per_key_reader(self):
+        for sensors in (1, 12):
+            client = self.populate(sensors)
+            expected = self.per_key_read(client)
+            self.assertEqual(client.round_trips, 4 * sensors + 3)
+
+            client.reset_counters()
+            self.assertEqual(DailyStatsGateway(client=client)._read_from_history(), expected)
+            # SMEMBERS del registro + un pipeline, sin importar cuántos sensores haya
+            self.assertEqual(client.round_trips, 2)
+
+    @patch.object(DailyStatsGateway, 'SCAN_COUNT', 10)
+    def test_scan_discovery_without_registry_is_bounded(self):
+        client = self.populate(sensors=12)
+        expected = self.per_key_read(client)
+        client.delete(DailyStatsGateway.SENSOR_REGISTRY)
+        gateway = DailyStatsGateway(client=client)
+        pages = -(-len(client.keys('*')) // DailyStatsGateway.SCAN_COUNT)
+
+        client.reset_counters()
+        self.assertEqual(gateway._discover_sensor_ids(), list(range(1, 13)))
+        # SMEMBERS vacío + un recorrido SCAN completo por patrón (compacto e historial JSON)
+        self.assertEqual(client.round_trips, 1 + 2 * pages)
+
+        client.reset_counters()
+        self.assertEqual(gateway._read_from_history(), expected)
+        self.assertEqual(client.round_trips, 2 + 2 * pages)
+
+
+class PackedHistoryTests(TestCase):
+
+    def test_round_trip_discards_partial_leading_record(self):
+        blob = series.pack_records([(1700000000, 41.5), (1700000005, 42.0), (1700000010, 0)])
+        self.assertEqual(series.packed_records(blob), [(1700000000.0, 41.5), (1700000005.0, 42.0), (1700000010.0, 0.0)])
+        # GETRANGE con inicio negativo que corta a mitad del primer registro
+        self.assertEqual(list(series.packed_values(blob[5:])), [42.0, 0.0])
+        self.assertEqual(list(series.packed_values(b'')), [])
+
+    def test_history_records_from_json_and_legacy_lists(self):
+        items = ['{"ts": "2025-01-01T00:00:05+00:00", "pct": 40}', 'basura', '{"ts": "2025-01-01T00:00:06+00:00"}']
+        self.assertEqual(series.history_records(items, 'humidity'), [(1735689605.0, 40.0)])
+        self.assertEqual(series.history_records(['1735689600000:3', '1735689601:x'], 'vibration'), [(1735689600.0, 3.0)])
+        self.assertEqual(series.to_epoch('no es fecha'), 0.0)
+
+    def test_packed_snapshot_matches_json_lists(self):
+        snapshots = {}
+        # el mismo instante para ambos formatos: si no, el último timestamp puede diferir en un segundo
+        end = timezone.localtime()
+        for history_format in ('json', 'packed'):
+            client = FakeRedis()
+            snapshot_bench.populate(client, sensors=3, entries=40, history_format=history_format, end=end)
+            self.assertEqual(bool(client.keys('sensor:humedad:*:packed:v1')), history_format == 'packed')
+            self.assertEqual(bool(client.keys('sensor:humedad:*:historico')), history_format == 'json')
+            snapshots[history_format] = DailyStatsGateway(client=client)._read_from_history()
+        self.assertEqual(snapshots['packed'], snapshots['json'])
+
+    @patch.object(DailyStatsGateway, 'HISTORY_MAXLEN', 4)
+    def test_writes_trim_packed_history_to_latest_records(self):
+        client = FakeRedis()
+        gateway = DailyStatsGateway(client=client)
+        for seq in range(1, 7):
+            gateway.record_packets([{'seq': seq, 'ts': f'2025-01-02 10:00:0{seq}', 'alerta': False,
+                                     'samples': [{'id': 1, 'soil': {'pct': seq}, 'tilt': 0, 'vib': {'pulse': 1, 'hit': 0}}]}])
+        # el recorte espera a pasar PACKED_TRIM_SLACK (5 registros) y deja HISTORY_MAXLEN
+        values = series.packed_values(client.get(gateway.HUM_PACKED.format(id=1)))
+        self.assertEqual(list(values), [3.0, 4.0, 5.0, 6.0])
+
+    @patch.object(DailyStatsGateway, 'HISTORY_MAXLEN', 4)
+    def test_trim_retries_when_a_record_is_appended_concurrently(self):
+        client = FakeRedis()
+        gateway = DailyStatsGateway(client=client)
+        key = gateway.HUM_PACKED.format(id=1)
+        client.set(key, series.pack_records([(1735830000 + n, n) for n in range(8)]))
+        getrange = FakeRedis._cmd_getrange
+        appended = []
+
+        def getrange_then_append(redis, *args):
+            # otro escritor agrega un registro entre la lectura y el MULTI
+            result = getrange(redis, *args)
+            if not appended:
+                appended.append(redis.append(key, series.pack(99, 1735830099)))
+            return result
+
+        with patch.object(FakeRedis, '_cmd_getrange', getrange_then_append):
+            gateway._trim_packed(key)
+        self.assertEqual(len(appended), 1)
+        self.assertEqual(list(series.packed_values(client.get(key))), [5.0, 6.0, 7.0, 99.0])
+
+
+class DailyAggregateTests(TestCase):
+
+    def packet(self, seq, ts, pulse):
+        return {'seq': seq, 'ts': ts, 'alerta': False,
+                'samples': [{'id': 1, 'soil': {'pct': 40}, 'tilt': 0, 'vib': {'pulse': pulse, 'hit': 0}}]}
+
+    def test_backfill_ignores_vibration_stats_from_other_days(self):
+        client = FakeRedis()
+        gateway = DailyStatsGateway(client=client)
+        gateway.record_packets([self.packet(1, '2025-01-01 23:00:00', 900), self.packet(2, '2025-01-02 10:00:00', 300)])
+        client.zadd(gateway.VIB_STATS.format(id=1), {
+            '{"ts": "2025-01-01 22:00:00"}': 800,
+            str(int(timezone.make_aware(datetime(2025, 1, 1, 21)).timestamp())): 700,
+            '{"ts": "2025-01-02 09:00:00"}': 50,
+        })
+        with patch('monitoring.services.redis_pool.get_client', return_value=client):
+            call_command('backfill_redis_aggregates', date='2025-01-02', stdout=io.StringIO())
+        fields = client.hgetall(gateway.DAILY_AGG.format(day='2025-01-02'))
+        self.assertEqual((int(fields['1:pulse_count']), float(fields['1:pulse_sum'])), (2, 350.0))
+        self.assertEqual(int(fields['1:hum_count']), 1)
+
+    def test_aggregates_match_totals_recomputed_from_history(self):
+        midnight = timezone.make_aware(datetime(2025, 1, 2))
+        # 60 paquetes de 3 sensores cada 5 s, a ambos lados de la medianoche de Lima
+        packets = snapshot_bench.build_packets(sensors=3, entries=60, end=midnight + timedelta(minutes=2))
+        client = FakeRedis()
+        gateway = DailyStatsGateway(client=client)
+        for start in range(0, len(packets), 7):
+            gateway.record_packets(packets[start:start + 7])
+
+        expected = {}
+        for sid in (1, 2, 3):
+            for name, template in (('hum', gateway.HUM_PACKED), ('pulse', gateway.VIB_PACKED), ('tilt', gateway.INC_PACKED)):
+                for epoch, value in series.packed_records(client.get(template.format(id=sid))):
+                    day = datetime.fromtimestamp(epoch, tz=timezone.get_current_timezone()).date().isoformat()
+                    expected.setdefault(day, {}).setdefault(sid, {}).setdefault(name, []).append(value)
+        # el historial no guarda `hit`: se cuenta desde los paquetes
+        hits = {}
+        for packet in packets:
+            for sample in packet['samples']:
+                key = (packet['ts'][:10], sample['id'])
+                hits[key] = hits.get(key, 0) + sample['vib']['hit']
+        self.assertEqual(sorted(expected), ['2025-01-01', '2025-01-02'])
+
+        for day, sensors in expected.items():
+            fields = client.hgetall(gateway.DAILY_AGG.format(day=day))
+            extremes = {name: dict(client.zrange(gateway.DAILY_EXTREME.format(day=day, name=name), 0, -1, withscores=True))
+                        for name in gateway.EXTREMES}
+            for sid, values in sensors.items():
+                self.assertEqual(int(fields[f'{sid}:hum_count']), len(values['hum']))
+                self.assertAlmostEqual(float(fields[f'{sid}:hum_sum']), sum(values['hum']), places=6)
+                self.assertEqual(int(fields[f'{sid}:pulse_count']), len(values['pulse']))
+                self.assertAlmostEqual(float(fields[f'{sid}:pulse_sum']), sum(values['pulse']), places=6)
+                self.assertEqual(int(fields.get(f'{sid}:tilt', 0)), sum(values['tilt']))
+                self.assertEqual(int(fields.get(f'{sid}:hit', 0)), hits[(day, sid)])
+                self.assertEqual(extremes['hum_min'][str(sid)], min(values['hum']))
+                self.assertEqual(extremes['hum_max'][str(sid)], max(values['hum']))
+                self.assertEqual(extremes['pulse_min'][str(sid)], min(values['pulse']))
+                self.assertEqual(extremes['pulse_max'][str(sid)], max(values['pulse']))
+
+    def test_aggregates_and_history_return_the_same_keys(self):
+        client = FakeRedis()
+        gateway = DailyStatsGateway(client=client)
+        today = timezone.localdate().isoformat()
+        gateway.record_packets([self.packet(1, f'{today} 00:00:01', 300)])
+        from_aggregates = gateway._read_daily_aggregates(today)
+        self.assertIsNotNone(from_aggregates)
+        self.assertEqual(from_aggregates.keys(), gateway._read_from_history().keys())
+
+
+class SensorBreakdownTests(TestCase):
+
+    def test_bucketize_sorts_and_skips_missing_timestamps(self):
+        epochs = series.array('d', [125, 0, 61, 119, 60])
+        values = series.array('d', [9, 100, 3, 5, 1])
+        self.assertEqual(series.bucketize(epochs, values, 60), {
+            't': [60, 120], 'min': [1.0, 9.0], 'avg': [3.0, 9.0], 'max': [5.0, 9.0],
+        })
+
+    def test_breakdown_per_sensor_with_buckets(self):
+        # ambos historiales con el mismo reloj: `populate` fecha las entradas desde ahora
+        frozen = patch.object(snapshot_bench.timezone, 'localtime', return_value=timezone.localtime())
+        client = FakeRedis()
+        with frozen:
+            snapshot_bench.populate(client, sensors=3, entries=40)
+        breakdown = DailyStatsGateway(client=client).read_sensor_breakdown([3, 1, 99], bucket=60)
+        self.assertEqual(list(breakdown), [1, 3])
+        sensor = breakdown[1]
+        self.assertEqual(sensor['humidity']['count'], 40)
+        buckets = sensor['buckets']['humidity']
+        self.assertEqual(buckets['t'], sorted(buckets['t']))
+        self.assertEqual(max(buckets['max']), sensor['humidity']['max'])
+        self.assertEqual(min(buckets['min']), sensor['humidity']['min'])
+
+        # las listas JSON dan el mismo desglose que el formato compacto
+        json_client = FakeRedis()
+        with frozen:
+            snapshot_bench.populate(json_client, sensors=3, entries=40, history_format='json')
+        self.assertEqual(DailyStatsGateway(client=json_client).read_sensor_breakdown([3, 1, 99], bucket=60), breakdown)
+
+    def test_breakdown_matches_daily_totals_in_one_pipeline(self):
+        today = timezone.localdate()
+        midnight = timezone.make_aware(datetime.combine(today, datetime.min.time()))
+
+        def packet(seq, moment, pct):
+            ts = timezone.localtime(moment).strftime('%Y-%m-%d %H:%M:%S')
+            return {'seq': seq, 'ts': ts, 'alerta': False, 'samples': [
+                {'id': sid, 'soil': {'pct': pct + sid}, 'tilt': sid == 2, 'vib': {'pulse': 300, 'hit': 0}}
+                for sid in (1, 2)
+            ]}
+
+        client = FakeRedis()
+        gateway = DailyStatsGateway(client=client)
+        # el día anterior queda en la ventana de historial pero no en los agregados de hoy
+        gateway.record_packets([packet(1, midnight - timedelta(minutes=1), 90)])
+        gateway.record_packets([packet(seq, midnight + timedelta(seconds=seq), 40) for seq in range(2, 6)])
+        client.reset_counters()
+        snapshot = gateway.get_today_snapshot(bucket=60, breakdown=True)
+        self.assertEqual(client.round_trips, 2)
+
+        sensors = snapshot['sensors']
+        self.assertEqual(sum(sensor['humidity']['count'] for sensor in sensors.values()), snapshot['total_readings'])
+        self.assertEqual(sum(sensor['inclination_events'] for sensor in sensors.values()), snapshot['inclination_events'])
+        self.assertEqual(sensors[1]['humidity'], {'count': 4, 'avg': 41.0, 'min': 41.0, 'max': 41.0, 'last': 41.0})
+        buckets = sensors[2]['buckets']['humidity']
+        self.assertEqual(buckets['t'], [int(midnight.timestamp())])
+        self.assertEqual(buckets['max'], [42.0])
+
+    def test_view_validates_params_and_caches_per_selection(self):
+        calls = []
+
+        class StubGateway:
+            def get_today_snapshot(self, **kwargs):
+                calls.append(kwargs)
+                return {'source': 'redis', 'sensors': {}}
+
+        view = RealtimeRedisView.as_view(gateway_class=StubGateway)
+        user = get_user_model().objects.create_user('operador', password='x')
+
+        def get(**params):
+            request = RequestFactory().get('/realtime-redis/', params)
+            request.user = user
+            return view(request)
+
+        snapshot_cache.clear()
+        self.addCleanup(snapshot_cache.clear)
+        self.assertEqual(get(bucket='0').status_code, 400)
+        self.assertEqual(get(sensors='1,x').status_code, 400)
+        get(sensors='2,1', bucket='1m')
+        get(sensors='1,2,2', bucket='60')
+        get(bucket='5m')
+        self.assertEqual(calls, [
+            {'sensor_ids': [1, 2], 'bucket': 60, 'breakdown': True},
+            {'sensor_ids': None, 'bucket': 300, 'breakdown': True},
+        ])
+
+
+class RedisPoolTests(TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = patch.object(redis_pool, 'time', MagicMock(monotonic=lambda: self.now))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def delta(self, before):
+        after = redis_pool.counters.snapshot()
+        return {name: after[name] - before[name] for name in after if after[name] != before[name]}
+
+    def test_breaker_opens_probes_once_and_recovers(self):
+        counters = redis_pool.RedisCounters()
+        breaker = redis_pool.CircuitBreaker(failure_threshold=3, reset_timeout=10, counters=counters)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        # los fallos cuentan solo si son consecutivos
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, breaker.CLOSED)
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, breaker.OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+        self.now += 10
+        self.assertEqual(breaker.state, breaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        # una sola petición de prueba a la vez
+        self.assertFalse(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, breaker.OPEN)
+        self.assertFalse(breaker.allow())
+
+        self.now += 10
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, breaker.CLOSED)
+        self.assertTrue(breaker.allow())
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, breaker.CLOSED)
+        self.assertEqual(counters.snapshot()['breaker_opened'], 1)
+        self.assertEqual(counters.snapshot()['breaker_rejections'], 4)
+
+    def test_counters_are_thread_safe(self):
+        counters = redis_pool.RedisCounters()
+        threads = [threading.Thread(target=lambda: [counters.incr('pool_waits') for _ in range(1000)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(counters.snapshot(), dict.fromkeys(redis_pool.RedisCounters.NAMES, 0) | {'pool_waits': 4000})
+
+    @override_settings(REDIS_URL='redis://127.0.0.1:1/0', REDIS_MAX_CONNECTIONS=1, REDIS_POOL_TIMEOUT=0.01)
+    def test_shared_pool_counts_connects_waits_and_failures(self):
+        import redis
+
+        redis_pool.reset_client()
+        self.addCleanup(redis_pool.reset_client)
+        client = redis_pool.get_client()
+        self.assertIs(redis_pool.get_client(), client)
+        pool = client.connection_pool
+        self.assertEqual(redis_pool.stats()['pool'], {'max_connections': 1, 'created_connections': 0})
+
+        before = redis_pool.counters.snapshot()
+        with self.assertRaises(redis.ConnectionError):
+            pool.get_connection('PING')
+        self.assertEqual(self.delta(before), {'connect_failures': 1})
+
+        def connect(connection):
+            connection._sock = MagicMock()
+
+        before = redis_pool.counters.snapshot()
+        with patch.object(redis.connection.AbstractConnection, 'connect', connect), \
+                patch.object(redis.connection.AbstractConnection, 'can_read', return_value=False):
+            connection = pool.get_connection('PING')
+            # el único slot está prestado: la siguiente petición espera y se rinde
+            with self.assertRaises(redis.ConnectionError):
+                pool.get_connection('PING')
+            pool.release(connection)
+            self.assertIs(pool.get_connection('PING'), connection)
+        self.assertEqual(self.delta(before), {'connects': 1, 'pool_waits': 1})
+        self.assertEqual(redis_pool.stats()['pool']['created_connections'], 1)
+
+        redis_pool.reset_client()
+        self.assertIsNot(redis_pool.get_client(), client)
+        with override_settings(REDIS_URL=None):
+            self.assertIsNone(redis_pool.get_client())
+
+    @override_settings(REDIS_URL=None)
+    def test_ops_endpoint_reports_counters_and_breaker(self):
+        url = '/ops/redis/'
+        self.client.force_login(get_user_model().objects.create_user('operador', password='x'))
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(get_user_model().objects.create_user('ops', password='x', is_staff=True))
+        body = self.client.get(url).json()
+        self.assertEqual(set(body['counters']), set(redis_pool.RedisCounters.NAMES))
+        self.assertEqual(body['breaker'], redis_pool.breaker.state)
+        self.assertIn('broadcast', body)
+        self.assertEqual(body['ingest_workers'], {})
+
+
+class SnapshotCacheTests(TestCase):
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.calls = 0
+        snapshot_cache.clear()
+        self.addCleanup(snapshot_cache.clear)
+
+    def slow(self, result):
+        def compute():
+            self.calls += 1
+            # el primero calcula mientras el resto llega y espera su resultado
+            self.release.wait(5)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        return compute
+
+    def concurrent_gets(self, cache, compute, callers=5):
+        results = [None] * callers
+
+        def call(index):
+            try:
+                results[index] = cache.get('today', compute)
+            except Exception as exc:
+                results[index] = exc
+
+        coalesced = metrics.SNAPSHOT_CACHE.value(result='coalesced')
+        threads = [threading.Thread(target=call, args=(index,)) for index in range(callers)]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while metrics.SNAPSHOT_CACHE.value(result='coalesced') < coalesced + callers - 1 and time.monotonic() < deadline:
+            time.sleep(0.005)
+        self.release.set()
+        for thread in threads:
+            thread.join(timeout=5)
+        return results
+
+    def test_concurrent_callers_share_one_compute(self):
+        results = self.concurrent_gets(SnapshotCache(ttl=60), self.slow({'total_readings': 3}))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual({result.etag for result in results}, {results[0].etag})
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(json.loads(results[0].body), {'total_readings': 3})
+
+    def test_leader_error_reaches_waiting_callers(self):
+        error = RuntimeError('redis caído')
+        cache = SnapshotCache(ttl=60)
+        self.assertEqual(self.concurrent_gets(cache, self.slow(error)), [error] * 5)
+        self.assertEqual(self.calls, 1)
+        # el error no queda cacheado: la siguiente petición vuelve a calcular
+        self.assertEqual(cache.get('today', lambda: {'total_readings': 1}).data, {'total_readings': 1})
+
+    def test_view_answers_304_per_variant(self):
+        class StubGateway:
+            def get_today_snapshot(self, sensor_ids=None, bucket=None, breakdown=False):
+                return {'sensors': sensor_ids, 'bucket': bucket, 'breakdown': breakdown}
+
+        view = RealtimeRedisView.as_view(gateway_class=StubGateway)
+        user = get_user_model().objects.create_user('operador', password='x')
+
+        def get(etag=None, **params):
+            headers = {'If-None-Match': etag} if etag else {}
+            request = RequestFactory().get('/realtime-redis/', params, headers=headers)
+            request.user = user
+            return view(request)
+
+        etags = {}
+        for name, params in {'today': {}, 'sensors': {'sensors': '2,1'}, 'bucket': {'sensors': '1,2', 'bucket': '1m'}}.items():
+            with self.subTest(name):
+                response = get(**params)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['Cache-Control'], 'private, no-cache')
+                etags[name] = response['ETag']
+                cached = get(etag=etags[name], **params)
+                self.assertEqual(cached.status_code, 304)
+                self.assertEqual(cached.content, b'')
+                self.assertEqual(cached['ETag'], etags[name])
+                self.assertEqual(get(etag='"otro"', **params).status_code, 200)
+        self.assertEqual(len(set(etags.values())), 3)
+        # los mismos parámetros normalizados comparten entrada y ETag
+        self.assertEqual(get(etag=etags['bucket'], sensors='2,1,1', bucket='60').status_code, 304)
+        self.assertEqual(get(etag=f'"x", {etags["today"]}').status_code, 304)
+
+
+class ChartSeriesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.start = timezone.make_aware(datetime(2025, 3, 1))
+        for minute in range(0, 12 * 60, 5):
+            ts = cls.start + timedelta(minutes=minute)
+            packet = SensorPacket.objects.create(seq=minute, timestamp=ts)
+            for sample_id in (1, 2):
+                SensorSample.objects.create(
+                    packet=packet, timestamp=ts, sample_id=sample_id, soil_raw=0,
+                    soil_pct=40 + (minute % 60) / 10 + sample_id, vib_pulse=100 + minute,
+                )
+        # un pico aislado que la reducción no debe perder
+        SensorSample.objects.filter(packet__seq=400, sample_id=1).update(soil_pct=99.5)
+        rollups.rebuild()
+
+    def test_lttb_keeps_ends_and_spikes(self):
+        values = [10.0] * 200
+        values[123] = 80.0
+        reducer = downsample.LargestTriangle(len(values), 20)
+        for index, value in enumerate(values):
+            reducer.add(index, 1, value)
+        result = reducer.finish()
+        self.assertEqual(len(result['t']), 20)
+        self.assertEqual((result['t'][0], result['t'][-1]), (0, 199000))
+        self.assertIn(80.0, result['value'])
+
+        reducer = downsample.LargestTriangle(3, 20)
+        for index in range(3):
+            reducer.add(index, 2, index * 2)
+        self.assertEqual(reducer.finish(), {'t': [0, 1000, 2000], 'value': [0.0, 1.0, 2.0]})
+
+    def test_hour_rollups_match_grouped_samples(self):
+        end = self.start + timedelta(hours=12)
+        from_rollups = downsample.chart_series(self.start, end, points=12)
+        from_samples = downsample.chart_series(self.start, end, points=12, use_rollups=False)
+        self.assertEqual((from_rollups['source'], from_samples['source']), ('hour', 'samples'))
+        for name in ('humidity', 'pulse'):
+            self.assertEqual(from_rollups[name], from_samples[name])
+        self.assertEqual(max(from_samples['humidity']['max']), 99.5)
+        self.assertEqual(len(from_samples['humidity']['t']), 12)
+
+    def test_samples_are_grouped_in_the_database(self):
+        end = self.start + timedelta(hours=12)
+        with self.assertNumQueries(1):
+            result = downsample.chart_series(self.start, end, points=50, use_rollups=False)
+        self.assertEqual(result['rows'], 50)
+        # LTTB tampoco cuenta las filas: los grupos caen en una grilla conocida
+        with self.assertNumQueries(1):
+            result = downsample.chart_series(self.start, end, points=30, method='lttb', use_rollups=False)
+        self.assertEqual(len(result['pulse']['t']), 30)
+
+    def test_rollups_include_the_bucket_containing_start(self):
+        start, end = self.start + timedelta(minutes=30), self.start + timedelta(hours=12)
+        result = downsample.chart_series(start, end, points=11)
+        self.assertEqual((result['source'], result['rows']), ('hour', 12))
+        self.assertEqual(result['humidity']['t'][0], int(start.timestamp() * 1000))
+
+    def test_lttb_over_rollups_with_an_empty_tail(self):
+        # la mitad final del rango no tiene datos: los buckets vacíos no descartan los extremos
+        end = self.start + timedelta(hours=24)
+        with self.assertNumQueries(2):
+            result = downsample.chart_series(self.start, end, points=10, method='lttb')
+        self.assertEqual(result['source'], 'hour')
+        times = result['pulse']['t']
+        self.assertEqual(times[0], int(self.start.timestamp() * 1000))
+        self.assertEqual(times[-1], int((self.start + timedelta(hours=11)).timestamp() * 1000))
+        self.assertEqual(times, sorted(set(times)))
+
+    def test_view_validates_params(self):
+        user = get_user_model().objects.create_user('operador', password='x')
+
+        def get(**params):
+            request = RequestFactory().get('/chart/series/', params)
+            request.user = user
+            return ChartSeriesView.as_view()(request)
+
+        self.assertEqual(get(method='avg').status_code, 400)
+        self.assertEqual(get(points='5').status_code, 400)
+        self.assertEqual(json.loads(get(points='abc').content), {'error': 'points debe ser un entero'})
+        self.assertEqual(get(start='ayer').status_code, 400)
+        response = get(start='2025-03-01', end='2025-03-01', points='24')
+        payload = json.loads(response.content)
+        self.assertEqual((payload['method'], payload['source']), ('minmax', 'hour'))
+        self.assertEqual(len(payload['humidity']['t']), 12)
+
+
+class ExportSamplesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = get_user_model().objects.create_user('analista', password='x', is_staff=True)
+        start = timezone.make_aware(datetime(2025, 5, 1, 8))
+        for seq in range(1, 4):
+            packet = SensorPacket.objects.create(seq=seq, timestamp=start + timedelta(days=seq), alerta=seq == 2)
+            for sample_id in (1, 2):
+                SensorSample.objects.create(
+                    packet=packet, timestamp=packet.timestamp, sample_id=sample_id, soil_raw=500,
+                    soil_pct=40.5, tilt=sample_id == 2, vib_pulse=100 * seq, vib_hit=False,
+                )
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def test_csv_export_is_streamed_in_chunks(self):
+        with patch.object(export, 'FLUSH_BYTES', 64):
+            response = self.client.get('/export/samples/', {'start': '2025-05-03', 'end': '2025-05-04'})
+            chunks = list(response.streaming_content)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="muestras_20250503-20250505.csv"')
+        self.assertGreater(len(chunks), 1)
+        rows = list(csv.reader(io.StringIO(b''.join(chunks).decode())))
+        self.assertEqual(rows[0], list(export.COLUMNS))
+        self.assertEqual(rows[1:], [
+            ['2', '2025-05-03T08:00:00-05:00', '1', '1', '500', '40.5', '0', '200', '0'],
+            ['2', '2025-05-03T08:00:00-05:00', '1', '2', '500', '40.5', '1', '200', '0'],
+            ['3', '2025-05-04T08:00:00-05:00', '0', '1', '500', '40.5', '0', '300', '0'],
+            ['3', '2025-05-04T08:00:00-05:00', '0', '2', '500', '40.5', '1', '300', '0'],
+        ])
+
+    def test_export_requires_staff_and_valid_params(self):
+        self.assertEqual(self.client.get('/export/samples/', {'format': 'xlsx'}).status_code, 400)
+        self.assertEqual(self.client.get('/export/samples/', {'end': 'mañana'}).status_code, 400)
+        self.client.force_login(get_user_model().objects.create_user('operador', password='x'))
+        self.assertEqual(self.client.get('/export/samples/').status_code, 403)
+
+    async def test_asgi_export_uses_async_iterator(self):
+        client = AsyncClient()
+        await client.aforce_login(self.staff)
+        response = await client.get('/export/samples/', {'format': 'ndjson'})
+        self.assertTrue(response.is_async)
+        lines = b''.join([chunk async for chunk in response.streaming_content]).decode().splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertEqual(json.loads(lines[0])['alerta'], False)
+
+    def test_command_writes_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'muestras.ndjson')
+            call_command('export_samples', format='ndjson', start='2025-05-02', end='2025-05-02',
+                         output=path, stdout=io.StringIO())
+            with open(path) as handle:
+                records = [json.loads(line) for line in handle]
+        self.assertEqual([(record['seq'], record['sample_id']) for record in records], [(1, 1), (1, 2)])
+
+
+class SeedSensorDataTests(TestCase):
+
+    def _seed(self, **options):
+        call_command(
+            'seed_sensor_data', start='2025-03-01', end='2025-03-03', per_day=4, sensors=5,
+            stdout=io.StringIO(), **options,
+        )
+
+    def _rows(self):
+        packets = list(SensorPacket.objects.order_by('id').values_list('id', 'seq', 'timestamp', 'alerta'))
+        samples = list(SensorSample.objects.order_by('id').values_list(
+            'id', 'packet_id', 'timestamp', 'sample_id', 'soil_raw', 'soil_pct', 'tilt', 'vib_pulse', 'vib_hit',
+        ))
+        return packets, samples
+
+    def test_seeds_range_with_preallocated_ids(self):
+        self._seed(no_rollups=True)
+        packets, samples = self._rows()
+        self.assertEqual(len(packets), 12)
+        self.assertEqual(len(samples), 60)
+        self.assertEqual([row[1] for row in packets], list(range(1, 13)))
+        self.assertEqual(timezone.localtime(packets[0][2]).date().isoformat(), '2025-03-01')
+        self.assertEqual(timezone.localtime(packets[-1][2]).date().isoformat(), '2025-03-03')
+        self.assertFalse(SensorSample.objects.exclude(timestamp=F('packet__timestamp')).exists())
+        self.assertEqual(sorted({row[3] for row in samples}), [1, 2, 3, 4, 5])
+        self.assertFalse(SensorRollup.objects.exists())
+
+        packet = SensorPacket.objects.create(seq=99, timestamp=timezone.now())
+        self.assertEqual(packet.id, packets[-1][0] + 1)
+
+    def test_output_does_not_depend_on_blocks(self):
+        self._seed()
+        expected = self._rows()
+        self.assertEqual(SensorRollup.objects.filter(granularity=SensorRollup.DAY).count(), 3)
+        with patch.object(seeding, 'BLOCK_SAMPLES', 1):
+            self._seed(force=True)
+        self.assertEqual(self._rows(), expected)
+
+
+@override_settings(STORAGES=STATIC_STORAGES)
+class AdminChangelistTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_superuser('revisor', password='x')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def _add_packets(self, count, start):
+        for offset in range(count):
+            timestamp = timezone.make_aware(start + timedelta(days=offset))
+            packet = SensorPacket.objects.create(seq=SensorPacket.objects.count() + 1, timestamp=timestamp)
+            for sample_id in (1, 2, 3):
+                SensorSample.objects.create(
+                    packet=packet, timestamp=timestamp, sample_id=sample_id, soil_raw=500,
+                    soil_pct=40.0, vib_pulse=100,
+                )
+        rollups.rebuild()
+
+    def _changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_changelists_use_constant_queries(self):
+        for url in ('/admin/monitoring/sensorpacket/', '/admin/monitoring/sensorsample/'):
+            with self.subTest(url=url):
+                SensorPacket.objects.all().delete()
+                self._add_packets(4, datetime(2025, 1, 10, 9))
+                _, few = self._changelist_queries(url)
+                self._add_packets(20, datetime(2025, 3, 10, 9))
+                response, many = self._changelist_queries(url)
+                self.assertEqual(few, many)
+        self.assertContains(response, '2025')
+
+    def test_packet_changelist_annotates_sample_counts(self):
+        self._add_packets(2, datetime(2025, 1, 10, 9))
+        response = self.client.get('/admin/monitoring/sensorpacket/')
+        self.assertEqual([obj.samples_total for obj in response.context['cl'].result_list], [3, 3])
+        self.assertNotContains(self.client.get('/admin/monitoring/sensorpacket/', {'q': 'abc'}), 'field-samples_count')
+        self.assertEqual(len(self.client.get('/admin/monitoring/sensorpacket/', {'q': '2'}).context['cl'].result_list), 1)
+
+    def test_date_hierarchy_uses_rollups(self):
+        self._add_packets(3, datetime(2024, 12, 30, 9))
+        response = self.client.get('/admin/monitoring/sensorpacket/', {'timestamp__year': 2025})
+        self.assertEqual(response.context['cl'].result_count, 1)
+        queryset = SensorPacket.objects.all()
+        queryset = monitoring_admin.RollupDatesQuerySet(queryset.model, query=queryset.query.chain())
+        months = [(moment.year, moment.month) for moment in queryset.datetimes('timestamp', 'month')]
+        self.assertEqual(months, [(2024, 12), (2025, 1)])
+        with CaptureQueriesContext(connection) as queries:
+            queryset.datetimes('timestamp', 'day')
+        self.assertNotIn('DISTINCT', ' '.join(query['sql'] for query in queries))
+
+        # sin rollups, el calendario entre el primer y el último timestamp
+        SensorRollup.objects.all().delete()
+        days = queryset.filter(timestamp__year=2024).datetimes('timestamp', 'day', order='DESC')
+        self.assertEqual([moment.day for moment in days], [31, 30])
+
+    def test_paginator_counts_exactly_without_estimates(self):
+        self._add_packets(3, datetime(2025, 1, 10, 9))
+        estimate = monitoring_admin.estimated_count(SensorPacket.objects.all())
+        if connection.vendor == 'postgresql':
+            self.assertLess(estimate, monitoring_admin.ESTIMATE_THRESHOLD)
+            self.assertEqual(monitoring_admin.estimated_count(SensorPacket.objects.none()), 0)
+        else:
+            self.assertIsNone(estimate)
+        self.assertEqual(monitoring_admin.EstimatedCountPaginator(SensorPacket.objects.all(), 2).count, 3)
+        with patch.object(monitoring_admin, 'estimated_count', return_value=80_000):
+            self.assertEqual(monitoring_admin.EstimatedCountPaginator(SensorPacket.objects.all(), 2).count, 80_000)
+
+
+@override_settings(METRICS_TOKEN='scrape', SERVER_TIMING=True)
+class MetricsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = get_user_model().objects.create_user('ops', password='x', is_staff=True)
+
+    def test_middleware_records_view_latency_and_queries(self):
+        self.client.force_login(self.staff)
+        before = metrics.REQUEST_LATENCY.count(view='monitoring:chart-series', method='GET', status=200)
+        queries_before = metrics.REQUEST_DB_QUERIES.value(view='monitoring:chart-series')
+        response = self.client.get('/chart/series/')
+        self.assertEqual(response.status_code, 200)
+        timing = dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+        self.assertEqual(sorted(timing), ['app', 'db', 'redis'])
+        queries = int(timing['db'].split('desc="')[1].split()[0])
+        self.assertGreater(queries, 0)
+        self.assertEqual(metrics.REQUEST_LATENCY.count(view='monitoring:chart-series', method='GET', status=200), before + 1)
+        self.assertEqual(metrics.REQUEST_DB_QUERIES.value(view='monitoring:chart-series'), queries_before + queries)
+
+        with override_settings(SERVER_TIMING=False):
+            self.assertNotIn('Server-Timing', self.client.get('/chart/series/'))
+
+    def test_redis_client_records_commands_and_pipelines(self):
+        client = redis_pool._TimedRedis()
+        commands = metrics.REDIS_COMMANDS.value(kind='pipeline')
+        stats, token = metrics.start_request()
+        try:
+            with patch('redis.Redis.execute_command', return_value=b'PONG'):
+                client.ping()
+            with patch('redis.client.Pipeline.execute', return_value=[1, 1, 1]):
+                pipe = client.pipeline()
+                pipe.incr('a').incr('b').incr('c')
+                pipe.execute()
+        finally:
+            metrics._current.reset(token)
+        self.assertEqual(stats.redis_commands, 4)
+        self.assertEqual(metrics.REDIS_COMMANDS.value(kind='pipeline'), commands + 3)
+
+    def test_snapshot_cache_hits_and_misses(self):
+        cache = SnapshotCache(ttl=60)
+        hits, misses = metrics.SNAPSHOT_CACHE.value(result='hit'), metrics.SNAPSHOT_CACHE.value(result='miss')
+        for _ in range(3):
+            cache.get('today', lambda: {'total': 1})
+        self.assertEqual(metrics.SNAPSHOT_CACHE.value(result='hit'), hits + 2)
+        self.assertEqual(metrics.SNAPSHOT_CACHE.value(result='miss'), misses + 1)
+
+    def test_endpoint_requires_token_or_staff(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 401)
+        self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer otro').status_code, 401)
+        response = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer scrape')
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('sse_connections{state="active"} 0', body)
+        self.assertIn('redis_breaker_state{state="closed"} 1', body)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get('/metrics/').status_code, 200)
+
+    def test_histogram_exposition(self):
+        histogram = metrics.Histogram('demo_seconds', 'Demo.', ('view',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 3):
+            histogram.observe(value, view='a"b')
+        self.assertEqual(histogram.render()[2:], [
+            'demo_seconds_bucket{view="a\\"b",le="0.1"} 1',
+            'demo_seconds_bucket{view="a\\"b",le="1"} 2',
+            'demo_seconds_bucket{view="a\\"b",le="+Inf"} 3',
+            'demo_seconds_sum{view="a\\"b"} 3.55',
+            'demo_seconds_count{view="a\\"b"} 3',
+        ])
+
+
+class BenchmarkSuiteTests(TestCase):
+
+    @override_settings(REDIS_URL=None)
+    def test_scale_reports_latency_and_counts(self):
+        end = datetime(2025, 3, 10).date()
+        results = benchmark_suite.run_scale('demo', 3, 2, repeat=1, end=end)
+        self.assertEqual(results['db.demo.seed']['samples'], 3 * benchmark_suite.PER_DAY * 2)
+        for scenario in ('all', 'year', 'month', 'day'):
+            row = results[f'db.demo.dashboard.{scenario}']
+            self.assertGreater(row['queries'], 0)
+            self.assertGreaterEqual(row['ms'], row['ms_min'])
+        self.assertGreater(results['db.demo.ingest']['per_s'], 0)
+        # calentamiento + una repetición, después de lo generado
+        self.assertEqual(SensorPacket.objects.filter(timestamp__date__gt=end).count(), 2 * benchmark_suite.INGEST_BATCH)
+
+    def test_redis_scenarios_count_round_trips(self):
+        results = benchmark_suite.run_redis(3, repeat=1, latency_ms=0)
+        self.assertEqual(results['redis.3.snapshot']['round_trips'], 1)
+        self.assertEqual(results['redis.3.write']['round_trips'], 1)
+        self.assertGreater(results['redis.3.breakdown']['commands'], 0)
+
+    def test_compare_flags_regressions(self):
+        baseline = {'results': {
+            'db.x.dashboard.all': {'ms': 10.0, 'ms_min': 10.0, 'queries': 2},
+            'db.x.ingest': {'ms': 50.0, 'ms_min': 50.0, 'per_s': 2000.0, 'queries': 12},
+            'redis.3.snapshot': {'ms': 0.5, 'ms_min': 0.5, 'round_trips': 1},
+        }}
+        current = {'results': {
+            'db.x.dashboard.all': {'ms': 11.0, 'ms_min': 11.0, 'queries': 3},
+            'db.x.ingest': {'ms': 80.0, 'ms_min': 80.0, 'per_s': 1250.0, 'queries': 12},
+            'redis.3.snapshot': {'ms': 0.9, 'ms_min': 0.9, 'round_trips': 1},
+            'redis.500.snapshot': {'ms': 5.0, 'round_trips': 1},
+        }}
+        rows = benchmark_suite.compare(baseline, current, threshold=0.25)
+        flagged = {(row['name'], row['metric']) for row in rows if row['regression']}
+        self.assertEqual(flagged, {
+            ('db.x.dashboard.all', 'queries'),
+            ('db.x.ingest', 'ms'),
+            ('db.x.ingest', 'per_s'),
+        })
+        # +80 % en 0.4 ms queda bajo el piso de ruido; sin línea base no hay fila
+        self.assertNotIn('redis.500.snapshot', {row['name'] for row in rows})
@@ -1,6 +1,16 @@
 from django.urls import path
 
-from .views import DashboardView, SensorStreamView, RealtimeRedisView
+from .views import (
+    ChartSeriesView,
+    DashboardView,
+    ExportSamplesView,
+    HistoricalWidgetView,
+    MetricsView,
+    PacketIngestView,
+    RealtimeRedisView,
+    RedisPoolStatsView,
+    SensorStreamView,
+)
 
 
 app_name = 'monitoring'
@@ -9,4 +19,10 @@ urlpatterns = [
     path('', DashboardView.as_view(), name='dashboard'),
     path('stream/', SensorStreamView.as_view(), name='sensor-stream'),
     path("realtime-redis/", RealtimeRedisView.as_view(), name="realtime-redis"),
+    path("widgets/<slug:name>/", HistoricalWidgetView.as_view(), name="historical-widget"),
+    path("chart/series/", ChartSeriesView.as_view(), name="chart-series"),
+    path("export/samples/", ExportSamplesView.as_view(), name="export-samples"),
+    path("ops/redis/", RedisPoolStatsView.as_view(), name="redis-stats"),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
+    path("ingest/packets/", PacketIngestView.as_view(), name="packet-ingest"),
 ]
@@ -1,22 +1,33 @@
-import itertools
+import hashlib
+import hmac
 import json
 import random
-import time
+import re
 from datetime import date, timedelta
+from urllib.parse import urlencode
 
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.core.handlers.asgi import ASGIRequest
 from django.core.serializers.json import DjangoJSONEncoder
-from django.db.models import Avg, Count, Max, Min, Q
-from django.db.models.functions import TruncMonth
+from django.db.models import Max
 from django.http import StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.decorators import method_decorator
 from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.gzip import gzip_page
 from django.views.generic import TemplateView
 
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
 from django.conf import settings
-from .models import SensorSample
+from django.utils.cache import get_conditional_response, parse_etags
+from .models import SensorPacket, SensorSample
+from .services import broadcast, dashboard_cache, downsample, export, historical, metrics, redis_pool, rollups, sse, stream_ingest
+from .services.ingest import PacketValidationError, packet_buffer, parse_packet
 from .services.redis_gateway import DailyStatsGateway
+from .services.snapshot_cache import snapshot_cache
 
 MONTH_NAMES = {
     1: "enero",
@@ -34,40 +45,254 @@ MONTH_NAMES = {
 }
 
 class RealtimeRedisView(LoginRequiredMixin, View):
+    """
+    Snapshot del día. `?sensors=1,2,5` (o `all`) agrega estadísticas por sensor y
+    `?bucket=60` (segundos, o `30s`, `5m`, `1h`) sus series en buckets fijos min/avg/max.
+    """
+
+    gateway_class = DailyStatsGateway
+    bucket_pattern = re.compile(r'^(\d+)([smh]?)$')
+    bucket_units = {'': 1, 's': 1, 'm': 60, 'h': 3600}
+    max_bucket_seconds = 86400
+    max_sensors = 1000
+
+    def get(self, request, *args, **kwargs):
+        try:
+            sensor_ids, bucket = self._breakdown_params(request.GET)
+        except ValueError as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+
+        if 'sensors' in request.GET or bucket:
+            selected = 'all' if sensor_ids is None else ','.join(map(str, sensor_ids))
+            # mismos parámetros normalizados -> misma entrada de cache y mismo ETag
+            snapshot = snapshot_cache.get(
+                f'today:{selected}:{bucket or 0}',
+                lambda: self.gateway_class().get_today_snapshot(sensor_ids=sensor_ids, bucket=bucket, breakdown=True),
+            )
+        else:
+            snapshot = snapshot_cache.get('today', lambda: self.gateway_class().get_today_snapshot())
+        if snapshot.etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(snapshot.body, content_type='application/json')
+        response['ETag'] = snapshot.etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def _breakdown_params(self, params):
+        sensor_ids = None
+        raw = params.get('sensors', 'all').strip().lower()
+        if raw not in ('', 'all'):
+            try:
+                sensor_ids = sorted({int(value) for value in raw.split(',') if value.strip()})
+            except ValueError:
+                raise ValueError('sensors debe ser "all" o una lista de ids separada por comas') from None
+            if len(sensor_ids) > self.max_sensors:
+                raise ValueError(f'Máximo {self.max_sensors} sensores por consulta')
+
+        bucket = None
+        raw = params.get('bucket', '').strip().lower()
+        if raw:
+            match = self.bucket_pattern.match(raw)
+            bucket = int(match.group(1)) * self.bucket_units[match.group(2)] if match else 0
+            if not 0 < bucket <= self.max_bucket_seconds:
+                raise ValueError(f'bucket debe estar entre 1 s y {self.max_bucket_seconds} s (ej. 60, 5m, 1h)')
+        return sensor_ids, bucket
+
+
+class ChartSeriesView(LoginRequiredMixin, View):
+    """
+    Humedad y pulso reducidos para un gráfico con zoom: `?start=&end=` (fecha o fecha-hora,
+    default: todo el histórico), `?points=` (máximo de puntos) y `?method=minmax|lttb`.
+    """
+
+    default_points = 500
+    max_points = 5000
+
+    def get(self, request, *args, **kwargs):
+        try:
+            start, end = self._range(request.GET)
+        except ValueError as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+        try:
+            points = int(request.GET.get('points', self.default_points))
+        except ValueError:
+            return JsonResponse({'error': 'points debe ser un entero'}, status=400)
+        method = request.GET.get('method', downsample.MINMAX)
+        if method not in downsample.METHODS:
+            return JsonResponse({'error': f"method debe ser {' o '.join(downsample.METHODS)}"}, status=400)
+        if not 10 <= points <= self.max_points:
+            return JsonResponse({'error': f'points debe estar entre 10 y {self.max_points}'}, status=400)
+        if start is None or end <= start:
+            return JsonResponse({'method': method, 'points': points, 'humidity': {}, 'pulse': {}})
+
+        payload = downsample.chart_series(
+            start, end, points=points, method=method, use_rollups=settings.DASHBOARD_USE_ROLLUPS,
+        )
+        return JsonResponse(payload, encoder=DjangoJSONEncoder)
+
+    def _range(self, params):
+        first, last = None, None
+        if not params.get('start') or not params.get('end'):
+            first, last = downsample.data_bounds()
+        start = historical.parse_moment(params['start'], 'start') if params.get('start') else first
+        if params.get('end'):
+            end = historical.parse_moment(params['end'], 'end', inclusive_day=True)
+        else:
+            end = last + timedelta(seconds=1) if last else timezone.now()
+        return start, end
+
+
+class RedisPoolStatsView(LoginRequiredMixin, UserPassesTestMixin, View):
+    def test_func(self):
+        return self.request.user.is_staff
+
     def get(self, request, *args, **kwargs):
-        gateway = DailyStatsGateway()
-        return JsonResponse(gateway.get_today_snapshot())
+        client = redis_pool.get_client()
+        try:
+            workers = stream_ingest.worker_metrics(client) if client is not None else {}
+        except Exception as exc:
+            workers = {'error': str(exc)}
+        return JsonResponse({**redis_pool.stats(), 'broadcast': broadcast.hub.stats(), 'ingest_workers': workers})
+
+class MetricsView(View):
+    """
+    Métricas del proceso en formato de texto de Prometheus. Requiere `Authorization: Bearer
+    <METRICS_TOKEN>` o una sesión de usuario staff.
+    """
+
+    http_method_names = ['get']
+
+    def get(self, request, *args, **kwargs):
+        if not _bearer_or_staff(request, settings.METRICS_TOKEN):
+            return HttpResponse('No autorizado', status=401, content_type='text/plain')
+        return HttpResponse(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+
+def _bearer_or_staff(request, token):
+    header = request.headers.get('Authorization', '')
+    if token and header.startswith('Bearer '):
+        return hmac.compare_digest(header[len('Bearer '):].strip().encode(), token.encode())
+    return request.user.is_authenticated and request.user.is_staff
+
+
+class ExportSamplesView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    Descarga del histórico crudo en streaming: `?start=&end=` (fecha o fecha-hora; sin ellos,
+    todo) y `?format=csv|ndjson|parquet`. Solo staff.
+    """
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        fmt = request.GET.get('format', export.CSV)
+        if fmt not in export.available_formats():
+            return JsonResponse({'error': f"format debe ser {' o '.join(export.available_formats())}"}, status=400)
+        try:
+            start = historical.parse_moment(request.GET['start'], 'start') if request.GET.get('start') else None
+            end = historical.parse_moment(request.GET['end'], 'end', inclusive_day=True) if request.GET.get('end') else None
+        except ValueError as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+
+        chunks = export.stream(fmt, export.samples(start, end))
+        if isinstance(request, ASGIRequest):
+            chunks = export.aiter_chunks(chunks)
+        response = StreamingHttpResponse(chunks, content_type=export.CONTENT_TYPES[fmt])
+        label = '-'.join(f'{moment:%Y%m%d}' for moment in (start, end) if moment) or 'completo'
+        response['Content-Disposition'] = f'attachment; filename="muestras_{label}.{fmt}"'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class PacketIngestView(View):
+    """
+    Recibe paquetes del borde: un objeto o lista JSON (`application/json`) o un lote
+    NDJSON (`application/x-ndjson`, un paquete por línea). Requiere `Authorization:
+    Bearer <INGEST_TOKEN>` o una sesión de usuario staff.
+    """
+
+    http_method_names = ['post']
+    ndjson_types = ('application/x-ndjson', 'application/jsonl', 'application/json-seq')
+    max_errors = 50
+
+    def post(self, request, *args, **kwargs):
+        if not self._authorized(request):
+            return JsonResponse({'error': 'No autorizado'}, status=401)
+
+        try:
+            packets, errors = self._read_packets(request)
+        except ValueError as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+        if len(packets) + len(errors) > settings.INGEST_MAX_PACKETS:
+            return JsonResponse({'error': f'Máximo {settings.INGEST_MAX_PACKETS} paquetes por petición'}, status=413)
+        if not packets:
+            return JsonResponse({'received': 0, 'errors': errors[:self.max_errors]}, status=400)
+
+        try:
+            result = packet_buffer.submit(packets)
+        except Exception:
+            return JsonResponse({'error': 'No se pudo almacenar el lote, reintentar'}, status=503)
+
+        return JsonResponse({
+            'received': len(packets),
+            'created': result.created,
+            'duplicates': result.duplicates,
+            'errors': errors[:self.max_errors],
+        })
+
+    def _authorized(self, request):
+        return _bearer_or_staff(request, settings.INGEST_TOKEN)
+
+    def _read_packets(self, request):
+        if request.content_type in self.ndjson_types:
+            items = (
+                (number, line)
+                for number, line in enumerate(request, start=1)
+                if line.strip()
+            )
+        else:
+            try:
+                body = json.loads(request.body or b'null')
+            except ValueError:
+                raise ValueError('El cuerpo no es JSON válido') from None
+            items = enumerate(body if isinstance(body, list) else [body], start=1)
+
+        packets, errors = [], []
+        for number, raw in items:
+            try:
+                data = json.loads(raw) if isinstance(raw, (bytes, str)) else raw
+                packets.append(parse_packet(data))
+            except (ValueError, PacketValidationError) as exc:
+                errors.append({'item': number, 'error': str(exc)})
+        return packets, errors
 
 class DashboardView(LoginRequiredMixin, TemplateView):
+    """
+    Esqueleto del dashboard: filtros y paneles vacíos. No consulta agregados ni Redis;
+    `dashboard.js` pide en paralelo los widgets históricos (`HistoricalWidgetView`) y el
+    snapshot del día (`/realtime-redis/`), así que el primer render no depende del tamaño
+    del histórico.
+    """
     template_name = 'dashboard.html'
-    gateway_class = DailyStatsGateway
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        base_qs = SensorSample.objects.select_related('packet').filter(packet__timestamp__date__gte=date(2023, 1, 1))
-        end_year = self._latest_year(base_qs)
-        filters = self._extract_filters(end_year=end_year)
-        historical_qs = self._apply_time_filters(base_qs, filters)
-        range_meta = self._range_metadata(historical_qs)
-        global_stats = self._global_aggregates(historical_qs)
-        trend_windows = self._trend_windows(historical_qs)
-        daily_stats = self.gateway_class().get_today_snapshot()
-
+        end_year = HistoricalWidgetView.latest_year()
+        filters = HistoricalWidgetView.extract_filters(self.request.GET, end_year)
+        query = urlencode({name: value for name, value in filters.items() if value})
         context.update({
-            'daily_stats': daily_stats,
-            'daily_insights': self._format_daily_insights(daily_stats),
-            'kpi_cards': self._build_kpis(global_stats, trend_windows),
-            'storyline': self._build_storyline(global_stats),
-            'chart_data': json.dumps(self._build_chart_payload(historical_qs), cls=DjangoJSONEncoder),
-            'historical_range': range_meta,
-            'last_update': self._last_measurement(global_stats),
-            'event_breakdown': self._event_breakdown(global_stats),
+            'widget_urls': {
+                name: reverse('monitoring:historical-widget', args=[name]) + (f'?{query}' if query else '')
+                for name in HistoricalWidgetView.widgets
+            },
             'active_filters': filters,
-            'filter_options': self._filter_options(filters),
             'filters_applied': any(filters.values()),
-            'filter_description': self._filter_description(filters, range_meta),
             'filter_reset_url': self.request.path,
             'sim_stream_enabled': settings.SIM_STREAM_ENABLED,
+            # el hub solo atiende `/stream/` bajo ASGI; bajo WSGI el navegador sondea
+            'live_stream_enabled': broadcast.hub.available() and isinstance(self.request, ASGIRequest),
             'filter_range': {
                 'start_year': 2023,
                 'end_year': end_year,
@@ -75,14 +300,92 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         })
         return context
 
-    def _extract_filters(self, end_year):
+
+@method_decorator(gzip_page, name='dispatch')
+class HistoricalWidgetView(LoginRequiredMixin, View):
+    """
+    Un widget del histórico en JSON (`kpis`, `storyline`, `breakdown` o `charts`) para los
+    filtros `?year=&month=&day=`: sus datos y, salvo `charts`, su HTML. Todos salen del mismo
+    contexto cacheado (`services.dashboard_cache`). Responde con ETag y gzip; un periodo
+    cerrado además se puede reutilizar en el navegador durante `closed_max_age` segundos.
+    """
+    widgets = ('kpis', 'storyline', 'breakdown', 'charts')
+    templates = {
+        'kpis': 'widgets/kpis.html',
+        'storyline': 'widgets/storyline.html',
+        'breakdown': 'widgets/breakdown.html',
+    }
+    closed_max_age = 3600
+
+    def get(self, request, name, *args, **kwargs):
+        if name not in self.widgets:
+            return JsonResponse({'error': f"widget debe ser {', '.join(self.widgets)}"}, status=404)
+        end_year = self.latest_year()
+        filters = self.extract_filters(request.GET, end_year)
+        ranges = historical.period_ranges(filters, first_year=2023, last_year=end_year)
+        # periodos cerrados: sin expiración; el resto se invalida con cada lote ingerido
+        cache_key, cache_timeout = dashboard_cache.entry(filters, end_year, ranges)
+        context = dashboard_cache.get_or_build(
+            cache_key,
+            cache_timeout,
+            lambda: self._historical_context(
+                self._apply_time_filters(SensorSample.objects.all(), ranges), filters, ranges,
+            ),
+        )
+
+        payload = self._payload(name, context)
+        if name in self.templates:
+            payload['html'] = render_to_string(self.templates[name], {
+                **context,
+                'historical_cache': {'key': cache_key, 'timeout': cache_timeout},
+            })
+        body = json.dumps(payload, cls=DjangoJSONEncoder, sort_keys=True).encode()
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()[:20]
+        response = get_conditional_response(request, etag=etag) or HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = (
+            f'private, max-age={self.closed_max_age}' if cache_timeout is None else 'private, no-cache'
+        )
+        return response
+
+    def _payload(self, name, context):
+        if name == 'kpis':
+            return {
+                'kpi_cards': context['kpi_cards'],
+                'last_update': context['last_update'],
+                'filter_description': context['filter_description'],
+                'historical_range': context['historical_range'],
+            }
+        if name == 'storyline':
+            return {'storyline': context['storyline']}
+        if name == 'breakdown':
+            return {'event_breakdown': context['event_breakdown']}
+        return context['chart_data']
+
+    def _historical_context(self, qs, filters, ranges):
+        summary = self._historical_summary(qs, filters, ranges)
+        global_stats = summary.global_stats
+        range_meta = self._range_metadata(global_stats)
+        return {
+            'kpi_cards': self._build_kpis(global_stats, summary.trend_windows),
+            'storyline': self._build_storyline(global_stats),
+            'chart_data': self._build_chart_payload(summary.monthly),
+            'historical_range': range_meta,
+            'last_update': self._last_measurement(global_stats),
+            'event_breakdown': self._event_breakdown(global_stats),
+            'filter_description': self._filter_description(filters, range_meta),
+        }
+
+    @classmethod
+    def extract_filters(cls, params, end_year):
         return {
-            'year': self._safe_int(self.request.GET.get('year'), minimum=2023, maximum=end_year),
-            'month': self._safe_int(self.request.GET.get('month'), minimum=1, maximum=12),
-            'day': self._safe_int(self.request.GET.get('day'), minimum=1, maximum=31),
+            'year': cls._safe_int(params.get('year'), minimum=2023, maximum=end_year),
+            'month': cls._safe_int(params.get('month'), minimum=1, maximum=12),
+            'day': cls._safe_int(params.get('day'), minimum=1, maximum=31),
         }
 
-    def _safe_int(self, value, *, minimum, maximum):
+    @staticmethod
+    def _safe_int(value, *, minimum, maximum):
         if value in (None, ''):
             return None
         try:
@@ -93,36 +396,26 @@ class DashboardView(LoginRequiredMixin, TemplateView):
             return None
         return parsed
 
-    def _apply_time_filters(self, qs, filters):
-        if filters['year']:
-            qs = qs.filter(packet__timestamp__year=filters['year'])
-        if filters['month']:
-            qs = qs.filter(packet__timestamp__month=filters['month'])
-        if filters['day']:
-            qs = qs.filter(packet__timestamp__day=filters['day'])
-        return qs
-
-    def _filter_options(self, filters):
-        current_year = timezone.localdate().year
-        years = [{'value': y, 'label': y} for y in range(2023, current_year + 1)]
-
-        months = [{'value': m, 'label': MONTH_NAMES.get(m, f"Mes {m}")} for m in range(1, 13)]
-        days = [{'value': d, 'label': f"{d:02d}"} for d in range(1, 32)]
-
+    def _apply_time_filters(self, qs, ranges):
+        # rangos [inicio, fin) sobre el timestamp: el índice sirve, EXTRACT no. Todos empiezan
+        # en 2023 o después, así que reemplazan al límite inferior del histórico
+        if ranges is None:
+            return qs.filter(timestamp__gte=historical.local_midnight(date(2023, 1, 1)))
+        return qs.filter(historical.range_q('timestamp', ranges))
+
+    def _historical_summary(self, qs, filters, ranges):
+        # rollups si existen; si no, una sola pasada sobre los samples filtrados
+        summary = None
+        if settings.DASHBOARD_USE_ROLLUPS:
+            summary = historical.from_rollups(filters, ranges, start_date=date(2023, 1, 1))
+        return summary or historical.from_samples(qs)
+
+    def _range_metadata(self, stats):
+        stats = stats or {}
+        start, end = stats.get('first_timestamp'), stats.get('last_timestamp')
         return {
-            'years': years,
-            'months': months,
-            'days': days,
-        }
-
-    def _range_metadata(self, qs):
-        bounds = qs.aggregate(
-            start=Min('packet__timestamp'),
-            end=Max('packet__timestamp'),
-        )
-        return {
-            'start': (bounds['start'].date() if bounds['start'] else date(2023, 1, 1)),
-            'end': (bounds['end'].date() if bounds['end'] else timezone.localdate()),
+            'start': (start.date() if start else date(2023, 1, 1)),
+            'end': (end.date() if end else timezone.localdate()),
         }
 
     def _filter_description(self, filters, range_meta):
@@ -138,82 +431,16 @@ class DashboardView(LoginRequiredMixin, TemplateView):
             parts.append(f"Día {filters['day']:02d}")
         return " · ".join(parts)
 
-    def _latest_year(self, qs):
-        latest = qs.order_by('-packet__timestamp').values_list('packet__timestamp', flat=True).first()
+    @staticmethod
+    def latest_year():
+        latest = rollups.latest_timestamp() if settings.DASHBOARD_USE_ROLLUPS else None
+        if latest is None:
+            # índice de SensorPacket.timestamp: no recorre samples
+            latest = SensorPacket.objects.aggregate(latest=Max('timestamp'))['latest']
         if latest:
             return max(latest.year, timezone.localdate().year)
         return timezone.localdate().year
 
-    def _format_daily_insights(self, stats):
-        total = stats.get('total_readings', 0)
-        return [
-            {
-                'label': 'Pulso promedio',
-                'value': f"{stats.get('pulse_avg', 0):.1f}",
-                'suffix': 'u',
-                'helper': "Fuente Histórica",
-            },
-            {
-                'label': 'Pulso máximo',
-                'value': stats.get('pulse_peak', 0),
-                'suffix': 'u',
-                'helper': 'Pico del día',
-            },
-            {
-                'label': 'Humedad promedio',
-                'value': f"{stats.get('humidity_avg', 0):.1f}",
-                'suffix': '%',
-                'helper': 'Lecturas calibradas',
-            },
-            {
-                'label': 'Eventos detectados',
-                'value': stats.get('hit_events', 0) + stats.get('inclination_events', 0),
-                'suffix': '',
-                'helper': f"Sobre {total} mediciones",
-            },
-        ] if total else []
-
-    def _global_aggregates(self, qs):
-        if not qs.exists():
-            return None
-        aggregates = qs.aggregate(
-            total_readings=Count('id'),
-            avg_pulse=Avg('vib_pulse'),
-            avg_humidity=Avg('soil_pct'),
-            hit_events=Count('id', filter=Q(vib_hit=True)),
-            inclination_events=Count('id', filter=Q(tilt=True)),
-            humidity_peak=Max('soil_pct'),
-            humidity_floor=Min('soil_pct'),
-            pulse_peak=Max('vib_pulse'),
-            first_timestamp=Min('packet__timestamp'),
-            last_timestamp=Max('packet__timestamp'),
-        )
-        return aggregates
-
-    def _trend_windows(self, qs):
-        today = timezone.localdate()
-        recent_start = today - timedelta(days=30)
-        previous_start = recent_start - timedelta(days=30)
-        recent = qs.filter(packet__timestamp__date__gte=recent_start)
-        previous = qs.filter(
-            packet__timestamp__date__gte=previous_start,
-            packet__timestamp__date__lt=recent_start,
-        )
-        return {
-            'recent': recent.aggregate(
-                total_readings=Count('id'),
-                hit_events=Count('id', filter=Q(vib_hit=True)),
-                inclination_events=Count('id', filter=Q(tilt=True)),
-                avg_humidity=Avg('soil_pct'),
-            ),
-            'previous': previous.aggregate(
-                total_readings=Count('id'),
-                hit_events=Count('id', filter=Q(vib_hit=True)),
-                inclination_events=Count('id', filter=Q(tilt=True)),
-                avg_humidity=Avg('soil_pct'),
-            ),
-        }
-
     def _build_kpis(self, global_stats, trend_windows):
         if not global_stats:
             return []
@@ -302,18 +529,7 @@ class DashboardView(LoginRequiredMixin, TemplateView):
             f"La humedad oscila entre {stats.get('humidity_floor') or 0:.1f}% y {stats.get('humidity_peak') or 0:.1f}% con un promedio estable.",
         ]
 
-    def _build_chart_payload(self, qs):
-        if not qs.exists():
-            return {'monthlyPulse': [], 'humidityTrend': []}
-        monthly = (
-            qs.annotate(month=TruncMonth('packet__timestamp'))
-            .values('month')
-            .annotate(
-                avg_pulse=Avg('vib_pulse'),
-                avg_humidity=Avg('soil_pct'),
-            )
-            .order_by('month')
-        )
+    def _build_chart_payload(self, monthly):
         monthly_pulse = [
             {'label': m['month'].strftime('%b %y'), 'avgPulse': round(m['avg_pulse'] or 0, 2)}
             for m in monthly
@@ -353,55 +569,30 @@ class DashboardView(LoginRequiredMixin, TemplateView):
 
 
 class SensorStreamView(LoginRequiredMixin, View):
+    """
+    Respaldo WSGI del SSE simulado. Bajo ASGI `/stream/` lo atiende `monitoring.asgi` sin
+    pasar por esta vista; aquí (runserver, gunicorn sync) se responde un solo evento y el
+    navegador reconecta tras `retry`, para no dejar un worker bloqueado por cliente.
+
+    Con Redis configurado no se simula nada: un paquete inventado se sumaría a los totales
+    reales del navegador. Se responde 204, el navegador deja de reconectar y sigue sondeando.
+    """
     stream_interval_seconds = 5
 
     def get(self, request, *args, **kwargs):
+        if broadcast.hub.available():
+            return HttpResponse(status=204)
         if not settings.SIM_STREAM_ENABLED:
             return StreamingHttpResponse(
                 "data: {\"message\": \"Simulación deshabilitada\"}\n\n",
                 content_type='text/event-stream',
             )
-        response = StreamingHttpResponse(
-            self._event_stream(),
-            content_type='text/event-stream',
+        event = sse.simulated_event(
+            int(timezone.now().timestamp()),
+            random.Random(),
+            retry=self.stream_interval_seconds * 1000,
         )
+        response = StreamingHttpResponse([event], content_type='text/event-stream')
         response['Cache-Control'] = 'no-cache'
         response['X-Accel-Buffering'] = 'no'
         return response
-
-    def _event_stream(self):
-        rng = random.Random()
-        seq_counter = itertools.count(start=int(timezone.now().timestamp()))
-        try:
-            while True:
-                payload = self._build_payload(next(seq_counter), rng)
-                yield f"data: {json.dumps(payload, cls=DjangoJSONEncoder)}\n\n"
-                time.sleep(self.stream_interval_seconds)
-        except GeneratorExit:
-            return
-
-    def _build_payload(self, seq, rng):
-        timestamp = timezone.localtime()
-        sample_count = rng.randint(2, 4)
-        samples = []
-        for sensor_id in range(1, sample_count + 1):
-            soil_raw = rng.randint(250, 940)
-            soil_pct = round(min(100, max(0, (soil_raw / 1024) * 100 + rng.uniform(-2, 2))), 2)
-            tilt = 1 if rng.random() > 0.78 else 0
-            vib_hit = 1 if rng.random() > 0.7 else 0
-            samples.append({
-                'id': sensor_id,
-                'soil': {'raw': soil_raw, 'pct': soil_pct},
-                'tilt': tilt,
-                'vib': {
-                    'pulse': rng.randint(60, 1500),
-                    'hit': vib_hit,
-                },
-            })
-        payload = {
-            'seq': seq,
-            'alerta': 1 if any(sample['tilt'] or sample['vib']['hit'] for sample in samples) else 0,
-            'ts': timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-            'samples': samples,
-        }
-        return payload
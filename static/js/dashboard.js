@@ -158,6 +158,93 @@
         });
     }
 
+    /* ---------------------------------------------------
+     * HISTORICAL WIDGETS (carga diferida)
+     * --------------------------------------------------- */
+    function renderWidget(name, data) {
+        if (name === "charts") {
+            renderBarChart("pulseChart", data.monthlyPulse || []);
+            renderLineChart("humidityChart", data.humidityTrend || []);
+            return;
+        }
+        const container = document.querySelector(`[data-widget="${name}"]`);
+        if (container) container.innerHTML = data.html;
+        if (name === "kpis") {
+            document.getElementById("filter-description").textContent = data.filter_description;
+            document.getElementById("last-update").textContent = data.last_update;
+        }
+    }
+
+    function renderWidgetError(name) {
+        const container = document.querySelector(`[data-widget="${name}"]`);
+        if (container) container.innerHTML = '<p class="empty-state">No se pudo cargar el histórico.</p>';
+    }
+
+    // cada widget se pinta apenas llega su respuesta, sin esperar a los demás
+    function loadHistoricalWidgets() {
+        const config = document.getElementById("historical-widgets");
+        if (!config) return Promise.resolve();
+        const urls = JSON.parse(config.textContent);
+        return Promise.all(Object.entries(urls).map(([name, url]) =>
+            fetch(url, { credentials: "same-origin", headers: { Accept: "application/json" } })
+                .then(r => {
+                    if (!r.ok) throw new Error(`HTTP ${r.status}`);
+                    return r.json();
+                })
+                .then(data => renderWidget(name, data))
+                .catch(err => {
+                    console.error(`Widget ${name}:`, err);
+                    renderWidgetError(name);
+                })
+        ));
+    }
+
+    /* ---------------------------------------------------
+     * DAILY INSIGHTS (snapshot del día)
+     * --------------------------------------------------- */
+    function insightCard(label, value, suffix, helper) {
+        const card = document.createElement("article");
+        card.className = "stat-card";
+        const labelEl = document.createElement("p");
+        labelEl.className = "stat-card__label";
+        labelEl.textContent = label;
+        const valueEl = document.createElement("p");
+        valueEl.className = "stat-card__value";
+        valueEl.textContent = value;
+        if (suffix) {
+            const unit = document.createElement("span");
+            unit.textContent = suffix;
+            valueEl.appendChild(unit);
+        }
+        const helperEl = document.createElement("p");
+        helperEl.className = "stat-card__helper";
+        helperEl.textContent = helper;
+        card.append(labelEl, valueEl, helperEl);
+        return card;
+    }
+
+    function renderDailyInsights(data) {
+        const container = document.getElementById("daily-insights");
+        if (!container) return;
+        document.getElementById("daily-source").textContent = data.source || "base de datos";
+        const total = data.total_readings ?? 0;
+        if (!total) {
+            container.innerHTML = '<p class="empty-state">No hay lecturas para el día de hoy.</p>';
+            return;
+        }
+        container.replaceChildren(
+            insightCard("Pulso promedio", (data.pulse_avg ?? 0).toFixed(1), "u", "Fuente Histórica"),
+            insightCard("Pulso máximo", data.pulse_peak ?? 0, "u", "Pico del día"),
+            insightCard("Humedad promedio", (data.humidity_avg ?? 0).toFixed(1), "%", "Lecturas calibradas"),
+            insightCard(
+                "Eventos detectados",
+                (data.hit_events ?? 0) + (data.inclination_events ?? 0),
+                "",
+                `Sobre ${total} mediciones`,
+            ),
+        );
+    }
+
     /* ---------------------------------------------------
      * REALTIME REDIS METRICS
      * --------------------------------------------------- */
@@ -190,15 +277,36 @@
                         status === "error" ? "is-error" : "is-connecting");
     }
 
+    // suma un paquete del stream a los totales del día (mismo cálculo que el snapshot)
+    function applyPacket(live, packet) {
+        const samples = packet.samples || [];
+        const total = live.total_readings ?? 0;
+        const humiditySum = (live.humidity_avg ?? 0) * total +
+            samples.reduce((acc, s) => acc + Number(s.soil?.pct ?? 0), 0);
+
+        live.total_readings = total + samples.length;
+        live.humidity_avg = live.total_readings ? humiditySum / live.total_readings : 0;
+        live.inclination_events = (live.inclination_events ?? 0) +
+            samples.filter(s => s.tilt).length;
+        live.hit_events = (live.hit_events ?? 0) +
+            samples.filter(s => s.vib?.hit).length;
+        live.last_timestamp = packet.ts;
+        live.last_seq = packet.seq;
+    }
+
     function initRealtimeStream() {
         const statusEl = document.getElementById("live-status");
+        let live = null;
+        let pollTimer = null;
 
         function fetchRedisData() {
-            fetch("/realtime-redis/")
+            return fetch("/realtime-redis/")
                 .then(r => r.json())
                 .then(data => {
+                    live = data;
                     setStatus(statusEl, "Conectado a Redis", "ok");
                     renderRedisMetrics(data);
+                    renderDailyInsights(data);
                 })
                 .catch(err => {
                     console.error("Redis ERROR:", err);
@@ -206,17 +314,84 @@
                 });
         }
 
+        function startPolling() {
+            if (pollTimer === null) pollTimer = setInterval(fetchRedisData, 5000);
+        }
+
+        function stopPolling() {
+            clearInterval(pollTimer);
+            pollTimer = null;
+        }
+
         fetchRedisData();
-        setInterval(fetchRedisData, 5000);
+        if (!window.streamEndpoint || !window.EventSource) {
+            startPolling();
+            return;
+        }
+
+        let fallbackTimer = null;
+        let degraded = false;
+
+        function connect() {
+            const source = new EventSource(window.streamEndpoint);
+            let opened = false;
+
+            source.onopen = () => {
+                clearTimeout(fallbackTimer);
+                fallbackTimer = null;
+                stopPolling();
+                if (degraded) {
+                    // el sondeo ya trajo un snapshot más nuevo que el último id recibido:
+                    // se abre un stream limpio en lugar de reanudar con Last-Event-ID
+                    degraded = false;
+                    source.close();
+                    connect();
+                    return;
+                }
+                if (!opened) fetchRedisData();
+                opened = true;
+                setStatus(statusEl, "En vivo", "ok");
+            };
+            source.onmessage = (event) => {
+                const packet = JSON.parse(event.data);
+                if (!live || !packet.samples) return;
+                if (live.last_timestamp && String(packet.ts).slice(0, 10) !== String(live.last_timestamp).slice(0, 10)) {
+                    fetchRedisData();  // cambio de día: los totales se reinician en Redis
+                    return;
+                }
+                applyPacket(live, packet);
+                setStatus(statusEl, "En vivo", "ok");
+                renderRedisMetrics(live);
+            };
+            // el servidor ya no tiene los paquetes perdidos: se parte de un snapshot nuevo
+            source.addEventListener("reset", fetchRedisData);
+            source.onerror = () => {
+                // EventSource reconecta solo con Last-Event-ID y el servidor reenvía lo perdido;
+                // si el corte se alarga se vuelve al sondeo
+                setStatus(statusEl, "Reconectando…", "connecting");
+                if (fallbackTimer === null) {
+                    fallbackTimer = setTimeout(() => {
+                        fallbackTimer = null;
+                        startPolling();
+                        if (source.readyState === EventSource.CLOSED) {
+                            // el navegador dejó de reintentar (p. ej. 503): stream nuevo
+                            connect();
+                        } else {
+                            degraded = true;
+                        }
+                    }, 15000);
+                }
+            };
+        }
+
+        connect();
     }
 
     /* ---------------------------------------------------
      * INIT
      * --------------------------------------------------- */
     document.addEventListener("DOMContentLoaded", () => {
-        const data = window.dashboardData || {};
-        renderBarChart("pulseChart", data.monthlyPulse || []);
-        renderLineChart("humidityChart", data.humidityTrend || []);
+        loadHistoricalWidgets();
         document.getElementById("refresh-btn").addEventListener("click", (e) => {
             e.preventDefault();  // evita que el form GET se envíe
             location.reload();   // recarga TODA la página